@@ -0,0 +1,138 @@
+"""
+Micro-benchmark: streaming MimeParser vs the previous email.policy.default parsing.
+
+Parses every .eml file in benchmarks/fixtures (plus a synthetic email with a large
+attachment) into the scanner's email data dictionary with both implementations,
+and reports time per message and peak memory. Fields where the two disagree are
+listed; the previous code decoded every part as UTF-8, so non-UTF-8 fixtures differ
+in body_preview. tests/test_mime_parser.py checks MimeParser against the stdlib.
+
+Usage:
+    python benchmarks/bench_mime_parser.py [--iterations 200] [--attachment-mb 10]
+"""
+import argparse
+import email
+import email.policy
+import sys
+import time
+import tracemalloc
+from email.message import EmailMessage
+from pathlib import Path
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
+
+from email_client import EmailClient
+
+FIXTURES_DIR = Path(__file__).parent / 'fixtures'
+
+
+def legacy_build_email_data(client: EmailClient, email_id: str, raw_email: bytes) -> dict:
+    """The parsing EmailClient._build_email_data did before MimeParser"""
+    try:
+        msg = email.message_from_bytes(raw_email, policy=email.policy.default)
+    except (LookupError, UnicodeDecodeError):
+        msg = email.message_from_bytes(raw_email, policy=email.policy.compat32)
+
+    body = ''
+    if msg.is_multipart():
+        for part in msg.walk():
+            if part.get_content_type() == 'text/plain':
+                try:
+                    payload = part.get_payload(decode=True)
+                    if payload:
+                        body += payload.decode('utf-8', errors='ignore')
+                except Exception:
+                    pass
+    else:
+        try:
+            payload = msg.get_payload(decode=True)
+            if payload:
+                body = payload.decode('utf-8', errors='ignore')
+        except Exception:
+            pass
+    body = body.strip()
+
+    has_attachments = False
+    if msg.is_multipart():
+        has_attachments = any(part.get_content_disposition() == 'attachment' for part in msg.walk())
+
+    return {
+        'email_id': email_id,
+        'sender': client._decode_header(msg.get('From', '')),
+        'recipient': client._decode_header(msg.get('To', '')),
+        'subject': client._decode_header(msg.get('Subject', '')),
+        'date': client._parse_date(msg.get('Date', '')),
+        'size_bytes': len(raw_email),
+        'has_attachments': has_attachments,
+        'body_full': body,
+        'body_preview': body[:500],
+        'list_id': client._decode_header(msg.get('List-Id', '')),
+        'list_unsubscribe': client._decode_header(msg.get('List-Unsubscribe', ''))
+    }
+
+
+def large_attachment_email(megabytes: int) -> bytes:
+    """Synthetic email with a short text body and one big binary attachment"""
+    msg = EmailMessage()
+    msg['From'] = 'Scanner Benchmark <bench@example.com>'
+    msg['To'] = 'me@example.org'
+    msg['Subject'] = f'Synthetic {megabytes} MB attachment'
+    msg['Date'] = 'Mon, 18 Mar 2024 09:15:00 +0000'
+    msg.set_content("Report attached.\n")
+    msg.add_attachment(bytes(range(256)) * (megabytes * 4096), maintype='application',
+                       subtype='octet-stream', filename='report.bin')
+    return msg.as_bytes()
+
+
+def measure(parse, raw_email: bytes, iterations: int) -> tuple:
+    """Return (milliseconds per parse, peak KiB allocated during one parse)"""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        parse(raw_email)
+    elapsed_ms = (time.perf_counter() - start) * 1000 / iterations
+
+    tracemalloc.start()
+    parse(raw_email)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed_ms, peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark MIME parsing of fetched emails')
+    parser.add_argument('--iterations', type=int, default=200, help='Parses per fixture (default: 200)')
+    parser.add_argument('--attachment-mb', type=int, default=10,
+                        help='Size of the synthetic attachment email (default: 10, 0 to skip)')
+    args = parser.parse_args()
+
+    client = EmailClient(server='', email_address='', password='')
+    corpus = [(path.name, path.read_bytes()) for path in sorted(FIXTURES_DIR.glob('*.eml'))]
+    if args.attachment_mb:
+        corpus.append((f'synthetic_{args.attachment_mb}mb_attachment', large_attachment_email(args.attachment_mb)))
+
+    print(f"{'fixture':<36} {'size KiB':>9} {'old ms':>9} {'new ms':>9} {'speedup':>8} "
+          f"{'old peak KiB':>13} {'new peak KiB':>13}")
+    total_old = total_new = 0.0
+    for name, raw_email in corpus:
+        iterations = max(1, args.iterations * 2048 // max(len(raw_email) // 1024, 2048))
+        old_ms, old_peak = measure(lambda raw: legacy_build_email_data(client, '1', raw), raw_email, iterations)
+        new_ms, new_peak = measure(lambda raw: client._build_email_data('1', raw), raw_email, iterations)
+        total_old += old_ms
+        total_new += new_ms
+
+        old_data = legacy_build_email_data(client, '1', raw_email)
+        new_data = client._build_email_data('1', raw_email)
+        differs = [key for key in ('sender', 'subject', 'has_attachments', 'body_preview')
+                   if old_data[key] != new_data[key]]
+        note = f"  (differs: {', '.join(differs)})" if differs else ''
+
+        print(f"{name:<36} {len(raw_email) / 1024:>9.1f} {old_ms:>9.3f} {new_ms:>9.3f} "
+              f"{old_ms / new_ms:>7.1f}x {old_peak:>13.0f} {new_peak:>13.0f}{note}")
+
+    print(f"\nTotal per pass over the corpus: {total_old:.2f} ms → {total_new:.2f} ms "
+          f"({total_old / total_new:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
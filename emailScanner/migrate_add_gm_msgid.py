@@ -0,0 +1,60 @@
+"""
+Migration script to add gm_msgid column to Email table.
+Run this after updating models.py to add the new field to existing databases.
+"""
+import sys
+from pathlib import Path
+import logging
+from sqlalchemy import text
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from models import init_db
+from settings import load_settings
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def migrate():
+    """Add gm_msgid column (and its index) to emails table"""
+    try:
+        # Load settings and initialize database
+        config = load_settings()
+        engine = init_db(config.database_url)
+        
+        logger.info("Starting migration: Adding gm_msgid column to emails table")
+        
+        # Add the column
+        with engine.connect() as conn:
+            # Check if column already exists
+            result = conn.execute(text("PRAGMA table_info(emails)"))
+            columns = [row[1] for row in result]
+            
+            if 'gm_msgid' in columns:
+                logger.info("Column 'gm_msgid' already exists. Skipping migration.")
+                return
+            
+            # Add the new column
+            conn.execute(text(
+                "ALTER TABLE emails ADD COLUMN gm_msgid VARCHAR(20)"
+            ))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_emails_gm_msgid ON emails (gm_msgid)"
+            ))
+            conn.commit()
+            
+            logger.info("✓ Successfully added gm_msgid column to emails table")
+            logger.info("Migration complete!")
+            
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        raise
+
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,78 @@
+"""
+Migration script to separate auto-deletions from human decisions.
+Makes decisions.approved nullable and relabels rows written by
+`cleanup.py --auto-delete` as action_taken='auto_deleted' with approved unset,
+so they stop counting as human-confirmed training data.
+"""
+import sys
+from pathlib import Path
+import logging
+from sqlalchemy import text
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from models import AUTO_DELETED, init_db
+from settings import load_settings
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def migrate():
+    """Make decisions.approved nullable and relabel existing auto-deletions"""
+    try:
+        # Load settings and initialize database
+        config = load_settings()
+        engine = init_db(config.database_url)
+        
+        logger.info("Starting migration: Separating auto-deletions from human decisions")
+        
+        with engine.connect() as conn:
+            # SQLite cannot drop NOT NULL in place; rebuild the table if needed
+            columns = conn.execute(text("PRAGMA table_info(decisions)")).fetchall()
+            approved_not_null = any(row[1] == 'approved' and row[3] for row in columns)
+            
+            if approved_not_null:
+                conn.execute(text("""
+                    CREATE TABLE decisions_new (
+                        id INTEGER NOT NULL PRIMARY KEY,
+                        email_id INTEGER NOT NULL REFERENCES emails (id),
+                        approved BOOLEAN,
+                        action_taken VARCHAR(20),
+                        notes TEXT,
+                        decided_at DATETIME
+                    )
+                """))
+                conn.execute(text(
+                    "INSERT INTO decisions_new (id, email_id, approved, action_taken, notes, decided_at) "
+                    "SELECT id, email_id, approved, action_taken, notes, decided_at FROM decisions"
+                ))
+                conn.execute(text("DROP TABLE decisions"))
+                conn.execute(text("ALTER TABLE decisions_new RENAME TO decisions"))
+                conn.execute(text("CREATE UNIQUE INDEX ix_decisions_email_id ON decisions (email_id)"))
+                conn.execute(text("CREATE INDEX ix_decisions_decided_at ON decisions (decided_at)"))
+                logger.info("✓ decisions.approved is now nullable")
+            else:
+                logger.info("decisions.approved is already nullable. Skipping table rebuild.")
+            
+            # Rows written by earlier auto-delete runs carry this note
+            result = conn.execute(text(
+                "UPDATE decisions SET action_taken = :marker, approved = NULL "
+                "WHERE action_taken = 'deleted' AND notes LIKE 'Auto-deleted (confidence:%'"
+            ), {'marker': AUTO_DELETED})
+            conn.commit()
+            
+            logger.info(f"✓ Relabelled {result.rowcount} auto-deleted decisions")
+            logger.info("Migration complete!")
+    
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        raise
+
+
+if __name__ == '__main__':
+    migrate()
@@ -0,0 +1,58 @@
+"""
+Migration script to make IMAP UIDs unique per folder instead of globally.
+Replaces the unique index on emails.email_id with a unique (folder, email_id) index,
+so the same UID can be stored for two different folders.
+"""
+import sys
+from pathlib import Path
+import logging
+from sqlalchemy import text
+
+# Add src directory to path
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from models import init_db
+from settings import load_settings
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger(__name__)
+
+
+def migrate():
+    """Swap the unique email_id index for a unique (folder, email_id) index"""
+    try:
+        # Load settings and initialize database
+        config = load_settings()
+        engine = init_db(config.database_url)
+        
+        logger.info("Starting migration: Scoping email UIDs to their folder")
+        
+        with engine.connect() as conn:
+            # Check if the index already exists
+            indexes = conn.execute(text("PRAGMA index_list(emails)")).fetchall()
+            names = {row[1]: row[2] for row in indexes}
+            
+            if 'ix_emails_folder_email_id' in names and not names.get('ix_emails_email_id'):
+                logger.info("Index 'ix_emails_folder_email_id' already exists. Skipping migration.")
+                return
+            
+            conn.execute(text("DROP INDEX IF EXISTS ix_emails_email_id"))
+            conn.execute(text("CREATE INDEX ix_emails_email_id ON emails (email_id)"))
+            conn.execute(text(
+                "CREATE UNIQUE INDEX IF NOT EXISTS ix_emails_folder_email_id ON emails (folder, email_id)"
+            ))
+            conn.commit()
+            
+            logger.info("✓ email_id is now unique per folder")
+            logger.info("Migration complete!")
+            
+    except Exception as e:
+        logger.error(f"Migration failed: {e}")
+        raise
+
+
+if __name__ == '__main__':
+    migrate()
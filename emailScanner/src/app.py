@@ -474,14 +474,15 @@ async def get_email_history(
 def _update_accuracy_stats(db: Session):
     """Calculate and update AI accuracy statistics"""
     try:
-        # Count total decisions
-        total_decisions = db.query(Decision).count()
+        # Count total decisions (auto-deletions were never reviewed)
+        total_decisions = db.query(Decision).filter(Decision.human_reviewed()).count()
         
         if total_decisions == 0:
             return
         
         # Count approved decisions
         approved_decisions = db.query(Decision).filter(
+            Decision.human_reviewed(),
             Decision.approved == True
         ).count()
         
@@ -0,0 +1,356 @@
+"""
+Asyncio IMAP client built on asyncio streams.
+Mirrors EmailClient (connect, select, search, fetch, delete, move) so fetching can run
+on the event loop while earlier emails are still being analyzed.
+"""
+import asyncio
+import logging
+import re
+import ssl
+from typing import AsyncIterator, Dict, List, Optional
+
+from email_client import EmailClient
+
+logger = logging.getLogger(__name__)
+
+# Longest single response line we accept (big SEARCH results and BODYSTRUCTUREs are one line)
+MAX_LINE_BYTES = 16 * 1024 * 1024
+
+UNTAGGED_STATUS = re.compile(rb'(\d+) ([A-Z-]+)(?: (.*))?$')
+UNTAGGED = re.compile(rb'([A-Z-]+)(?: (.*))?$')
+RESPONSE_CODE = re.compile(rb'\[([A-Z-]+)(?: ([^\]]*))?\]')
+LITERAL = re.compile(rb'\{(\d+)\}$')
+
+
+class AsyncEmailClient:
+    """Async counterpart of EmailClient working on UIDs over a single IMAP session"""
+    
+    def __init__(self, server: str, email_address: str, password: str, port: int = 993,
+                 fetch_chunk_size: int = 200, max_body_bytes: int = 8192, max_body_chars: int = 50000,
+                 timeout: float = 60):
+        """
+        Initialize async email client
+        
+        Args:
+            server: IMAP server address (e.g., 'imap.gmail.com')
+            email_address: Your email address
+            password: Email password or app-specific password
+            port: IMAP port (default 993 for SSL)
+            fetch_chunk_size: Messages requested per FETCH command
+            max_body_bytes: Bytes of the text part downloaded by partial fetches
+            max_body_chars: Body text kept per email when parsing full messages
+            timeout: Seconds to wait for the connection and greeting
+        """
+        self.server = server
+        self.email_address = email_address
+        self.port = port
+        self.password = password
+        self.fetch_chunk_size = max(fetch_chunk_size, 1)
+        self.timeout = timeout
+        self.reader: Optional[asyncio.StreamReader] = None
+        self.writer: Optional[asyncio.StreamWriter] = None
+        self.capabilities = set()  # shared with the parser client so fetch_items() sees them
+        self.folder_status = {}
+        self._tag = 0
+        self._lock = asyncio.Lock()  # one command in flight per session
+        # Never connected; only used for its FETCH response and MIME parsing helpers
+        self._parser = EmailClient(server, email_address, password, port,
+                                   fetch_chunk_size=fetch_chunk_size, max_body_bytes=max_body_bytes,
+                                   max_body_chars=max_body_chars)
+        self._parser.capabilities = self.capabilities
+    
+    async def connect(self) -> bool:
+        """Connect and login to the IMAP server"""
+        try:
+            self.reader, self.writer = await asyncio.wait_for(
+                asyncio.open_connection(self.server, self.port, ssl=ssl.create_default_context(),
+                                        limit=MAX_LINE_BYTES),
+                self.timeout
+            )
+            greeting = await asyncio.wait_for(self._read_line(), self.timeout)
+            if not greeting.startswith(b'* OK'):
+                logger.error(f"Unexpected IMAP greeting: {greeting[:100]}")
+                return False
+            
+            status, _, text = await self._command(
+                f'LOGIN {self._quote(self.email_address)} {self._quote(self.password)}'
+            )
+            if status != 'OK':
+                logger.error(f"Login failed: {text}")
+                return False
+            
+            status, responses, _ = await self._command('CAPABILITY')
+            if status == 'OK':
+                for line in responses.get('CAPABILITY', []):
+                    self.capabilities.update(line.decode('ascii', errors='ignore').upper().split())
+            
+            logger.info(f"Connected to {self.server} as {self.email_address} (async)")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to connect: {e}")
+            return False
+    
+    async def disconnect(self):
+        """Logout and close the connection"""
+        if not self.writer:
+            return
+        try:
+            await asyncio.wait_for(self._command('LOGOUT'), self.timeout)
+        except Exception as e:
+            logger.debug(f"LOGOUT failed: {e}")
+        try:
+            self.writer.close()
+            await self.writer.wait_closed()
+        except Exception as e:
+            logger.debug(f"Closing connection failed: {e}")
+        self.reader = self.writer = None
+        logger.info("Disconnected from email server (async)")
+    
+    def has_capability(self, name: str) -> bool:
+        """Check whether the server advertised a capability (e.g. 'MOVE')"""
+        return name.upper() in self.capabilities
+    
+    async def select_folder(self, folder: str = 'INBOX') -> bool:
+        """Select a folder to work with and record its status (same keys as EmailClient)"""
+        try:
+            status, responses, text = await self._command(f'SELECT {self._quote(folder)}')
+            if status != 'OK':
+                logger.error(f"Failed to select folder {folder}: {text}")
+                return False
+            
+            def first_int(code):
+                values = responses.get(code)
+                try:
+                    return int(values[0]) if values else None
+                except ValueError:
+                    return None
+            
+            self.folder_status = {
+                'folder': folder,
+                'exists': first_int('EXISTS'),
+                'uidvalidity': first_int('UIDVALIDITY'),
+                'uidnext': first_int('UIDNEXT'),
+                'highestmodseq': first_int('HIGHESTMODSEQ')
+            }
+            logger.info(f"Selected folder: {folder}")
+            return True
+        except Exception as e:
+            logger.error(f"Failed to select folder {folder}: {e}")
+            return False
+    
+    async def search_emails(self, criteria: str = 'ALL', limit: Optional[int] = None,
+                            newest_first: bool = False) -> List[str]:
+        """
+        Search for emails matching criteria with UID SEARCH
+        
+        Args:
+            criteria: IMAP search criteria (e.g., 'ALL', 'UNSEEN', 'FROM "sender@example.com"')
+            limit: Maximum number of emails to return
+            newest_first: If True, return newest emails first; if False, return oldest first
+        
+        Returns:
+            List of UIDs
+        """
+        try:
+            status, responses, text = await self._command(f'UID SEARCH {criteria}')
+            if status != 'OK':
+                logger.error(f"Search failed: {text}")
+                return []
+            
+            uids = b' '.join(responses.get('SEARCH', [])).decode().split()
+            if limit and len(uids) > limit:
+                uids = uids[-limit:] if newest_first else uids[:limit]
+            logger.info(f"Found {len(uids)} emails matching criteria")
+            return uids
+        except Exception as e:
+            logger.error(f"Failed to search emails: {e}")
+            return []
+    
+    async def fetch_emails_batch(self, uids: List[str], chunk_size: Optional[int] = None) -> List[Dict]:
+        """Fetch full emails by UID (same result as EmailClient.fetch_emails_batch)"""
+        emails = []
+        async for chunk in self.iter_fetch_chunks(uids, chunk_size=chunk_size):
+            emails.extend(chunk)
+        return emails
+    
+    async def fetch_headers_batch(self, uids: List[str], chunk_size: Optional[int] = None) -> List[Dict]:
+        """Fetch header-only records by UID (same result as EmailClient.fetch_headers_batch)"""
+        emails = []
+        async for chunk in self.iter_fetch_chunks(uids, chunk_size=chunk_size, headers_only=True):
+            emails.extend(chunk)
+        return emails
+    
+    async def iter_fetch_chunks(self, uids: List[str], chunk_size: Optional[int] = None,
+                                headers_only: bool = False) -> AsyncIterator[List[Dict]]:
+        """
+        Fetch emails chunk by chunk, yielding each chunk as soon as it is parsed
+        
+        Lets the caller start working on the first emails while the rest are still
+        being downloaded.
+        
+        Args:
+            uids: List of IMAP UIDs
+            chunk_size: Messages per FETCH command (defaults to fetch_chunk_size)
+            headers_only: Fetch only classification headers instead of full messages
+        
+        Yields:
+            Lists of email data dictionaries, in the order of uids
+        """
+        chunk_size = max(chunk_size or self.fetch_chunk_size, 1)
+        items = self._parser.fetch_items(headers_only)
+        
+        for start in range(0, len(uids), chunk_size):
+            chunk = uids[start:start + chunk_size]
+            message_set = EmailClient._build_message_set(chunk)
+            logger.info(f"Fetching emails {start + 1}-{start + len(chunk)}/{len(uids)} (async)")
+            try:
+                status, responses, text = await self._command(f'UID FETCH {message_set} {items}')
+            except Exception as e:
+                logger.error(f"Failed to fetch emails {message_set}: {e}")
+                return
+            if status != 'OK':
+                logger.error(f"FETCH failed for {message_set}: {text}")
+                continue
+            
+            messages = {}
+            for message in EmailClient._iter_fetch_response(responses.get('FETCH', [])):
+                if message['uid']:
+                    messages[message['uid']] = message
+            
+            emails = []
+            for uid in chunk:
+                message = messages.get(str(uid))
+                email_data = self._parser.parse_message(message, headers_only) if message else None
+                if email_data:
+                    emails.append(email_data)
+                else:
+                    logger.warning(f"Email {uid} missing from FETCH response")
+            yield emails
+    
+    async def delete_emails(self, uids: List[str], chunk_size: Optional[int] = None) -> Dict[str, bool]:
+        """Delete many emails at once (move to Gmail Trash); see EmailClient.delete_emails"""
+        return await self.move_emails(uids, EmailClient.TRASH_FOLDER, chunk_size=chunk_size)
+    
+    async def move_emails(self, uids: List[str], destination_folder: str,
+                          chunk_size: Optional[int] = None) -> Dict[str, bool]:
+        """
+        Move many emails to another folder with set-based commands
+        
+        Same behaviour as EmailClient.move_emails: UID MOVE when available, otherwise
+        UID COPY + UID STORE + one expunge per chunk.
+        
+        Returns:
+            Dict mapping each UID to True if it was moved
+        """
+        chunk_size = max(chunk_size or self.fetch_chunk_size, 1)
+        destination = self._quote(destination_folder)
+        
+        results = {str(uid): False for uid in uids}
+        uid_list = list(results)
+        for start in range(0, len(uid_list), chunk_size):
+            chunk = uid_list[start:start + chunk_size]
+            try:
+                status, responses, text = await self._command(
+                    f'UID SEARCH UID {EmailClient._build_message_set(chunk)}'
+                )
+                if status != 'OK':
+                    logger.error(f"UID SEARCH failed before move: {text}")
+                    continue
+                existing = [uid for uid in b' '.join(responses.get('SEARCH', [])).decode().split()
+                            if uid in results]
+                if not existing:
+                    continue
+                
+                message_set = EmailClient._build_message_set(existing)
+                if self.has_capability('MOVE'):
+                    status, _, text = await self._command(f'UID MOVE {message_set} {destination}')
+                else:
+                    status, _, text = await self._command(f'UID COPY {message_set} {destination}')
+                    if status == 'OK':
+                        await self._command(f'UID STORE {message_set} +FLAGS.SILENT (\\Deleted)')
+                        if self.has_capability('UIDPLUS'):
+                            await self._command(f'UID EXPUNGE {message_set}')
+                        else:
+                            await self._command('EXPUNGE')
+                
+                if status == 'OK':
+                    for uid in existing:
+                        results[uid] = True
+                    logger.info(f"Moved {len(existing)} emails to {destination_folder}")
+                else:
+                    logger.error(f"Moving {message_set} to {destination_folder} failed: {text}")
+            except Exception as e:
+                logger.error(f"Failed to move emails {chunk[0]}..{chunk[-1]} to {destination_folder}: {e}")
+        
+        return results
+    
+    async def _command(self, command: str) -> tuple:
+        """
+        Send a tagged command and collect responses until its completion
+        
+        Returns:
+            Tuple of (status, untagged responses by type, completion text). Untagged
+            data has the same shape imaplib returns, e.g. responses['FETCH'] is the
+            flat list of (header, literal) tuples and bytes that
+            EmailClient._iter_fetch_response understands. Response codes such as
+            [UIDVALIDITY n] are stored under their code name.
+        """
+        async with self._lock:
+            self._tag += 1
+            tag = f'A{self._tag:04d}'.encode()
+            self.writer.write(tag + b' ' + command.encode('utf-8') + b'\r\n')
+            await self.writer.drain()
+            
+            responses = {}
+            while True:
+                line = await self._read_line()
+                if line.startswith(tag + b' '):
+                    status, _, text = line[len(tag) + 1:].partition(b' ')
+                    return status.decode('ascii', errors='ignore'), responses, text.decode('utf-8', errors='ignore')
+                if line.startswith(b'* '):
+                    response_type, data = await self._read_untagged(line[2:])
+                    responses.setdefault(response_type, []).extend(data)
+                    code = RESPONSE_CODE.match(line[2 + len(response_type) + 1:]) \
+                        if response_type in ('OK', 'NO', 'BAD') else None
+                    if code:
+                        responses.setdefault(code.group(1).decode(), []).append(code.group(2) or b'')
+    
+    async def _read_untagged(self, line: bytes) -> tuple:
+        """
+        Read the rest of an untagged response, including any literals
+        
+        Returns:
+            Tuple of (response type, list of data items)
+        """
+        status = UNTAGGED_STATUS.match(line)
+        if status:
+            response_type = status.group(2).decode()
+            data = status.group(1) + (b' ' + status.group(3) if status.group(3) is not None else b'')
+        else:
+            untagged = UNTAGGED.match(line)
+            if not untagged:
+                return 'UNKNOWN', [line]
+            response_type = untagged.group(1).decode()
+            data = untagged.group(2) or b''
+        
+        items = []
+        while True:
+            literal = LITERAL.search(data)
+            if not literal:
+                items.append(data)
+                return response_type, items
+            body = await self.reader.readexactly(int(literal.group(1)))
+            items.append((data, body))
+            data = await self._read_line()
+    
+    async def _read_line(self) -> bytes:
+        """Read one response line without its CRLF"""
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("IMAP server closed the connection")
+        return line.rstrip(b'\r\n')
+    
+    @staticmethod
+    def _quote(value: str) -> str:
+        """Quote a string argument for IMAP commands"""
+        return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
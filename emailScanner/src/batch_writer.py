@@ -0,0 +1,159 @@
+"""
+Batched database writes for the scanner.
+New emails and their analyses are buffered and written with bulk INSERTs, and the
+transaction is committed once per batch (a row count or a time limit, whichever
+comes first) instead of once per email. The time limit is checked when rows are
+added and whenever the caller polls flush_if_due() between slow steps such as LLM
+calls. Each email is written inside its own SAVEPOINT, so a bad message is rolled
+back alone without losing the rest of the batch.
+"""
+import logging
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from models import Email, Analysis
+
+logger = logging.getLogger(__name__)
+
+
+class BatchWriter:
+    """Group email and analysis writes into few transactions"""
+    
+    def __init__(self, db_session: Session, max_rows: int = 200, max_seconds: float = 2.0):
+        """
+        Initialize writer
+        
+        Args:
+            db_session: Session the rows are written with
+            max_rows: Emails written per transaction
+            max_seconds: Longest time a written email waits for its commit, provided the
+                         caller polls flush_if_due() while no rows are being added
+        """
+        self.db_session = db_session
+        self.max_rows = max(max_rows, 1)
+        self.max_seconds = max_seconds
+        self._new_rows = []  # (email row, analysis row, on_commit) waiting for the bulk insert
+        self._on_commit = []  # callbacks of emails already written in a savepoint
+        self._first_pending_at = None
+        self.commits = 0
+    
+    @property
+    def pending(self) -> int:
+        """Emails written (or buffered) since the last commit"""
+        return len(self._new_rows) + len(self._on_commit)
+    
+    def add_email(self, email_row: Dict, analysis_row: Dict, on_commit: Optional[Callable[[], None]] = None):
+        """
+        Buffer a new email and its analysis for the next bulk insert
+        
+        Args:
+            email_row: Email column values
+            analysis_row: Analysis column values (email_id is filled in on insert)
+            on_commit: Called once the rows are committed
+        """
+        self._new_rows.append((email_row, analysis_row, on_commit))
+        self._row_added()
+    
+    @contextmanager
+    def savepoint(self, on_commit: Optional[Callable[[], None]] = None) -> Iterator[Session]:
+        """
+        Run ORM changes for one email inside a SAVEPOINT
+        
+        If the block raises, only that email's changes are rolled back (and the
+        exception is re-raised); otherwise they are committed with the batch.
+        """
+        with self.db_session.begin_nested():
+            yield self.db_session
+        self._on_commit.append(on_commit)
+        self._row_added()
+    
+    def flush(self) -> int:
+        """
+        Insert buffered rows and commit the transaction
+        
+        Returns:
+            Number of emails committed
+        """
+        if not self.pending:
+            return 0
+        
+        callbacks = list(self._on_commit)
+        new_rows, self._new_rows, self._on_commit = self._new_rows, [], []
+        self._first_pending_at = None
+        try:
+            if new_rows:
+                callbacks.extend(self._insert_new(new_rows))
+            self.db_session.commit()
+        except Exception as e:
+            logger.error(f"Failed to commit {len(callbacks)} emails: {e}")
+            self.db_session.rollback()
+            return 0
+        
+        self.commits += 1
+        for callback in callbacks:
+            if callback:
+                callback()
+        return len(callbacks)
+    
+    def flush_if_due(self) -> int:
+        """
+        Commit if the oldest uncommitted email has waited max_seconds
+        
+        Must run on the thread that owns the session, e.g. between LLM calls.
+        
+        Returns:
+            Number of emails committed
+        """
+        if self._first_pending_at is None or time.monotonic() - self._first_pending_at < self.max_seconds:
+            return 0
+        return self.flush()
+    
+    def _row_added(self):
+        if self._first_pending_at is None:
+            self._first_pending_at = time.monotonic()
+        if self.pending >= self.max_rows:
+            self.flush()
+        else:
+            self.flush_if_due()
+    
+    def _insert_new(self, new_rows: List[tuple]) -> List[Optional[Callable[[], None]]]:
+        """
+        Bulk insert buffered emails and analyses
+        
+        One failing row fails a whole multi-row INSERT, so on error the batch is
+        retried one email per SAVEPOINT and only the bad emails are dropped.
+        
+        Returns:
+            on_commit callbacks of the emails that were inserted
+        """
+        try:
+            with self.db_session.begin_nested():
+                self._insert_rows(new_rows)
+            return [on_commit for _, _, on_commit in new_rows]
+        except Exception as e:
+            logger.warning(f"Bulk insert of {len(new_rows)} emails failed ({e}); inserting one by one")
+        
+        inserted = []
+        for row in new_rows:
+            try:
+                with self.db_session.begin_nested():
+                    self._insert_rows([row])
+                inserted.append(row[2])
+            except Exception as e:
+                logger.error(f"Error storing email {row[0].get('email_id')}: {e}")
+        return inserted
+    
+    def _insert_rows(self, rows: List[tuple]):
+        """INSERT emails with RETURNING for their ids, then their analyses"""
+        email_ids = self.db_session.scalars(
+            insert(Email).returning(Email.id, sort_by_parameter_order=True),
+            [email_row for email_row, _, _ in rows]
+        ).all()
+        self.db_session.execute(
+            insert(Analysis),
+            [dict(analysis_row, email_id=email_id) for (_, analysis_row, _), email_id in zip(rows, email_ids)]
+        )
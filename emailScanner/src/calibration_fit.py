@@ -0,0 +1,273 @@
+"""
+Offline fit of confidence calibration curves from human decisions.
+
+For each model and each (model, category) pair with enough reviewed decisions, a
+monotone curve mapping stated confidence to observed accuracy is fitted with NumPy
+(isotonic regression, or Platt scaling when there are few samples) and stored as a
+small lookup table in the calibration_curves table. ConfidenceCalibrator loads the
+tables once and calibrates each score with a binary search.
+"""
+
+import argparse
+import json
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from models import Decision, Analysis, Email, CalibrationCurve, init_db, get_session
+from settings import load_settings
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+# Points of the tabulated Platt curve
+PLATT_GRID = np.linspace(0.0, 1.0, 21)
+
+
+def load_decisions(db_session) -> Dict[str, np.ndarray]:
+    """
+    Load stated confidence and outcome of every human-reviewed decision
+    
+    Args:
+        db_session: Database session
+    
+    Returns:
+        Dict of equally long arrays: 'confidence' (float), 'approved' (float 0/1),
+        'model_name' and 'category' (object, None where unknown)
+    """
+    rows = db_session.query(
+        Analysis.confidence_score,
+        Decision.approved,
+        Analysis.model_name,
+        Analysis.category
+    ).join(
+        Email, Decision.email_id == Email.id
+    ).join(
+        Analysis, Email.id == Analysis.email_id
+    ).filter(
+        Decision.human_reviewed(),  # Only calibrate on human-reviewed decisions
+        Analysis.confidence_score.isnot(None)
+    ).all()
+    
+    columns = list(zip(*rows)) if rows else [(), (), (), ()]
+    return {
+        'confidence': np.clip(np.asarray(columns[0], dtype=float), 0.0, 1.0),
+        'approved': np.asarray(columns[1], dtype=float),
+        'model_name': np.asarray(columns[2], dtype=object),
+        'category': np.asarray(columns[3], dtype=object)
+    }
+
+
+def fit_isotonic(confidence: np.ndarray, approved: np.ndarray) -> Tuple[List[float], List[float]]:
+    """
+    Fit a non-decreasing step function with the pool-adjacent-violators algorithm
+    
+    Samples are sorted and tied scores merged with NumPy first, so the PAV loop runs
+    over distinct confidence values (a few dozen for LLM scores), not over samples.
+    
+    Args:
+        confidence: Stated confidences
+        approved: 1.0 where the human agreed, else 0.0
+    
+    Returns:
+        Tuple of (thresholds, values): the first and last confidence of each fitted
+        block with the block's accuracy; interpolate linearly in between
+    """
+    levels, inverse = np.unique(confidence, return_inverse=True)
+    weights = np.bincount(inverse).astype(float)
+    means = np.bincount(inverse, weights=approved) / weights
+    
+    # Blocks as [mean, weight, first level index, last level index]
+    blocks = []
+    for index, (mean, weight) in enumerate(zip(means, weights)):
+        blocks.append([mean, weight, index, index])
+        while len(blocks) > 1 and blocks[-2][0] >= blocks[-1][0]:
+            mean_b, weight_b, _, last = blocks.pop()
+            mean_a, weight_a, first, _ = blocks.pop()
+            total = weight_a + weight_b
+            blocks.append([(mean_a * weight_a + mean_b * weight_b) / total, total, first, last])
+    
+    thresholds, values = [], []
+    for mean, _, first, last in blocks:
+        for index in sorted({first, last}):
+            thresholds.append(round(float(levels[index]), 4))
+            values.append(round(float(mean), 4))
+    return thresholds, values
+
+
+def fit_platt(confidence: np.ndarray, approved: np.ndarray, iterations: int = 50) -> Tuple[List[float], List[float]]:
+    """
+    Fit accuracy = sigmoid(a * logit(confidence) + b) by Newton's method
+    
+    Uses Platt's smoothed targets so a handful of samples cannot produce a 0/1 curve.
+    
+    Args:
+        confidence: Stated confidences
+        approved: 1.0 where the human agreed, else 0.0
+        iterations: Maximum Newton steps
+    
+    Returns:
+        Tuple of (thresholds, values) tabulating the curve on PLATT_GRID
+    """
+    positives = approved.sum()
+    negatives = len(approved) - positives
+    targets = np.where(approved > 0, (positives + 1) / (positives + 2), 1 / (negatives + 2))
+    
+    features = np.column_stack([_logit(confidence), np.ones_like(confidence)])
+    params = np.array([1.0, 0.0])
+    loss = _log_loss(features, params, targets)
+    for _ in range(iterations):
+        predicted = _sigmoid(features @ params)
+        gradient = features.T @ (predicted - targets)
+        hessian = (features * (predicted * (1 - predicted))[:, None]).T @ features + np.eye(2) * 1e-6
+        step = np.linalg.solve(hessian, gradient)
+        
+        # Halve the step until the loss drops; a full Newton step diverges when the start is saturated
+        while np.abs(step).max() >= 1e-8:
+            candidate_loss = _log_loss(features, params - step, targets)
+            if candidate_loss <= loss:
+                break
+            step /= 2
+        if np.abs(step).max() < 1e-8:
+            break
+        params -= step
+        loss = candidate_loss
+    
+    # A negative slope would mean higher confidence is less accurate; fall back to a flat curve
+    if params[0] < 0:
+        params = np.array([0.0, float(_logit(np.array(targets.mean())))])
+    values = _sigmoid(np.column_stack([_logit(PLATT_GRID), np.ones_like(PLATT_GRID)]) @ params)
+    return [round(float(x), 4) for x in PLATT_GRID], [round(float(y), 4) for y in values]
+
+
+def fit_curves(data: Dict[str, np.ndarray], min_samples: int = 30, isotonic_samples: int = 200,
+               method: str = 'auto') -> List[Dict]:
+    """
+    Fit one curve per model and per (model, category), plus one over everything
+    
+    Args:
+        data: Output of load_decisions
+        min_samples: Decisions required before a curve is fitted
+        isotonic_samples: With method 'auto', samples needed for isotonic regression
+                          (Platt scaling is used below that)
+        method: 'auto', 'isotonic' or 'platt'
+    
+    Returns:
+        List of curve dicts (model_name, category, method, thresholds, values, sample_count)
+    """
+    groups = [(None, None, np.ones(len(data['confidence']), dtype=bool))]
+    for model_name in sorted(set(data['model_name']) - {None}):
+        in_model = data['model_name'] == model_name
+        groups.append((model_name, None, in_model))
+        for category in sorted(set(data['category'][in_model]) - {None}):
+            groups.append((model_name, category, in_model & (data['category'] == category)))
+    
+    curves = []
+    for model_name, category, mask in groups:
+        sample_count = int(mask.sum())
+        if sample_count < min_samples:
+            continue
+        
+        curve_method = method
+        if curve_method == 'auto':
+            curve_method = 'isotonic' if sample_count >= isotonic_samples else 'platt'
+        fit = fit_isotonic if curve_method == 'isotonic' else fit_platt
+        thresholds, values = fit(data['confidence'][mask], data['approved'][mask])
+        curves.append({
+            'model_name': model_name,
+            'category': category,
+            'method': curve_method,
+            'thresholds': thresholds,
+            'values': values,
+            'sample_count': sample_count
+        })
+    return curves
+
+
+def save_curves(db_session, curves: List[Dict]):
+    """Replace all stored calibration curves with the given ones"""
+    db_session.query(CalibrationCurve).delete()
+    fitted_at = datetime.utcnow()
+    for curve in curves:
+        db_session.add(CalibrationCurve(
+            model_name=curve['model_name'],
+            category=curve['category'],
+            method=curve['method'],
+            thresholds=json.dumps(curve['thresholds']),
+            values=json.dumps(curve['values']),
+            sample_count=curve['sample_count'],
+            fitted_at=fitted_at
+        ))
+    db_session.commit()
+
+
+def print_curves(curves: List[Dict]):
+    """Print fitted curves at a few reference confidences"""
+    from confidence_calibration import interpolate
+    
+    references = [0.5, 0.7, 0.85, 0.95]
+    print(f"{'Model':<22} {'Category':<14} {'Method':<9} {'Samples':>7}   " +
+          "  ".join(f"{r:.0%}→" for r in references))
+    for curve in curves:
+        mapped = "  ".join(f"{interpolate(curve['thresholds'], curve['values'], r):>4.0%}" for r in references)
+        print(f"{curve['model_name'] or '(all)':<22} {curve['category'] or '(all)':<14} "
+              f"{curve['method']:<9} {curve['sample_count']:>7}   {mapped}")
+
+
+def _logit(p: np.ndarray) -> np.ndarray:
+    p = np.clip(p, 1e-4, 1 - 1e-4)
+    return np.log(p / (1 - p))
+
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-np.clip(z, -500, 500)))
+
+
+def _log_loss(features: np.ndarray, params: np.ndarray, targets: np.ndarray) -> float:
+    z = features @ params
+    return float(np.sum(np.logaddexp(0, z) - targets * z))
+
+
+def main():
+    """Main entry point for fitting calibration curves"""
+    parser = argparse.ArgumentParser(description='Fit confidence calibration curves from human decisions')
+    parser.add_argument('--min-samples', type=int, default=30,
+                        help='Decisions needed before a model/category gets its own curve (default: 30)')
+    parser.add_argument('--method', choices=['auto', 'isotonic', 'platt'], default='auto',
+                        help='Curve type; auto uses isotonic regression from 200 samples, Platt scaling below')
+    parser.add_argument('--dry-run', action='store_true', help='Print the curves without saving them')
+    args = parser.parse_args()
+    
+    # Load settings
+    config = load_settings()
+    
+    # Initialize database
+    engine = init_db(config.database_url)
+    db_session = get_session(engine)
+    
+    try:
+        data = load_decisions(db_session)
+        print(f"Loaded {len(data['confidence'])} reviewed decisions\n")
+        
+        curves = fit_curves(data, min_samples=args.min_samples, method=args.method)
+        if not curves:
+            print(f"Not enough decisions to fit a curve (need {args.min_samples})")
+            return
+        
+        print_curves(curves)
+        if args.dry_run:
+            print("\nDry run - curves not saved")
+        else:
+            save_curves(db_session, curves)
+            print(f"\n✓ Saved {len(curves)} calibration curves")
+    
+    finally:
+        db_session.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -8,7 +8,7 @@ from datetime import datetime, UTC
 from typing import List
 from sqlalchemy.orm import Session
 
-from models import Email, Analysis, Decision, SystemStats, init_db, get_session
+from models import Email, Analysis, Decision, SystemStats, AUTO_DELETED, init_db, get_session
 from email_client import EmailClient
 from settings import load_settings
 
@@ -69,6 +69,7 @@ class EmailCleanup:
         ).filter(
             Decision.approved == True,  # User approved the recommendation
             Analysis.recommendation == 'delete',  # AI recommended deletion
+            Email.folder == 'INBOX',  # UIDs below are deleted from INBOX
             Email.deleted_at.is_(None)  # Not already deleted
         )
         
@@ -107,31 +108,30 @@ class EmailCleanup:
             
             # email_id stored in database is the IMAP UID (unique and persistent)
             
-            # Delete each email
-            deleted_count = 0
-            failed_count = 0
+            # Delete all approved emails with a few set-based commands and one expunge per chunk
+            deleted = self.email_client.delete_emails([email_id for email_id, _, _ in approved])
             
+            deleted_ids = []
             for email_id, db_id, subject in approved:
-                try:
-                    logger.info(f"Deleting: {subject[:50]}...")
-                    
-                    # Delete from server
-                    if self.email_client.delete_email(email_id):
-                        # Mark as deleted in database
-                        email = self.db_session.query(Email).get(db_id)
-                        email.deleted_at = datetime.now(UTC)
-                        self.db_session.commit()
-                        
-                        deleted_count += 1
-                        logger.info(f"  ✓ Deleted successfully")
-                    else:
-                        failed_count += 1
-                        logger.warning(f"  ✗ Failed to delete from server")
-                
-                except Exception as e:
-                    failed_count += 1
-                    logger.error(f"Error deleting email {email_id}: {e}")
-                    self.db_session.rollback()
+                if deleted.get(str(email_id)):
+                    deleted_ids.append(db_id)
+                    logger.info(f"  ✓ Deleted: {subject[:50]}")
+                else:
+                    logger.warning(f"  ✗ Failed to delete from server: {subject[:50]}")
+            
+            deleted_count = len(deleted_ids)
+            failed_count = len(approved) - deleted_count
+            
+            # Mark as deleted in database in one transaction
+            try:
+                if deleted_ids:
+                    self.db_session.query(Email).filter(Email.id.in_(deleted_ids)).update(
+                        {Email.deleted_at: datetime.now(UTC)}, synchronize_session=False
+                    )
+                    self.db_session.commit()
+            except Exception as e:
+                logger.error(f"Error marking deleted emails in database: {e}")
+                self.db_session.rollback()
             
             # Update system stats
             self._update_stats(deleted_count)
@@ -164,6 +164,7 @@ class EmailCleanup:
                 Analysis.recommendation == 'delete',
                 Analysis.confidence_score >= min_confidence,
                 Decision.id.is_(None),  # No decision made yet
+                Email.folder == 'INBOX',  # UIDs below are deleted from INBOX
                 Email.deleted_at.is_(None)  # Not already deleted
             )
             
@@ -189,38 +190,41 @@ class EmailCleanup:
             
             # email_id stored in database is the IMAP UID (unique and persistent)
             
-            # Delete each email
-            deleted_count = 0
+            # Delete all candidates with a few set-based commands and one expunge per chunk
+            deleted = self.email_client.delete_emails([email_id for email_id, *_ in results])
             
+            now = datetime.now(UTC)
+            deleted_ids = []
+            decisions = []
             for email_id, db_id, subject, confidence, reasoning in results:
-                try:
-                    logger.info(f"Auto-deleting [{confidence:.2f}]: {subject[:50]}...")
-                    
-                    # Delete from server
-                    if self.email_client.delete_email(email_id):
-                        # Mark as deleted in database
-                        email = self.db_session.query(Email).get(db_id)
-                        email.deleted_at = datetime.now(UTC)
-                        
-                        # Create decision record (auto-approved)
-                        decision = Decision(
-                            email_id=db_id,
-                            action='approve',
-                            approved_recommendation='delete',
-                            notes=f'Auto-deleted (confidence: {confidence:.2f})',
-                            decided_at=datetime.now(UTC)
-                        )
-                        self.db_session.add(decision)
-                        self.db_session.commit()
-                        
-                        deleted_count += 1
-                        logger.info(f"  ✓ Auto-deleted successfully")
-                    else:
-                        logger.warning(f"  ✗ Failed to delete from server")
-                
-                except Exception as e:
-                    logger.error(f"Error auto-deleting email {email_id}: {e}")
-                    self.db_session.rollback()
+                if deleted.get(str(email_id)):
+                    deleted_ids.append(db_id)
+                    # Record the machine action; approved stays unset so it never
+                    # feeds back into calibration or sender memory as human evidence
+                    decisions.append({
+                        'email_id': db_id,
+                        'approved': None,
+                        'action_taken': AUTO_DELETED,
+                        'notes': f'Auto-deleted (confidence: {confidence:.2f})',
+                        'decided_at': now
+                    })
+                    logger.info(f"  ✓ Auto-deleted [{confidence:.2f}]: {subject[:50]}")
+                else:
+                    logger.warning(f"  ✗ Failed to delete from server: {subject[:50]}")
+            
+            deleted_count = len(deleted_ids)
+            
+            # Mark as deleted and record decisions in one transaction
+            try:
+                if deleted_ids:
+                    self.db_session.query(Email).filter(Email.id.in_(deleted_ids)).update(
+                        {Email.deleted_at: now}, synchronize_session=False
+                    )
+                    self.db_session.bulk_insert_mappings(Decision, decisions)
+                    self.db_session.commit()
+            except Exception as e:
+                logger.error(f"Error recording auto-deletions in database: {e}")
+                self.db_session.rollback()
             
             # Update system stats
             self._update_stats(deleted_count)
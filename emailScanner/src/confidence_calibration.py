@@ -2,14 +2,20 @@
 Confidence calibration system to adjust AI confidence scores based on historical accuracy.
 
 Tracks how often the AI is correct at different confidence levels and adjusts
-future scores accordingly.
+future scores accordingly. Curves fitted per model and category by calibration_fit.py
+are used when available; the confidence buckets are the fallback.
 """
 
+import json
 import sys
+import threading
+import time
+from bisect import bisect_left, bisect_right
 from pathlib import Path
-from typing import Dict, Optional, Tuple
+from typing import Dict, List, Optional, Tuple
 from sqlalchemy import func, case
-from models import Decision, Analysis, Email, init_db, get_session
+from sqlalchemy.orm import Session
+from models import Decision, Analysis, Email, CalibrationCurve, init_db, get_session
 from settings import load_settings
 import logging
 
@@ -20,6 +26,28 @@ sys.path.insert(0, str(project_root))
 logger = logging.getLogger(__name__)
 
 
+def interpolate(thresholds: List[float], values: List[float], x: float) -> float:
+    """
+    Evaluate a piecewise-linear calibration curve with a binary search
+    
+    Args:
+        thresholds: Ascending stated confidences
+        values: Calibrated confidence at each threshold
+        x: Stated confidence
+    
+    Returns:
+        Calibrated confidence (held constant beyond the first and last threshold)
+    """
+    index = bisect_left(thresholds, x)
+    if index == 0:
+        return values[0]
+    if index == len(thresholds):
+        return values[-1]
+    x0, x1 = thresholds[index - 1], thresholds[index]
+    y0, y1 = values[index - 1], values[index]
+    return y0 + (y1 - y0) * (x - x0) / (x1 - x0)
+
+
 class ConfidenceCalibrator:
     """
     Tracks AI accuracy by confidence bucket and provides calibrated scores.
@@ -28,14 +56,16 @@ class ConfidenceCalibrator:
     by comparing stated confidence to actual accuracy.
     """
     
-    def __init__(self, db_session):
+    def __init__(self, db_session, refresh_seconds: float = 60):
         """
         Initialize calibrator with database session
         
         Args:
             db_session: SQLAlchemy database session
+            refresh_seconds: How often the cached snapshot checks for new decisions
         """
         self.db_session = db_session
+        self.refresh_seconds = refresh_seconds
         
         # Define confidence buckets
         self.buckets = [
@@ -45,6 +75,17 @@ class ConfidenceCalibrator:
             (0.85, 0.95, "high"),
             (0.95, 1.0, "very_high")
         ]
+        self._lower_bounds = [min_conf for min_conf, _, _ in self.buckets]
+        
+        # Snapshot: per-bucket [total, correct, confidence sum], indexed like self.buckets
+        self._counts: Optional[List[List[float]]] = None
+        self._stats: Optional[Dict[str, Dict]] = None
+        self._last_decision_id = 0
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        
+        # Fitted curves keyed by (model_name, category); None matches any
+        self._curves: Optional[Dict[Tuple[Optional[str], Optional[str]], Dict]] = None
     
     def get_bucket_stats(self) -> Dict[str, Dict]:
         """
@@ -53,32 +94,134 @@ class ConfidenceCalibrator:
         Returns:
             Dictionary mapping bucket names to stats
         """
-        stats = {}
+        counts, _ = self._query_bucket_counts(self.db_session)
+        return self._stats_from_counts(counts)
+    
+    def snapshot(self) -> Dict[str, Dict]:
+        """
+        Cached bucket stats for the hot path
+        
+        Loaded with one query on first use. Afterwards, at most every refresh_seconds,
+        only decisions newer than the snapshot are queried and added to it.
         
-        for min_conf, max_conf, bucket_name in self.buckets:
-            # Query decisions in this confidence bucket
-            results = self.db_session.query(
-                func.count(Decision.id).label('total'),
-                func.sum(
-                    case(
-                        (Decision.approved == True, 1),
-                        else_=0
-                    )
-                ).label('correct'),
-                func.avg(Analysis.confidence_score).label('avg_confidence')
-            ).join(
-                Email, Decision.email_id == Email.id
-            ).join(
-                Analysis, Email.id == Analysis.email_id
-            ).filter(
-                Analysis.confidence_score >= min_conf,
-                Analysis.confidence_score < max_conf if max_conf < 1.0 else Analysis.confidence_score <= max_conf,
-                Decision.action_taken.isnot(None)  # Only calibrate on human-reviewed decisions
-            ).first()
+        Returns:
+            Same dictionary as get_bucket_stats
+        """
+        if self._stats is None or time.monotonic() - self._checked_at >= self.refresh_seconds:
+            self.refresh(full=self._stats is None)
+        return self._stats
+    
+    def refresh(self, full: bool = False):
+        """
+        Bring the snapshot up to date
+        
+        Runs on a short-lived session of its own, so scan worker threads can share
+        one calibrator.
+        
+        Args:
+            full: Recompute from all decisions instead of adding the new ones
+                  (picks up edited decisions and rescanned analyses) and reload
+                  the fitted curves
+        """
+        with self._lock:
+            session = Session(bind=self.db_session.get_bind())
+            try:
+                after_id = 0 if full or self._counts is None else self._last_decision_id
+                counts, last_id = self._query_bucket_counts(session, after_id)
+                if full or self._curves is None:
+                    self._curves = self._load_curves(session)
+            except Exception as e:
+                logger.warning(f"Could not refresh calibration snapshot: {e}")
+                if self._stats is None:
+                    self._counts = [[0, 0, 0.0] for _ in self.buckets]
+                    self._stats = self._stats_from_counts(self._counts)
+                if self._curves is None:
+                    self._curves = {}
+                self._checked_at = time.monotonic()
+                return
+            finally:
+                session.close()
             
-            total = results.total or 0
-            correct = results.correct or 0
-            avg_confidence = results.avg_confidence or ((min_conf + max_conf) / 2)
+            if after_id:
+                for bucket, new in zip(self._counts, counts):
+                    for i, value in enumerate(new):
+                        bucket[i] += value
+            else:
+                self._counts = counts
+            self._last_decision_id = max(self._last_decision_id if after_id else 0, last_id)
+            self._stats = self._stats_from_counts(self._counts)
+            self._checked_at = time.monotonic()
+    
+    def _load_curves(self, session) -> Dict[Tuple[Optional[str], Optional[str]], Dict]:
+        """Read the curves saved by calibration_fit.py"""
+        curves = {}
+        for row in session.query(CalibrationCurve).all():
+            curves[(row.model_name, row.category)] = {
+                'method': row.method,
+                'thresholds': json.loads(row.thresholds),
+                'values': json.loads(row.values),
+                'sample_count': row.sample_count or 0
+            }
+        return curves
+    
+    def _find_curve(self, model_name: Optional[str], category: Optional[str]) -> Optional[Tuple[str, Dict]]:
+        """Most specific curve for a model and category: (model, category), then (model, any), then (any, any)"""
+        for key in ((model_name, category), (model_name, None), (None, None)):
+            curve = self._curves.get(key)
+            if curve and curve['thresholds']:
+                scope = '/'.join(part for part in key if part) or 'all models'
+                return scope, curve
+        return None
+    
+    def _bucket_index(self, confidence: float) -> int:
+        """Index into self.buckets (the top bucket includes 1.0)"""
+        return max(bisect_right(self._lower_bounds, confidence) - 1, 0)
+    
+    def _query_bucket_counts(self, session, after_id: int = 0) -> Tuple[List[List[float]], int]:
+        """
+        Count human-reviewed decisions per confidence bucket with a single GROUP BY
+        
+        Args:
+            session: Session to query with
+            after_id: Only count decisions with a larger id (for incremental refreshes)
+        
+        Returns:
+            Tuple of (per-bucket [total, correct, confidence sum], largest decision id seen)
+        """
+        confidence = Analysis.confidence_score
+        bucket = case(
+            *[(confidence < max_conf, index) for index, (_, max_conf, _) in enumerate(self.buckets[:-1])],
+            else_=len(self.buckets) - 1
+        ).label('bucket')
+        
+        rows = session.query(
+            bucket,
+            func.count(Decision.id).label('total'),
+            func.sum(case((Decision.approved == True, 1), else_=0)).label('correct'),
+            func.sum(confidence).label('confidence_sum'),
+            func.max(Decision.id).label('last_id')
+        ).join(
+            Email, Decision.email_id == Email.id
+        ).join(
+            Analysis, Email.id == Analysis.email_id
+        ).filter(
+            Decision.human_reviewed(),  # Only calibrate on human-reviewed decisions
+            Decision.id > after_id
+        ).group_by(bucket).all()
+        
+        counts = [[0, 0, 0.0] for _ in self.buckets]
+        last_id = 0
+        for row in rows:
+            counts[row.bucket] = [row.total or 0, row.correct or 0, row.confidence_sum or 0.0]
+            last_id = max(last_id, row.last_id or 0)
+        return counts, last_id
+    
+    def _stats_from_counts(self, counts: List[List[float]]) -> Dict[str, Dict]:
+        """Turn per-bucket counts into the stats dictionary of get_bucket_stats"""
+        stats = {}
+        
+        for (min_conf, max_conf, bucket_name), (total, correct, confidence_sum) in zip(self.buckets, counts):
+            avg_confidence = confidence_sum / total if total > 0 else ((min_conf + max_conf) / 2)
             
             accuracy = correct / total if total > 0 else 0.0
             
@@ -95,29 +238,37 @@ class ConfidenceCalibrator:
         
         return stats
     
-    def calibrate_confidence(self, stated_confidence: float, category: str = None) -> Tuple[float, str]:
+    def calibrate_confidence(self, stated_confidence: float, category: str = None,
+                             model_name: str = None) -> Tuple[float, str]:
         """
         Adjust a confidence score based on historical accuracy
         
+        Uses the most specific fitted curve for the model and category; without one,
+        falls back to the confidence buckets.
+        
         Args:
             stated_confidence: Original confidence from AI (0.0 to 1.0)
             category: Optional email category for category-specific calibration
+            model_name: Optional model that produced the score
         
         Returns:
             Tuple of (calibrated_confidence, reasoning)
         """
-        # Find which bucket this falls into
-        bucket_name = None
-        for min_conf, max_conf, name in self.buckets:
-            if min_conf <= stated_confidence < max_conf or (max_conf == 1.0 and stated_confidence <= max_conf):
-                bucket_name = name
-                break
-        
-        if not bucket_name:
+        if not 0.0 <= stated_confidence <= 1.0:
             return stated_confidence, "No calibration applied"
         
-        # Get stats for this bucket
-        stats = self.get_bucket_stats()
+        # Cached snapshot and curves, no query per email
+        stats = self.snapshot()
+        
+        found = self._find_curve(model_name, category)
+        if found:
+            scope, curve = found
+            calibrated = max(0.0, min(1.0, interpolate(curve['thresholds'], curve['values'], stated_confidence)))
+            reasoning = f"{curve['method'].title()} curve for {scope} ({curve['sample_count']} samples)"
+            return calibrated, reasoning
+        
+        # Find which bucket this falls into
+        bucket_name = self.buckets[self._bucket_index(stated_confidence)][2]
         bucket_stats = stats.get(bucket_name, {})
         
         # If not enough data, return original confidence
@@ -162,7 +313,7 @@ class ConfidenceCalibrator:
         ).join(
             Analysis, Email.id == Analysis.email_id
         ).filter(
-            Decision.action_taken.isnot(None)
+            Decision.human_reviewed()
         ).first()
         
         total = results.total or 0
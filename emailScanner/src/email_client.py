@@ -3,12 +3,17 @@ Email client for connecting to IMAP servers and fetching emails.
 Supports Gmail, Outlook, and other IMAP-compatible providers.
 """
 import imaplib
-import email
-import email.policy
+import email.utils
 from email.header import decode_header
 from datetime import datetime, UTC
 import logging
-from typing import List, Dict, Optional
+import re
+import select
+import ssl
+import time
+from typing import List, Dict, Optional, Iterable, Iterator
+
+from mime_parser import MimeParser, decode_part
 
 logger = logging.getLogger(__name__)
 
@@ -16,7 +21,21 @@ logger = logging.getLogger(__name__)
 class EmailClient:
     """IMAP email client for fetching and managing emails"""
     
-    def __init__(self, server: str, email_address: str, password: str, port: int = 993):
+    # Gmail's Trash; moving a message here is how Gmail IMAP deletes it
+    TRASH_FOLDER = '[Gmail]/Trash'
+    
+    # Items requested per message when fetching full emails
+    FETCH_ITEMS = '(UID RFC822.SIZE BODY.PEEK[])'
+    
+    # Headers the rules engine needs; fetched on their own in header-first scans
+    HEADER_FIELDS = 'FROM TO SUBJECT DATE LIST-ID LIST-UNSUBSCRIBE'
+    HEADER_FETCH_ITEMS = f'(UID RFC822.SIZE BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS ({HEADER_FIELDS})])'
+    
+    # Gmail extension items added to every fetch when the server supports X-GM-EXT-1
+    GMAIL_FETCH_ITEMS = 'X-GM-MSGID X-GM-LABELS'
+    
+    def __init__(self, server: str, email_address: str, password: str, port: int = 993,
+                 fetch_chunk_size: int = 200, max_body_bytes: int = 8192, max_body_chars: int = 50000):
         """
         Initialize email client
         
@@ -25,12 +44,21 @@ class EmailClient:
             email_address: Your email address
             password: Email password or app-specific password
             port: IMAP port (default 993 for SSL)
+            fetch_chunk_size: Messages requested per FETCH command in batch mode
+            max_body_bytes: Bytes of the text part downloaded by partial fetches
+            max_body_chars: Body text kept per email when parsing full messages
         """
         self.server = server
         self.email_address = email_address
         self.password = password
         self.port = port
+        self.fetch_chunk_size = fetch_chunk_size
+        self.max_body_bytes = max_body_bytes
+        self.mime_parser = MimeParser(max_body_chars=max_body_chars)
         self.connection = None
+        self.capabilities = set()
+        self.condstore_enabled = False
+        self.folder_status = {}  # UIDVALIDITY/UIDNEXT/HIGHESTMODSEQ of the selected folder
         
     def connect(self) -> bool:
         """Connect to IMAP server"""
@@ -38,6 +66,8 @@ class EmailClient:
             logger.info(f"Connecting to {self.server}:{self.port}")
             self.connection = imaplib.IMAP4_SSL(self.server, self.port)
             self.connection.login(self.email_address, self.password)
+            self._refresh_capabilities()
+            self.condstore_enabled = self._enable_condstore()
             logger.info("Successfully connected to email server")
             return True
         except Exception as e:
@@ -56,6 +86,15 @@ class EmailClient:
             except Exception as e:
                 logger.debug(f"Error during disconnect: {e}")
     
+    def is_alive(self) -> bool:
+        """Check that the session still answers (NOOP)"""
+        if not self.connection:
+            return False
+        try:
+            return self.connection.noop()[0] == 'OK'
+        except Exception:
+            return False
+    
     def list_folders(self) -> List[str]:
         """List all available folders/mailboxes"""
         if not self.connection:
@@ -75,12 +114,50 @@ class EmailClient:
             logger.error(f"Failed to list folders: {e}")
         return []
     
+    @property
+    def is_gmail(self) -> bool:
+        """Whether the server supports Gmail's IMAP extensions (X-GM-RAW, X-GM-MSGID, X-GM-LABELS)"""
+        return self.has_capability('X-GM-EXT-1')
+    
+    def has_capability(self, name: str) -> bool:
+        """Check whether the server advertised a capability (e.g. 'MOVE', 'CONDSTORE')"""
+        return name.upper() in self.capabilities
+    
+    def _refresh_capabilities(self):
+        """Re-read capabilities after login; servers often advertise more once authenticated"""
+        try:
+            status, data = self.connection.capability()
+            if status == 'OK' and data and data[-1]:
+                self.capabilities = set(data[-1].decode().upper().split())
+                return
+        except Exception as e:
+            logger.debug(f"CAPABILITY failed: {e}")
+        self.capabilities = {str(c).upper() for c in getattr(self.connection, 'capabilities', ())}
+    
+    def _enable_condstore(self) -> bool:
+        """Enable CONDSTORE so SELECT reports HIGHESTMODSEQ and FETCH accepts CHANGEDSINCE"""
+        if not self.has_capability('CONDSTORE') or not self.has_capability('ENABLE'):
+            return False
+        try:
+            status, _ = self.connection.enable('CONDSTORE')
+            return status == 'OK'
+        except Exception as e:
+            logger.debug(f"Could not enable CONDSTORE: {e}")
+            return False
+    
     def select_folder(self, folder: str = 'INBOX') -> bool:
         """Select a folder to work with"""
         try:
             status, messages = self.connection.select(folder)
             if status == 'OK':
                 count = int(messages[0])
+                self.folder_status = {
+                    'folder': folder,
+                    'exists': count,
+                    'uidvalidity': self._response_int('UIDVALIDITY'),
+                    'uidnext': self._response_int('UIDNEXT'),
+                    'highestmodseq': self._response_int('HIGHESTMODSEQ')
+                }
                 logger.info(f"Selected folder '{folder}' with {count} messages")
                 return True
             return False
@@ -88,8 +165,120 @@ class EmailClient:
             logger.error(f"Failed to select folder '{folder}': {e}")
             return False
     
+    def _response_int(self, code: str) -> Optional[int]:
+        """Read a numeric untagged response code (e.g. [UIDNEXT 4392]) left by the last command"""
+        _, data = self.connection.response(code)
+        if data and data[-1]:
+            value = data[-1].decode() if isinstance(data[-1], bytes) else str(data[-1])
+            if value.split()[0].isdigit():
+                return int(value.split()[0])
+        return None
+    
+    def fetch_flag_changes(self, changed_since: int, last_uid: int) -> Dict[str, List[str]]:
+        """
+        Fetch flags of messages whose MODSEQ is above changed_since (requires CONDSTORE)
+        
+        Args:
+            changed_since: HIGHESTMODSEQ recorded at the previous sync
+            last_uid: Highest UID already synced; newer messages are picked up by the scan itself
+        
+        Returns:
+            Dict mapping UID to its current flags
+        """
+        if not self.condstore_enabled or last_uid < 1:
+            return {}
+        try:
+            status, msg_data = self.connection.uid(
+                'FETCH', f'1:{last_uid}', f'(UID FLAGS) (CHANGEDSINCE {changed_since})'
+            )
+            if status != 'OK':
+                logger.error(f"CHANGEDSINCE fetch failed: {msg_data}")
+                return {}
+        except Exception as e:
+            logger.error(f"Failed to fetch flag changes: {e}")
+            return {}
+        
+        changes = {}
+        for message in self._iter_fetch_response(msg_data):
+            flags_match = re.search(r'FLAGS \(([^)]*)\)', message['attrs'])
+            if message['uid'] and flags_match:
+                changes[message['uid']] = flags_match.group(1).split()
+        return changes
+    
+    def idle(self, timeout: float = 25 * 60) -> bool:
+        """
+        Wait in IMAP IDLE until the selected folder reports new mail or timeout expires
+        
+        Servers drop IDLE after about 29 minutes, so callers should keep timeout below
+        that and simply call idle() again when it returns False.
+        
+        Args:
+            timeout: Seconds to stay idle before returning
+        
+        Returns:
+            True if an EXISTS notification arrived, False on timeout
+        
+        Raises:
+            imaplib.IMAP4.abort: If the connection drops while idling
+        """
+        if not self.has_capability('IDLE'):
+            raise imaplib.IMAP4.error("Server does not support IDLE")
+        
+        tag = self.connection._new_tag()
+        self.connection.send(tag + b' IDLE\r\n')
+        line = self.connection.readline()
+        if not line.startswith(b'+'):
+            raise imaplib.IMAP4.error(f"IDLE rejected: {line!r}")
+        
+        new_mail = False
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._wait_readable(remaining):
+                    break
+                line = self.connection.readline()
+                if not line:
+                    raise imaplib.IMAP4.abort("Connection closed during IDLE")
+                if re.match(rb'\* \d+ EXISTS', line):
+                    new_mail = True
+                    break
+        finally:
+            # End IDLE and drain everything up to the tagged completion
+            self.connection.send(b'DONE\r\n')
+            while True:
+                line = self.connection.readline()
+                if not line:
+                    raise imaplib.IMAP4.abort("Connection closed while ending IDLE")
+                if line.startswith(tag):
+                    break
+        
+        return new_mail
+    
+    def _wait_readable(self, timeout: float) -> bool:
+        """Wait until the server has sent data, without consuming it"""
+        # Lines read ahead into imaplib's buffer (e.g. an EXISTS sent right after the
+        # IDLE continuation) or decrypted by the SSL layer are invisible to select()
+        if self._data_buffered():
+            return True
+        readable, _, _ = select.select([self.connection.sock], [], [], timeout)
+        return bool(readable)
+    
+    def _data_buffered(self) -> bool:
+        """Whether a read would return data right away, checked without blocking"""
+        sock = self.connection.sock
+        previous_timeout = sock.gettimeout()
+        sock.settimeout(0)
+        try:
+            # peek() returns buffered bytes as-is and only reads the socket when the buffer is empty
+            return bool(self.connection.file.peek(1))
+        except (BlockingIOError, ssl.SSLWantReadError):
+            return False
+        finally:
+            sock.settimeout(previous_timeout)
+    
     def search_emails(self, criteria: str = 'ALL', limit: Optional[int] = None, 
-                     newest_first: bool = False) -> List[str]:
+                     newest_first: bool = False, use_uid: bool = False) -> List[str]:
         """
         Search for emails matching criteria
         
@@ -97,13 +286,17 @@ class EmailClient:
             criteria: IMAP search criteria (e.g., 'ALL', 'UNSEEN', 'FROM "sender@example.com"')
             limit: Maximum number of emails to return
             newest_first: If True, return newest emails first; if False, return oldest first
+            use_uid: If True, run UID SEARCH and return UIDs instead of sequence numbers
         
         Returns:
             List of email IDs
         """
         try:
             logger.info(f"Searching emails with criteria: {criteria}")
-            status, messages = self.connection.search(None, criteria)
+            if use_uid:
+                status, messages = self.connection.uid('SEARCH', None, criteria)
+            else:
+                status, messages = self.connection.search(None, criteria)
             if status == 'OK':
                 email_ids = messages[0].split()
                 total_found = len(email_ids)
@@ -123,6 +316,59 @@ class EmailClient:
             logger.error(f"Failed to search emails: {e}")
         return []
     
+    def search_gmail(self, query: str, extra_criteria: Optional[str] = None, limit: Optional[int] = None,
+                     newest_first: bool = False) -> List[str]:
+        """
+        Search with Gmail's own query syntax on the server (X-GM-RAW)
+        
+        Args:
+            query: Gmail search query (e.g., 'older_than:90d category:promotions')
+            extra_criteria: Additional IMAP search criteria (e.g., 'SINCE 01-Jan-2024')
+            limit: Maximum number of emails to return
+            newest_first: If True, return newest emails first; if False, return oldest first
+        
+        Returns:
+            List of UIDs (empty if the server is not Gmail)
+        """
+        if not self.is_gmail:
+            logger.error("X-GM-RAW search needs a Gmail server (X-GM-EXT-1 capability)")
+            return []
+        
+        prefix = f'{extra_criteria} ' if extra_criteria else ''
+        if query.isascii():
+            return self.search_emails(f'{prefix}X-GM-RAW {self._quote_string(query)}', limit=limit,
+                                      newest_first=newest_first, use_uid=True)
+        
+        # Non-ASCII queries go as a UTF-8 literal appended to the command
+        self.connection.literal = query.encode('utf-8')
+        return self.search_emails(f'CHARSET UTF-8 {prefix}X-GM-RAW', limit=limit,
+                                  newest_first=newest_first, use_uid=True)
+    
+    def gmail_categories(self, uids: List[str], categories: Iterable[str]) -> Dict[str, str]:
+        """
+        Find which Gmail inbox category (Promotions, Social, ...) each UID is in
+        
+        Categories are not exposed as IMAP folders or in X-GM-LABELS, so membership
+        is looked up with one X-GM-RAW 'category:' search per category, restricted
+        to the given UIDs.
+        
+        Args:
+            uids: UIDs in the selected folder
+            categories: Category names as used in Gmail search (e.g. 'promotions')
+        
+        Returns:
+            Dict mapping UID to its category (UIDs in no category are left out)
+        """
+        if not uids or not self.is_gmail:
+            return {}
+        
+        message_set = self._build_message_set(uids)
+        result = {}
+        for category in categories:
+            for uid in self.search_gmail(f'category:{category}', extra_criteria=f'UID {message_set}'):
+                result.setdefault(uid, category)
+        return result
+    
     def fetch_email(self, email_id: str) -> Optional[Dict]:
         """
         Fetch a single email by ID
@@ -143,78 +389,314 @@ class EmailClient:
             uid = None
             if msg_data[0]:
                 response = msg_data[0][0].decode('utf-8', errors='ignore') if isinstance(msg_data[0][0], bytes) else str(msg_data[0][0])
-                import re
                 uid_match = re.search(r'UID (\d+)', response)
                 if uid_match:
                     uid = uid_match.group(1)
             
-            # Parse email with encoding error handling
             raw_email = msg_data[0][1]
-            
-            # Try standard parsing first, with lenient policy to handle encoding issues
-            try:
-                msg = email.message_from_bytes(raw_email, policy=email.policy.default)
-            except (LookupError, UnicodeDecodeError) as e:
-                # Handle unknown encoding errors with even more lenient parsing
-                logger.warning(f"Email {email_id} has encoding issue ({e}), attempting recovery with relaxed policy")
-                try:
-                    # Try with completely lenient policy
-                    msg = email.message_from_bytes(raw_email, policy=email.policy.compat32)
-                except Exception as e2:
-                    logger.error(f"Could not parse email {email_id} even with lenient policy: {e2}")
-                    return None
-            
-            # Extract email data
-            email_data = {
-                'email_id': uid if uid else email_id,  # Store UID, fallback to sequence number
-                'sender': self._decode_header(msg.get('From', '')),
-                'recipient': self._decode_header(msg.get('To', '')),
-                'subject': self._decode_header(msg.get('Subject', '')),
-                'date': self._parse_date(msg.get('Date', '')),
-                'size_bytes': len(raw_email),
-                'has_attachments': False,
-                'body_full': '',
-                'body_preview': ''
-            }
-            
-            # Extract body
-            body = self._extract_body(msg)
-            email_data['body_full'] = body
-            email_data['body_preview'] = body[:500] if body else ''
-            
-            # Check for attachments
-            email_data['has_attachments'] = self._has_attachments(msg)
-            
-            return email_data
+            return self._build_email_data(uid if uid else email_id, raw_email)  # Store UID, fallback to sequence number
             
         except Exception as e:
             logger.error(f"Failed to fetch email {email_id}: {e}")
             return None
     
-    def fetch_emails_batch(self, email_ids: List[str], max_emails: Optional[int] = None) -> List[Dict]:
+    def fetch_emails_batch(self, email_ids: List[str], max_emails: Optional[int] = None,
+                           chunk_size: Optional[int] = None, use_uid: bool = False) -> List[Dict]:
         """
         Fetch multiple emails in batch
         
+        Messages are requested in chunks with one FETCH command per chunk, using a
+        compressed message set (e.g. '1:200,205,210:260') instead of one round trip
+        per message. A chunk size of 1 falls back to fetching messages one by one.
+        
         Args:
-            email_ids: List of email IDs to fetch
+            email_ids: List of email IDs to fetch (sequence numbers, or UIDs if use_uid)
             max_emails: Maximum number of emails to fetch
+            chunk_size: Messages per FETCH command (defaults to fetch_chunk_size)
+            use_uid: If True, email_ids are UIDs and UID FETCH is used
         
         Returns:
-            List of email data dictionaries
+            List of email data dictionaries, in the same order as email_ids
         """
         if max_emails:
             email_ids = email_ids[:max_emails]
         
+        chunk_size = chunk_size or self.fetch_chunk_size
+        
         emails = []
-        for i, email_id in enumerate(email_ids, 1):
-            logger.info(f"Fetching email {i}/{len(email_ids)}")
-            email_data = self.fetch_email(email_id)
-            if email_data:
-                emails.append(email_data)
+        if chunk_size <= 1 and not use_uid:
+            for i, email_id in enumerate(email_ids, 1):
+                logger.info(f"Fetching email {i}/{len(email_ids)}")
+                email_data = self.fetch_email(email_id)
+                if email_data:
+                    emails.append(email_data)
+        else:
+            chunk_size = max(chunk_size, 1)
+            for start in range(0, len(email_ids), chunk_size):
+                chunk = email_ids[start:start + chunk_size]
+                logger.info(f"Fetching emails {start + 1}-{start + len(chunk)}/{len(email_ids)}")
+                emails.extend(self._fetch_chunk(chunk, use_uid))
         
         logger.info(f"Successfully fetched {len(emails)} emails")
         return emails
     
+    def fetch_headers_batch(self, uids: List[str], chunk_size: Optional[int] = None) -> List[Dict]:
+        """
+        Fetch only the headers needed for classification, plus the message size
+        
+        Records have the same keys as fetch_emails_batch, with empty body fields
+        and 'headers_only' set so callers know the body still has to be fetched.
+        
+        Args:
+            uids: List of IMAP UIDs to fetch
+            chunk_size: Messages per FETCH command (defaults to fetch_chunk_size)
+        
+        Returns:
+            List of header-only email data dictionaries, in the same order as uids
+        """
+        chunk_size = max(chunk_size or self.fetch_chunk_size, 1)
+        
+        headers = []
+        for start in range(0, len(uids), chunk_size):
+            chunk = uids[start:start + chunk_size]
+            logger.info(f"Fetching headers {start + 1}-{start + len(chunk)}/{len(uids)}")
+            headers.extend(self._fetch_chunk(chunk, use_uid=True, headers_only=True))
+        
+        logger.info(f"Successfully fetched headers for {len(headers)} emails")
+        return headers
+    
+    def fetch_emails_partial(self, uids: List[str], chunk_size: Optional[int] = None,
+                             max_body_bytes: Optional[int] = None) -> List[Dict]:
+        """
+        Fetch emails without downloading attachments or the whole message
+        
+        For each chunk, BODYSTRUCTURE and headers are fetched first. has_attachments
+        is worked out from the structure, and only the first text/plain part is
+        downloaded, capped with a byte range (e.g. BODY.PEEK[1]<0.8192>). Messages
+        whose structure cannot be parsed fall back to a full fetch.
+        
+        Args:
+            uids: List of IMAP UIDs to fetch
+            chunk_size: Messages per FETCH command (defaults to fetch_chunk_size)
+            max_body_bytes: Bytes of the text part to download (defaults to max_body_bytes)
+        
+        Returns:
+            List of email data dictionaries, in the same order as uids
+        """
+        chunk_size = max(chunk_size or self.fetch_chunk_size, 1)
+        max_body_bytes = max_body_bytes or self.max_body_bytes
+        
+        emails = []
+        for start in range(0, len(uids), chunk_size):
+            chunk = uids[start:start + chunk_size]
+            logger.info(f"Fetching text parts {start + 1}-{start + len(chunk)}/{len(uids)}")
+            emails.extend(self._fetch_partial_chunk(chunk, max_body_bytes))
+        
+        logger.info(f"Successfully fetched {len(emails)} emails (partial)")
+        return emails
+    
+    def _fetch_partial_chunk(self, uids: List[str], max_body_bytes: int) -> List[Dict]:
+        """Fetch structure and headers for a chunk, then only the text parts"""
+        messages = self._fetch_messages(uids, True, self.fetch_items(headers_only=True))
+        
+        records = {}
+        text_parts = {}
+        uids_by_part = {}
+        needs_full = []
+        for uid in uids:
+            message = messages.get(str(uid))
+            header_bytes = None
+            if message:
+                header_bytes = next((v for k, v in message['literals'].items()
+                                     if k.startswith('BODY[HEADER')), None)
+            if header_bytes is None:
+                logger.warning(f"Email {uid} missing from FETCH response")
+                continue
+            
+            structure = self._parse_bodystructure(message['attrs'])
+            if structure is None:
+                needs_full.append(str(uid))
+                continue
+            
+            email_data = self._build_header_data(str(uid), header_bytes)
+            email_data['size_bytes'] = message['size']
+            email_data['headers_only'] = False
+            self._add_gmail_attrs(email_data, message)
+            text_part, email_data['has_attachments'] = self._summarize_bodystructure(structure)
+            records[str(uid)] = email_data
+            if text_part:
+                text_parts[str(uid)] = text_part
+                uids_by_part.setdefault(text_part['spec'], []).append(str(uid))
+        
+        # One ranged FETCH per distinct part number (almost always just '1' or '1.1')
+        for spec, part_uids in uids_by_part.items():
+            bodies = self._fetch_messages(part_uids, True, f'(UID BODY.PEEK[{spec}]<0.{max_body_bytes}>)')
+            for uid in part_uids:
+                message = bodies.get(uid)
+                data = None
+                if message:
+                    data = next((v for k, v in message['literals'].items()
+                                 if k.startswith(f'BODY[{spec}]')), None)
+                if data is None:
+                    continue
+                part = text_parts[uid]
+                body = decode_part(data, part['encoding'], part['charset']).strip()
+                records[uid]['body_full'] = body
+                records[uid]['body_preview'] = body[:500]
+        
+        if needs_full:
+            logger.info(f"Falling back to full fetch for {len(needs_full)} emails with unreadable BODYSTRUCTURE")
+            for email_data in self._fetch_chunk(needs_full, use_uid=True):
+                records[email_data['email_id']] = email_data
+        
+        return [records[str(uid)] for uid in uids if str(uid) in records]
+    
+    def fetch_raw(self, uids: List[str], headers_only: bool = False) -> List[Dict]:
+        """
+        Run one UID FETCH and return the response entries without parsing the emails
+        
+        Lets the caller download and parse on different threads; turn each entry
+        into email data with parse_message().
+        
+        Returns:
+            FETCH response entries in the order of uids (missing messages are left out)
+        """
+        messages = self._fetch_messages(uids, True, self.fetch_items(headers_only))
+        entries = []
+        for uid in uids:
+            message = messages.get(str(uid))
+            if message:
+                entries.append(message)
+            else:
+                logger.warning(f"Email {uid} missing from FETCH response")
+        return entries
+    
+    def _fetch_chunk(self, email_ids: List[str], use_uid: bool, headers_only: bool = False) -> List[Dict]:
+        """Fetch one chunk of emails with a single FETCH command"""
+        messages = self._fetch_messages(email_ids, use_uid, self.fetch_items(headers_only))
+        
+        emails = []
+        for email_id in email_ids:
+            message = messages.get(str(email_id))
+            email_data = self.parse_message(message, headers_only) if message else None
+            if email_data:
+                emails.append(email_data)
+            else:
+                logger.warning(f"Email {email_id} missing from FETCH response")
+        return emails
+    
+    def parse_message(self, message: Dict, headers_only: bool = False) -> Optional[Dict]:
+        """Build an email data dictionary from one FETCH response entry (see fetch_raw)"""
+        email_data = None
+        if headers_only:
+            header_bytes = next((v for k, v in message['literals'].items()
+                                 if k.startswith('BODY[HEADER')), None)
+            if header_bytes is not None:
+                email_data = self._build_header_data(message['uid'] or message['seq'], header_bytes)
+                structure = self._parse_bodystructure(message['attrs'])
+                if structure is not None:
+                    email_data['has_attachments'] = self._summarize_bodystructure(structure)[1]
+        elif 'BODY[]' in message['literals']:
+            email_data = self._build_email_data(message['uid'] or message['seq'],
+                                                message['literals']['BODY[]'])
+        
+        if email_data:
+            if message['size'] is not None:
+                email_data['size_bytes'] = message['size']
+            self._add_gmail_attrs(email_data, message)
+        return email_data
+    
+    def fetch_items(self, headers_only: bool = False) -> str:
+        """FETCH items for full or header-only fetches, with Gmail's X-GM items when available"""
+        items = self.HEADER_FETCH_ITEMS if headers_only else self.FETCH_ITEMS
+        if self.is_gmail:
+            items = f'({self.GMAIL_FETCH_ITEMS} {items[1:]}'
+        return items
+    
+    @staticmethod
+    def _add_gmail_attrs(email_data: Dict, message: Dict):
+        """Copy X-GM-MSGID/X-GM-LABELS from a FETCH response entry into email data"""
+        if message.get('gm_msgid'):
+            email_data['gm_msgid'] = message['gm_msgid']
+        if message.get('gm_labels') is not None:
+            email_data['gm_labels'] = message['gm_labels']
+    
+    def _fetch_messages(self, email_ids: List[str], use_uid: bool, items: str) -> Dict[str, Dict]:
+        """
+        Run a single FETCH for a set of messages
+        
+        Returns:
+            Parsed response entries keyed by UID (if use_uid) or sequence number
+        """
+        message_set = self._build_message_set(email_ids)
+        try:
+            if use_uid:
+                status, msg_data = self.connection.uid('FETCH', message_set, items)
+            else:
+                status, msg_data = self.connection.fetch(message_set, items)
+            if status != 'OK':
+                logger.error(f"FETCH failed for {message_set}: {msg_data}")
+                return {}
+        except Exception as e:
+            logger.error(f"Failed to fetch emails {message_set}: {e}")
+            return {}
+        
+        messages = {}
+        for message in self._iter_fetch_response(msg_data):
+            key = message['uid'] if use_uid else message['seq']
+            if key:
+                messages[key] = message
+        return messages
+    
+    def _build_header_data(self, email_id: str, header_bytes: bytes) -> Dict:
+        """Build a header-only email data dictionary from a HEADER.FIELDS literal"""
+        parsed = self.mime_parser.parse(header_bytes)
+        headers = parsed['headers'] if parsed else {}
+        email_data = {
+            'email_id': email_id,
+            'sender': self._decode_header(headers.get('From', '')),
+            'recipient': self._decode_header(headers.get('To', '')),
+            'subject': self._decode_header(headers.get('Subject', '')),
+            'date': self._parse_date(headers.get('Date', '')),
+            'size_bytes': None,
+            'has_attachments': False,
+            'body_full': '',
+            'body_preview': '',
+            'list_id': self._decode_header(headers.get('List-Id', '')),
+            'list_unsubscribe': self._decode_header(headers.get('List-Unsubscribe', '')),
+            'headers_only': True
+        }
+        return email_data
+    
+    def _build_email_data(self, email_id: str, raw_email: bytes) -> Optional[Dict]:
+        """Parse raw RFC822 bytes into an email data dictionary"""
+        # Streaming compat32 parse: only stored headers are decoded, attachments are skipped
+        parsed = self.mime_parser.parse(raw_email)
+        if parsed is None:
+            logger.error(f"Could not parse email {email_id}")
+            return None
+        
+        try:
+            headers = parsed['headers']
+            body = parsed['body']
+            email_data = {
+                'email_id': email_id,
+                'sender': self._decode_header(headers['From']),
+                'recipient': self._decode_header(headers['To']),
+                'subject': self._decode_header(headers['Subject']),
+                'date': self._parse_date(headers['Date']),
+                'size_bytes': len(raw_email),
+                'has_attachments': parsed['has_attachments'],
+                'body_full': body,
+                'body_preview': body[:500] if body else '',
+                'list_id': self._decode_header(headers['List-Id']),
+                'list_unsubscribe': self._decode_header(headers['List-Unsubscribe'])
+            }
+            return email_data
+        except Exception as e:
+            logger.error(f"Failed to parse email {email_id}: {e}")
+            return None
+    
     def mark_as_read(self, email_id: str) -> bool:
         """Mark an email as read"""
         try:
@@ -265,6 +747,281 @@ class EmailClient:
             logger.error(f"Failed to move email {email_id}: {e}")
         return False
     
+    def delete_emails(self, uids: List[str], chunk_size: Optional[int] = None) -> Dict[str, bool]:
+        """
+        Delete many emails at once (move to Gmail Trash)
+        
+        Args:
+            uids: IMAP UIDs to delete
+            chunk_size: UIDs per command (defaults to fetch_chunk_size)
+        
+        Returns:
+            Dict mapping each UID to True if it was moved to Trash
+        """
+        return self.move_emails(uids, self.TRASH_FOLDER, chunk_size=chunk_size)
+    
+    def move_emails(self, uids: List[str], destination_folder: str,
+                    chunk_size: Optional[int] = None) -> Dict[str, bool]:
+        """
+        Move many emails to another folder with a few set-based commands per chunk
+        
+        Uses UID MOVE when the server supports it. Otherwise falls back to UID COPY,
+        one UID STORE +FLAGS.SILENT (\\Deleted) and a single expunge per chunk
+        (UID EXPUNGE with UIDPLUS, so other \\Deleted messages are left alone).
+        
+        Args:
+            uids: IMAP UIDs to move
+            destination_folder: Target folder name
+            chunk_size: UIDs per command (defaults to fetch_chunk_size)
+        
+        Returns:
+            Dict mapping each UID to True if it was moved; UIDs no longer in the
+            folder are reported as False
+        """
+        chunk_size = max(chunk_size or self.fetch_chunk_size, 1)
+        destination = self._quote_folder(destination_folder)
+        use_move = self.has_capability('MOVE')
+        
+        results = {str(uid): False for uid in uids}
+        uid_list = list(results)
+        for start in range(0, len(uid_list), chunk_size):
+            chunk = uid_list[start:start + chunk_size]
+            try:
+                # Only count UIDs that still exist; COPY/MOVE silently skip missing ones
+                status, data = self.connection.uid('SEARCH', None, f'UID {self._build_message_set(chunk)}')
+                if status != 'OK':
+                    logger.error(f"UID SEARCH failed before move: {data}")
+                    continue
+                existing = [uid.decode() for uid in data[0].split()] if data and data[0] else []
+                existing = [uid for uid in existing if uid in results]
+                if not existing:
+                    continue
+                
+                message_set = self._build_message_set(existing)
+                if use_move:
+                    status, data = self.connection.uid('MOVE', message_set, destination)
+                else:
+                    status, data = self.connection.uid('COPY', message_set, destination)
+                    if status == 'OK':
+                        self.connection.uid('STORE', message_set, '+FLAGS.SILENT', '(\\Deleted)')
+                        if self.has_capability('UIDPLUS'):
+                            self.connection.uid('EXPUNGE', message_set)
+                        else:
+                            self.connection.expunge()
+                
+                if status == 'OK':
+                    for uid in existing:
+                        results[uid] = True
+                    logger.info(f"Moved {len(existing)} emails to {destination_folder}")
+                else:
+                    logger.error(f"Moving {message_set} to {destination_folder} failed: {data}")
+            except Exception as e:
+                logger.error(f"Failed to move emails {chunk[0]}..{chunk[-1]} to {destination_folder}: {e}")
+        
+        return results
+    
+    @staticmethod
+    def _quote_folder(folder: str) -> str:
+        """Quote a folder name for IMAP commands (e.g. [Gmail]/Trash -> "[Gmail]/Trash")"""
+        if folder.startswith('"'):
+            return folder
+        return EmailClient._quote_string(folder)
+    
+    @staticmethod
+    def _quote_string(value: str) -> str:
+        """Quote a string argument for IMAP commands"""
+        return '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+    
+    @staticmethod
+    def _build_message_set(email_ids: List[str]) -> str:
+        """
+        Compress a list of message IDs into an IMAP message set
+        
+        Consecutive IDs are collapsed into ranges, e.g. ['1', '2', '3', '5'] -> '1:3,5'
+        """
+        ids = sorted({int(i) for i in email_ids})
+        if not ids:
+            return ''
+        
+        ranges = []
+        start = prev = ids[0]
+        for current in ids[1:]:
+            if current == prev + 1:
+                prev = current
+                continue
+            ranges.append(f"{start}:{prev}" if start != prev else str(start))
+            start = prev = current
+        ranges.append(f"{start}:{prev}" if start != prev else str(start))
+        return ','.join(ranges)
+    
+    @staticmethod
+    def _iter_fetch_response(msg_data: list) -> Iterator[Dict]:
+        """
+        Walk an imaplib FETCH response and yield one entry per message
+        
+        imaplib returns a flat list mixing (header, literal) tuples and plain bytes
+        continuation lines. Each yielded dict has 'seq', 'uid', 'size', 'attrs'
+        (non-literal response text) and 'literals' (section name -> bytes).
+        """
+        current = None
+        for item in msg_data:
+            if item is None:
+                continue
+            head = item[0] if isinstance(item, tuple) else item
+            head = head.decode('utf-8', errors='ignore') if isinstance(head, bytes) else str(head)
+            
+            start = re.match(r'\s*(\d+) \(', head)
+            if start:
+                if current:
+                    yield EmailClient._finish_fetch_message(current)
+                current = {'seq': start.group(1), 'attrs': '', 'literals': {}}
+                head = head[start.end():]
+            elif current is None:
+                continue
+            
+            if isinstance(item, tuple):
+                # Header ends with "<section> {size}" announcing the literal
+                section = re.search(r'(\S+(?: \([^)]*\)\])?) \{\d+\}$', head)
+                if section:
+                    current['literals'][section.group(1).replace('.PEEK', '')] = item[1]
+                    head = head[:section.start()]
+            current['attrs'] += ' ' + head
+        
+        if current:
+            yield EmailClient._finish_fetch_message(current)
+    
+    @staticmethod
+    def _finish_fetch_message(message: Dict) -> Dict:
+        """Pull common attributes out of the accumulated FETCH response text"""
+        uid_match = re.search(r'\bUID (\d+)', message['attrs'])
+        size_match = re.search(r'\bRFC822\.SIZE (\d+)', message['attrs'])
+        message['uid'] = uid_match.group(1) if uid_match else None
+        message['size'] = int(size_match.group(1)) if size_match else None
+        
+        msgid_match = re.search(r'\bX-GM-MSGID (\d+)', message['attrs'])
+        message['gm_msgid'] = msgid_match.group(1) if msgid_match else None
+        message['gm_labels'] = None
+        labels_at = message['attrs'].find('X-GM-LABELS (')
+        if labels_at >= 0:
+            try:
+                labels, _ = EmailClient._parse_imap_list(message['attrs'], labels_at + len('X-GM-LABELS '))
+                message['gm_labels'] = [label for label in labels if isinstance(label, str)]
+            except (ValueError, IndexError) as e:
+                logger.debug(f"Could not parse X-GM-LABELS: {e}")
+        return message
+    
+    @staticmethod
+    def _parse_bodystructure(attrs: str) -> Optional[list]:
+        """Parse the BODYSTRUCTURE item of a FETCH response into nested lists"""
+        start = attrs.find('BODYSTRUCTURE (')
+        if start < 0:
+            return None
+        try:
+            structure, _ = EmailClient._parse_imap_list(attrs, start + len('BODYSTRUCTURE '))
+            return structure
+        except (ValueError, IndexError) as e:
+            logger.debug(f"Could not parse BODYSTRUCTURE: {e}")
+            return None
+    
+    @staticmethod
+    def _parse_imap_list(text: str, pos: int) -> tuple:
+        """
+        Parse a parenthesized IMAP list starting at text[pos]
+        
+        Returns:
+            Tuple of (parsed list, position after the closing parenthesis).
+            Quoted strings and atoms become str, NIL becomes None.
+        """
+        if text[pos] != '(':
+            raise ValueError(f"Expected '(' at position {pos}")
+        items = []
+        pos += 1
+        while True:
+            while text[pos] == ' ':
+                pos += 1
+            char = text[pos]
+            if char == ')':
+                return items, pos + 1
+            if char == '(':
+                item, pos = EmailClient._parse_imap_list(text, pos)
+                items.append(item)
+            elif char == '"':
+                pos += 1
+                chars = []
+                while text[pos] != '"':
+                    if text[pos] == '\\':
+                        pos += 1
+                    chars.append(text[pos])
+                    pos += 1
+                items.append(''.join(chars))
+                pos += 1
+            elif char == '{':
+                raise ValueError("Literals inside BODYSTRUCTURE are not supported")
+            else:
+                atom = re.match(r'[^\s()]+', text[pos:]).group(0)
+                items.append(None if atom.upper() == 'NIL' else atom)
+                pos += len(atom)
+    
+    @staticmethod
+    def _summarize_bodystructure(structure: list) -> tuple:
+        """
+        Find the text part to download and whether the message has attachments
+        
+        Returns:
+            Tuple of (text part dict or None, has_attachments). The text part dict
+            has 'spec' (e.g. '1.1'), 'encoding', 'charset' and 'size'.
+        """
+        text_part = None
+        has_attachments = False
+        for spec, node in EmailClient._iter_body_parts(structure):
+            part = EmailClient._describe_body_part(node)
+            if part['disposition'] == 'attachment':
+                has_attachments = True
+            elif text_part is None and part['type'] == 'text/plain':
+                part['spec'] = spec
+                text_part = part
+        return text_part, has_attachments
+    
+    @staticmethod
+    def _iter_body_parts(node: list, prefix: str = '') -> Iterator[tuple]:
+        """Yield (part number, node) for every leaf part of a BODYSTRUCTURE"""
+        if node and isinstance(node[0], list):
+            # Multipart: child parts come first, followed by the subtype and extension data
+            index = 0
+            while index < len(node) and isinstance(node[index], list):
+                child_prefix = f"{prefix}.{index + 1}" if prefix else str(index + 1)
+                yield from EmailClient._iter_body_parts(node[index], child_prefix)
+                index += 1
+        else:
+            # A non-multipart message body is addressable as part 1
+            yield prefix or '1', node
+    
+    @staticmethod
+    def _describe_body_part(node: list) -> Dict:
+        """Extract type, encoding, charset, size and disposition from a single-part node"""
+        main_type = (node[0] or '').lower()
+        sub_type = (node[1] or '').lower()
+        params = node[2] if isinstance(node[2], list) else []
+        params = {str(params[i]).lower(): params[i + 1] for i in range(0, len(params) - 1, 2)}
+        size = node[6] if len(node) > 6 else None
+        
+        # Extension data follows the basic fields; text and message/rfc822 parts have extra ones
+        if main_type == 'text':
+            disposition_index = 9
+        elif (main_type, sub_type) == ('message', 'rfc822'):
+            disposition_index = 11
+        else:
+            disposition_index = 8
+        disposition = node[disposition_index] if len(node) > disposition_index else None
+        
+        return {
+            'type': f"{main_type}/{sub_type}",
+            'encoding': (node[5] or '7bit').lower() if len(node) > 5 else '7bit',
+            'charset': params.get('charset') or 'utf-8',
+            'size': int(size) if size and str(size).isdigit() else 0,
+            'disposition': (disposition[0] or '').lower() if isinstance(disposition, list) and disposition else None
+        }
+    
     @staticmethod
     def _decode_header(header: str) -> str:
         """Decode email header"""
@@ -286,40 +1043,6 @@ class EmailClient:
             return email.utils.parsedate_to_datetime(date_str)
         except Exception:
             return datetime.now(UTC)
-    
-    @staticmethod
-    def _extract_body(msg) -> str:
-        """Extract email body text"""
-        body = ''
-        
-        if msg.is_multipart():
-            for part in msg.walk():
-                content_type = part.get_content_type()
-                if content_type == 'text/plain':
-                    try:
-                        payload = part.get_payload(decode=True)
-                        if payload:
-                            body += payload.decode('utf-8', errors='ignore')
-                    except Exception:
-                        pass
-        else:
-            try:
-                payload = msg.get_payload(decode=True)
-                if payload:
-                    body = payload.decode('utf-8', errors='ignore')
-            except Exception:
-                pass
-        
-        return body.strip()
-    
-    @staticmethod
-    def _has_attachments(msg) -> bool:
-        """Check if email has attachments"""
-        if msg.is_multipart():
-            for part in msg.walk():
-                if part.get_content_disposition() == 'attachment':
-                    return True
-        return False
 
 
 # Example usage
@@ -0,0 +1,119 @@
+"""
+Gmail category tier: decide on emails from the inbox tab Gmail already sorted them into.
+Runs before the rules engine, so Promotions/Social/Updates/Forums mail never reaches
+rules, sender memory or the LLM when its category and age are enough.
+"""
+import logging
+import threading
+from datetime import datetime, UTC
+from typing import Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class GmailCategoryClassifier:
+    """Map a Gmail category plus email age to a recommendation"""
+    
+    # Gmail search names of the categories this tier acts on
+    CATEGORIES = ('promotions', 'social', 'updates', 'forums')
+    
+    # category -> (recommendation once older than its age threshold, recommendation before that)
+    # None leaves the email to the later tiers
+    CATEGORY_ACTIONS = {
+        'promotions': ('delete', 'archive'),
+        'social': ('delete', 'archive'),
+        'updates': ('delete', None),
+        'forums': ('archive', None),
+    }
+    
+    # Analysis.category recorded for each Gmail category
+    ANALYSIS_CATEGORIES = {
+        'promotions': 'promotional',
+        'social': 'social',
+        'updates': 'notification',
+        'forums': 'newsletter',
+    }
+    
+    def __init__(self, age_days: Optional[Dict[str, int]] = None, confidence: float = 0.9):
+        """
+        Initialize classifier
+        
+        Args:
+            age_days: Days after which each category gets its "old" recommendation
+            confidence: Confidence score given to decisions from this tier
+        """
+        self.age_days = {'promotions': 30, 'social': 30, 'updates': 90, 'forums': 60}
+        self.age_days.update(age_days or {})
+        self.confidence = confidence
+        self.stats = {category: 0 for category in self.CATEGORIES}
+        self._stats_lock = threading.Lock()  # classify runs on several pipeline threads
+    
+    def category_from_labels(self, labels: Iterable[str]) -> Optional[str]:
+        """
+        Find a category among an email's X-GM-LABELS
+        
+        Gmail itself does not list categories in X-GM-LABELS, but labels such as
+        'CATEGORY_PROMOTIONS' or 'Promotions' (e.g. set by filters or migrated
+        mailboxes) are honoured.
+        """
+        for label in labels or ():
+            name = label.lstrip('\\').rsplit('/', 1)[-1].lower()
+            if name.startswith('category_'):
+                name = name[len('category_'):]
+            if name in self.CATEGORY_ACTIONS:
+                return name
+        return None
+    
+    def classify(self, email_data: Dict, category: Optional[str] = None) -> Optional[Dict]:
+        """
+        Decide on an email from its Gmail category and age
+        
+        Args:
+            email_data: Email data dictionary (uses 'date' and 'gm_labels')
+            category: Category found by folder membership; falls back to the labels
+        
+        Returns:
+            Analysis result dict, or None if the email should go to the next tier
+        """
+        category = category or self.category_from_labels(email_data.get('gm_labels'))
+        if category not in self.CATEGORY_ACTIONS:
+            return None
+        
+        old_recommendation, recent_recommendation = self.CATEGORY_ACTIONS[category]
+        age_days = self._age_days(email_data.get('date'))
+        if age_days is None:
+            return None
+        
+        is_old = age_days > self.age_days[category]
+        recommendation = old_recommendation if is_old else recent_recommendation
+        if not recommendation:
+            return None
+        
+        with self._stats_lock:
+            self.stats[category] += 1
+        if is_old:
+            reasoning = f'Gmail {category.title()} email older than {self.age_days[category]} days'
+        else:
+            reasoning = f'Gmail {category.title()} email'
+        return {
+            'recommendation': recommendation,
+            'confidence_score': self.confidence,
+            'reasoning': reasoning,
+            'category': self.ANALYSIS_CATEGORIES[category],
+            'priority': 'low',
+            'gmail_category': category
+        }
+    
+    def get_stats(self) -> Dict:
+        """Get number of emails decided per category"""
+        with self._stats_lock:
+            return self.stats.copy()
+    
+    @staticmethod
+    def _age_days(received_date: Optional[datetime]) -> Optional[int]:
+        if not received_date:
+            return None
+        # Handle both timezone-aware and naive datetimes
+        if received_date.tzinfo is None:
+            received_date = received_date.replace(tzinfo=UTC)
+        return (datetime.now(UTC) - received_date).days
@@ -0,0 +1,145 @@
+"""
+Pool of authenticated IMAP connections for fetching large mailboxes in parallel.
+The UID list is split into ranges that are fetched concurrently, one range per connection at a time.
+"""
+import logging
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from email_client import EmailClient
+
+logger = logging.getLogger(__name__)
+
+
+class IMAPConnectionPool:
+    """Fixed-size pool of EmailClient sessions with the same folder selected"""
+    
+    def __init__(self, server: str, email_address: str, password: str, port: int = 993,
+                 size: int = 4, fetch_chunk_size: int = 200, max_body_bytes: int = 8192,
+                 max_body_chars: int = 50000):
+        """
+        Initialize connection pool
+        
+        Args:
+            server: IMAP server address
+            email_address: Your email address
+            password: Email password or app-specific password
+            port: IMAP port (default 993 for SSL)
+            size: Number of sessions to open (keep under the provider's limit, e.g. 15 for Gmail)
+            fetch_chunk_size: Messages per FETCH command, and per shard handed to a session
+            max_body_bytes: Bytes of the text part downloaded by partial fetches
+            max_body_chars: Body text kept per email when parsing full messages
+        """
+        self.server = server
+        self.email_address = email_address
+        self.password = password
+        self.port = port
+        self.size = max(size, 1)
+        self.fetch_chunk_size = max(fetch_chunk_size, 1)
+        self.max_body_bytes = max_body_bytes
+        self.max_body_chars = max_body_chars
+        self.clients: List[EmailClient] = []
+        self._idle = queue.Queue()
+    
+    def open(self, folder: str = 'INBOX') -> int:
+        """
+        Open and authenticate all sessions, selecting the folder on each
+        
+        Returns:
+            Number of sessions that are ready (0 if none could connect)
+        """
+        def open_one(_):
+            client = EmailClient(
+                server=self.server,
+                email_address=self.email_address,
+                password=self.password,
+                port=self.port,
+                fetch_chunk_size=self.fetch_chunk_size,
+                max_body_bytes=self.max_body_bytes,
+                max_body_chars=self.max_body_chars
+            )
+            if client.connect() and client.select_folder(folder):
+                return client
+            client.disconnect()
+            return None
+        
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            for client in executor.map(open_one, range(self.size)):
+                if client:
+                    self.clients.append(client)
+                    self._idle.put(client)
+        
+        logger.info(f"Opened {len(self.clients)}/{self.size} IMAP sessions on '{folder}'")
+        return len(self.clients)
+    
+    def close(self):
+        """Log out of every session"""
+        for client in self.clients:
+            client.disconnect()
+        self.clients = []
+        self._idle = queue.Queue()
+    
+    def is_alive(self) -> bool:
+        """Check that every session still answers"""
+        return bool(self.clients) and all(client.is_alive() for client in self.clients)
+    
+    @contextmanager
+    def session(self) -> Iterator[EmailClient]:
+        """Borrow an idle session for the duration of a with block (waits if all are busy)"""
+        if not self.clients:
+            raise RuntimeError("Connection pool is not open")
+        client = self._idle.get()
+        try:
+            yield client
+        finally:
+            self._idle.put(client)
+    
+    def run_sharded(self, uids: List[str], fetch: Callable[[EmailClient, List[str]], List[Dict]]) -> List[Dict]:
+        """
+        Split uids into contiguous shards and run fetch on them concurrently
+        
+        Each shard is handled by whichever session is free; a session is never used
+        by two threads at once.
+        
+        Args:
+            uids: List of IMAP UIDs
+            fetch: Function taking (client, shard_uids) and returning email data dicts
+        
+        Returns:
+            Results of every shard, merged back in the order of uids
+        """
+        if not self.clients:
+            raise RuntimeError("Connection pool is not open")
+        
+        shards = [uids[start:start + self.fetch_chunk_size]
+                  for start in range(0, len(uids), self.fetch_chunk_size)]
+        
+        def run_shard(shard: List[str]) -> List[Dict]:
+            with self.session() as client:
+                return fetch(client, shard)
+        
+        logger.info(f"Fetching {len(uids)} emails in {len(shards)} shards over {len(self.clients)} sessions")
+        results = []
+        with ThreadPoolExecutor(max_workers=len(self.clients)) as executor:
+            # executor.map yields shard results in submission order
+            for shard_results in executor.map(run_shard, shards):
+                results.extend(shard_results)
+        return results
+    
+    def fetch_emails_batch(self, uids: List[str], use_uid: bool = True) -> List[Dict]:
+        """Fetch full emails by UID across the pool (same result as EmailClient.fetch_emails_batch)"""
+        if not use_uid:
+            raise ValueError("Sequence numbers are per-session; the pool only fetches by UID")
+        return self.run_sharded(uids, lambda client, shard: client.fetch_emails_batch(shard, use_uid=True))
+    
+    def fetch_headers_batch(self, uids: List[str]) -> List[Dict]:
+        """Fetch header-only records across the pool"""
+        return self.run_sharded(uids, lambda client, shard: client.fetch_headers_batch(shard))
+    
+    def fetch_emails_partial(self, uids: List[str], max_body_bytes: Optional[int] = None) -> List[Dict]:
+        """Fetch text parts only (no attachments) across the pool"""
+        return self.run_sharded(
+            uids, lambda client, shard: client.fetch_emails_partial(shard, max_body_bytes=max_body_bytes)
+        )
@@ -0,0 +1,235 @@
+"""
+Persistent cache of LLM analyses, keyed by what the model was asked.
+An entry is found again only when the model, the prompt version and the email's
+prompt (after whitespace normalization) are all unchanged, so rescans of untouched
+mail skip Ollama entirely. Entries expire after a TTL and the least recently used
+ones are evicted beyond a size limit.
+"""
+import argparse
+import hashlib
+import json
+import logging
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import LLMCacheEntry, init_db, get_session
+from settings import load_settings
+
+logger = logging.getLogger(__name__)
+
+# Analysis fields stored in the cache (model metadata is added by the analyzer)
+CACHED_FIELDS = ('recommendation', 'confidence_score', 'reasoning', 'category', 'priority')
+
+
+class LLMResponseCache:
+    """Content-addressed cache of parsed LLM analyses in the llm_cache table"""
+    
+    def __init__(self, db_session, max_entries: int = 50000, ttl_days: float = 30):
+        """
+        Initialize cache
+        
+        New entries and hit counts are buffered in memory and written by flush(),
+        which the caller runs when its own transaction is committed (SQLite allows
+        one writer at a time). Lookups use short-lived sessions of their own, so
+        the cache can be shared by worker threads.
+        
+        Args:
+            db_session: Session whose engine holds the llm_cache table
+            max_entries: Entries kept after eviction (least recently used go first)
+            ttl_days: Age after which an entry is no longer used
+        """
+        self.bind = db_session.get_bind()
+        self.max_entries = max(max_entries, 1)
+        self.ttl = timedelta(days=ttl_days)
+        self._pending: Dict[str, tuple] = {}  # key -> (model name, analysis) not yet written
+        self._touched = Counter()  # key -> hits since the last flush
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+    
+    @staticmethod
+    def make_key(model: str, prompt_version: str, prompt: str) -> str:
+        """
+        Hash the inputs that determine an answer
+        
+        Args:
+            model: Ollama model name
+            prompt_version: Version of the instructions the prompt is sent with
+            prompt: The email's prompt (whitespace differences are ignored)
+        
+        Returns:
+            Hex SHA-256 digest
+        """
+        normalized = ' '.join(prompt.split())
+        return hashlib.sha256(f"{model}\0{prompt_version}\0{normalized}".encode('utf-8')).hexdigest()
+    
+    def get(self, key: str) -> Optional[Dict]:
+        """
+        Look up a cached analysis
+        
+        Returns:
+            Copy of the cached analysis, or None on a miss (or an expired entry)
+        """
+        with self._lock:
+            pending = self._pending.get(key)
+        
+        analysis = None
+        if pending:
+            analysis = dict(pending[1])
+        else:
+            session = Session(bind=self.bind)
+            try:
+                entry = session.query(LLMCacheEntry).filter_by(cache_key=key).first()
+                if entry and entry.created_at >= datetime.utcnow() - self.ttl:
+                    analysis = json.loads(entry.analysis)
+            except Exception as e:
+                logger.warning(f"LLM cache lookup failed: {e}")
+            finally:
+                session.close()
+        
+        with self._lock:
+            if analysis is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._touched[key] += 1
+        return analysis
+    
+    def put(self, key: str, model_name: str, analysis: Dict):
+        """Remember an analysis (written at the next flush)"""
+        with self._lock:
+            self._pending[key] = (model_name, {field: analysis.get(field) for field in CACHED_FIELDS})
+            self.stores += 1
+    
+    def flush(self) -> int:
+        """
+        Write buffered entries and hit counts, then evict expired and surplus entries
+        
+        Returns:
+            Number of new entries written
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            touched, self._touched = self._touched, Counter()
+        if not pending and not touched:
+            return 0
+        
+        now = datetime.utcnow()
+        session = Session(bind=self.bind)
+        try:
+            keys = set(pending) | set(touched)
+            existing = {entry.cache_key: entry for entry in
+                        session.query(LLMCacheEntry).filter(LLMCacheEntry.cache_key.in_(keys)).all()} if keys else {}
+            
+            for key, (model_name, analysis) in pending.items():
+                entry = existing.get(key)
+                if entry is None:
+                    entry = LLMCacheEntry(cache_key=key, hits=0)
+                    session.add(entry)
+                    existing[key] = entry
+                entry.model_name = model_name
+                entry.analysis = json.dumps(analysis)
+                entry.created_at = now
+                entry.last_used_at = now
+            
+            for key, count in touched.items():
+                entry = existing.get(key)
+                if entry is not None:
+                    entry.hits = (entry.hits or 0) + count
+                    entry.last_used_at = now
+            
+            session.flush()
+            if pending:
+                self._evict(session, now)
+            session.commit()
+            return len(pending)
+        except Exception as e:
+            logger.warning(f"Could not write LLM cache: {e}")
+            session.rollback()
+            return 0
+        finally:
+            session.close()
+    
+    def _evict(self, session, now: datetime):
+        """Delete expired entries, then the least recently used ones above max_entries"""
+        removed = session.query(LLMCacheEntry).filter(
+            LLMCacheEntry.created_at < now - self.ttl
+        ).delete(synchronize_session=False)
+        
+        surplus = session.query(func.count(LLMCacheEntry.id)).scalar() - self.max_entries
+        if surplus > 0:
+            oldest = session.query(LLMCacheEntry.id).order_by(LLMCacheEntry.last_used_at).limit(surplus)
+            removed += session.query(LLMCacheEntry).filter(
+                LLMCacheEntry.id.in_(oldest.scalar_subquery())
+            ).delete(synchronize_session=False)
+        
+        if removed:
+            self.evictions += removed
+            logger.info(f"LLM cache evicted {removed} entries")
+    
+    def clear(self) -> int:
+        """Delete every cached entry; returns the number removed"""
+        with self._lock:
+            self._pending.clear()
+            self._touched.clear()
+        session = Session(bind=self.bind)
+        try:
+            removed = session.query(LLMCacheEntry).delete()
+            session.commit()
+            return removed
+        finally:
+            session.close()
+    
+    def get_stats(self) -> Dict:
+        """Get hit/miss counters of this process"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'stores': self.stores,
+            'evictions': self.evictions
+        }
+
+
+def main():
+    """Show or clear the LLM response cache"""
+    parser = argparse.ArgumentParser(description='LLM response cache maintenance')
+    parser.add_argument('--clear', action='store_true', help='Delete all cached analyses')
+    args = parser.parse_args()
+    
+    # Load settings
+    config = load_settings()
+    
+    # Initialize database
+    engine = init_db(config.database_url)
+    db_session = get_session(engine)
+    
+    try:
+        cache = LLMResponseCache(db_session, config.llm_cache_max_entries, config.llm_cache_ttl_days)
+        if args.clear:
+            print(f"✓ Removed {cache.clear()} cached analyses")
+            return
+        
+        total, hits = db_session.query(func.count(LLMCacheEntry.id), func.sum(LLMCacheEntry.hits)).one()
+        print("=== LLM Response Cache ===\n")
+        print(f"  Entries: {total} (limit {cache.max_entries}, TTL {cache.ttl.days} days)")
+        print(f"  Hits served: {hits or 0}")
+        for model_name, count in db_session.query(
+            LLMCacheEntry.model_name, func.count(LLMCacheEntry.id)
+        ).group_by(LLMCacheEntry.model_name).all():
+            print(f"    {model_name}: {count} entries")
+    
+    finally:
+        db_session.close()
+
+
+if __name__ == '__main__':
+    main()
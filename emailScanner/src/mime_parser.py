@@ -0,0 +1,268 @@
+"""
+Streaming MIME parser for fetched emails.
+Feeds raw bytes to BytesFeedParser with the compat32 policy and keeps only what the
+scanner stores: a few decoded headers, body text up to a size cap, and whether the
+email has attachments. Attachment payloads are skipped without being buffered or decoded.
+"""
+import base64
+import email.policy
+import email.utils
+import logging
+import quopri
+import re
+from email.feedparser import BytesFeedParser
+from email.message import Message
+from email.parser import BytesHeaderParser
+from typing import Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Raw bytes handed to the feed parser per call
+FEED_CHUNK_BYTES = 64 * 1024
+
+# Encoded text kept per body character we want (covers base64 and quoted-printable UTF-8)
+ENCODED_CHARS_PER_CHAR = 6
+
+
+def decode_part(data: bytes, encoding: str, charset: str) -> str:
+    """Decode a (possibly truncated) body part using its transfer encoding and charset"""
+    try:
+        if encoding == 'base64':
+            # A byte range can cut a base64 quantum in half; drop the partial tail
+            compact = re.sub(rb'[^A-Za-z0-9+/=]', b'', data)
+            data = base64.b64decode(compact[:len(compact) - len(compact) % 4])
+        elif encoding == 'quoted-printable':
+            data = quopri.decodestring(data)
+    except Exception as e:
+        logger.debug(f"Could not decode {encoding} body part: {e}")
+    
+    try:
+        return data.decode(charset, errors='ignore')
+    except LookupError:
+        return data.decode('utf-8', errors='ignore')
+
+
+class _PartFilter:
+    """
+    Line filter in front of the feed parser
+    
+    Passes header blocks and boundary lines through untouched, drops the bodies of
+    attachments and other non-text parts, and truncates text bodies to a byte budget.
+    The feed parser therefore never buffers attachment data, and a long line that is
+    being dropped is never held in full either.
+    """
+    
+    # Pending partial lines longer than this cannot be boundaries (those are < 80 bytes)
+    MAX_SKIPPED_LINE = 1024
+    
+    def __init__(self, body_limit: int):
+        self.body_limit = body_limit
+        self.boundaries = []  # b'--boundary' of open multiparts, innermost last
+        self.in_headers = True
+        self.header_lines = []
+        self.keep_body = True
+        self.body_bytes = 0
+        self.pending = b''  # incomplete last line of the previous chunk
+        self.discarding = False  # rest of the current line is being dropped
+    
+    def feed(self, chunk: bytes) -> List[bytes]:
+        """Filter a chunk of raw bytes; returns the pieces to hand to the feed parser"""
+        lines = (self.pending + chunk).split(b'\n')
+        self.pending = lines.pop()
+        
+        out = []
+        for line in lines:
+            if self.discarding:
+                self.discarding = False
+                continue
+            out.extend(self._line(line + b'\n'))
+        
+        if not self.in_headers and len(self.pending) > self.MAX_SKIPPED_LINE \
+                and (not self.keep_body or len(self.pending) > self.body_limit - self.body_bytes):
+            line, self.pending = self.pending, b''
+            if not self.discarding:
+                self.discarding = True
+                out.extend(self._body(line + b'\n'))
+        return out
+    
+    def close(self) -> List[bytes]:
+        """Flush the final line (emails do not always end with a newline)"""
+        line, self.pending = self.pending, b''
+        if not line or self.discarding:
+            return []
+        return self._line(line)
+    
+    def _line(self, line: bytes) -> List[bytes]:
+        stripped = line.rstrip()
+        if stripped.startswith(b'--'):
+            for depth in range(len(self.boundaries) - 1, -1, -1):
+                boundary = self.boundaries[depth]
+                if stripped == boundary:
+                    del self.boundaries[depth + 1:]
+                    self.in_headers = True
+                    return [line]
+                if stripped == boundary + b'--':
+                    # Anything up to the parent's next boundary is epilogue
+                    del self.boundaries[depth:]
+                    self.keep_body = False
+                    return [line]
+        
+        if self.in_headers:
+            self.header_lines.append(line)
+            if not stripped:
+                self._end_headers()
+            return [line]
+        return self._body(line)
+    
+    def _end_headers(self):
+        """Decide from a part's headers whether its body is kept"""
+        headers = BytesHeaderParser(policy=email.policy.compat32).parsebytes(b''.join(self.header_lines))
+        self.header_lines = []
+        self.in_headers = False
+        self.body_bytes = 0
+        
+        boundary = headers.get_boundary() if headers.get_content_maintype() == 'multipart' else None
+        if boundary:
+            self.boundaries.append(b'--' + boundary.encode('utf-8', errors='surrogateescape'))
+            self.keep_body = False  # preamble
+        elif headers.get_content_type() == 'message/rfc822':
+            self.in_headers = True  # the embedded message's own headers follow
+        else:
+            self.keep_body = (headers.get_content_maintype() == 'text'
+                              and headers.get_content_disposition() != 'attachment')
+    
+    def _body(self, line: bytes) -> List[bytes]:
+        room = self.body_limit - self.body_bytes
+        if not self.keep_body or room <= 0:
+            return []
+        if len(line) > room:
+            line = line[:room] + b'\n'
+            self.body_bytes = self.body_limit
+        else:
+            self.body_bytes += len(line)
+        return [line]
+
+
+class MimeParser:
+    """Bounded-memory parser turning raw RFC822 bytes into the fields the scanner stores"""
+    
+    # Headers decoded for every email; everything else stays raw
+    STORED_HEADERS = ('From', 'To', 'Subject', 'Date', 'List-Id', 'List-Unsubscribe')
+    
+    # Headers holding addresses, normalized so sender strings match earlier scans
+    ADDRESS_HEADERS = ('From', 'To')
+    
+    def __init__(self, max_body_chars: int = 50000):
+        """
+        Initialize parser
+        
+        Args:
+            max_body_chars: Body text kept per email; parts past the cap are not decoded
+        """
+        self.max_body_chars = max(max_body_chars, 1)
+    
+    def parse(self, raw_email: bytes) -> Optional[Dict]:
+        """
+        Parse a complete raw email
+        
+        Returns:
+            Dict with 'headers' (STORED_HEADERS, still RFC 2047 encoded), 'body'
+            and 'has_attachments', or None if the message could not be parsed
+        """
+        return self.parse_stream(raw_email[start:start + FEED_CHUNK_BYTES]
+                                 for start in range(0, len(raw_email), FEED_CHUNK_BYTES))
+    
+    def parse_stream(self, chunks: Iterable[bytes]) -> Optional[Dict]:
+        """
+        Parse an email arriving in chunks (e.g. straight off a socket)
+        
+        Attachment bodies are filtered out before they reach the feed parser and
+        text parts are cut to what max_body_chars can need, so memory stays bounded
+        no matter how large the email is.
+        """
+        line_filter = _PartFilter(self.max_body_chars * ENCODED_CHARS_PER_CHAR)
+        try:
+            parser = BytesFeedParser(policy=email.policy.compat32)
+            for chunk in chunks:
+                for data in line_filter.feed(chunk):
+                    parser.feed(data)
+            for data in line_filter.close():
+                parser.feed(data)
+            msg = parser.close()
+        except Exception as e:
+            logger.error(f"Could not parse email: {e}")
+            return None
+        
+        headers = self._stored_headers(msg)
+        body, has_attachments = self._collect_body(msg)
+        return {'headers': headers, 'body': body, 'has_attachments': has_attachments}
+    
+    def _collect_body(self, msg: Message) -> tuple:
+        """
+        Concatenate text/plain parts (or the single part of a non-multipart email) up to the cap
+        
+        Returns:
+            Tuple of (body text, has_attachments)
+        """
+        if not msg.is_multipart():
+            return self._decode_payload(msg)[:self.max_body_chars].strip(), False
+        
+        body = ''
+        has_attachments = False
+        for part in msg.walk():
+            # Containers count too: a forwarded message/rfc822 is often the attachment itself
+            attachment = part.get_content_disposition() == 'attachment'
+            has_attachments = has_attachments or attachment
+            if part.is_multipart() or attachment:
+                continue
+            if part.get_content_type() == 'text/plain' and len(body) < self.max_body_chars:
+                body += self._decode_payload(part)
+        
+        return body[:self.max_body_chars].strip(), has_attachments
+    
+    @staticmethod
+    def _decode_payload(part: Message) -> str:
+        """Decode one leaf part's payload using its transfer encoding and charset"""
+        payload = part.get_payload()
+        if not isinstance(payload, str) or not payload:
+            return ''
+        charset = part.get_content_charset() or 'utf-8'
+        try:
+            # compat32 keeps undecodable bytes as surrogate escapes; this restores them
+            data = payload.encode('ascii', errors='surrogateescape')
+        except UnicodeEncodeError:
+            # 8-bit payloads come back already decoded with the part's charset
+            data = payload.encode(charset, errors='replace')
+        encoding = str(part.get('Content-Transfer-Encoding', '')).strip().lower()
+        return decode_part(data, encoding, charset)
+    
+    def _stored_headers(self, msg: Message) -> Dict[str, str]:
+        """
+        Pick the first occurrence of each stored header without decoding the rest
+        
+        Values are unfolded; raw 8-bit header bytes (not RFC 2047 encoded) are
+        recovered as UTF-8.
+        """
+        wanted = {name.lower(): name for name in self.STORED_HEADERS}
+        headers = {name: '' for name in self.STORED_HEADERS}
+        # raw_items() skips compat32's Header wrapping of 8-bit values
+        for name, value in msg.raw_items():
+            key = wanted.get(name.lower())
+            if key and not headers[key]:
+                value = value.encode('ascii', errors='surrogateescape').decode('utf-8', errors='replace')
+                value = re.sub(r'\r?\n(?=[ \t])', '', value).strip()
+                headers[key] = self._normalize_addresses(value) if key in self.ADDRESS_HEADERS else value
+        return headers
+    
+    @staticmethod
+    def _normalize_addresses(value: str) -> str:
+        """
+        Format an address list the way email.policy.default prints it
+        
+        e.g. '"Shop" <deals@shop.com>' -> 'Shop <deals@shop.com>'. Sender memory and
+        rules compare these strings, so they must not change with the parser.
+        """
+        addresses = email.utils.getaddresses([value])
+        if not addresses or not any(address for _, address in addresses):
+            return value
+        return ', '.join(email.utils.formataddr(pair) for pair in addresses)
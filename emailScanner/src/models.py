@@ -4,19 +4,23 @@ Tracks emails, AI analysis, human decisions, and learned rules.
 """
 from datetime import datetime
 from pathlib import Path
-from sqlalchemy import create_engine, Column, Integer, String, Text, DateTime, Float, Boolean, ForeignKey
+from sqlalchemy import create_engine, Column, Integer, BigInteger, String, Text, DateTime, Float, Boolean, ForeignKey, Index, and_
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship, sessionmaker
 
 Base = declarative_base()
 
+# Decision.action_taken for rows written by `cleanup.py --auto-delete`; not a human review
+AUTO_DELETED = 'auto_deleted'
+
 
 class Email(Base):
     """Email metadata and content"""
     __tablename__ = 'emails'
     
     id = Column(Integer, primary_key=True)
-    email_id = Column(String(255), unique=True, nullable=False, index=True)  # IMAP UID (unique and persistent)
+    email_id = Column(String(255), nullable=False, index=True)  # IMAP UID (unique per folder and UIDVALIDITY)
+    gm_msgid = Column(String(20), nullable=True, index=True)  # Gmail X-GM-MSGID (same in every folder)
     sender = Column(String(255), nullable=False, index=True)
     recipient = Column(String(255))
     subject = Column(String(500))
@@ -36,6 +40,11 @@ class Email(Base):
     analysis = relationship("Analysis", back_populates="email", uselist=False)
     decision = relationship("Decision", back_populates="email", uselist=False)
     
+    # IMAP UIDs only identify a message within one mailbox
+    __table_args__ = (
+        Index('ix_emails_folder_email_id', 'folder', 'email_id', unique=True),
+    )
+    
     def __repr__(self):
         return f"<Email(id={self.id}, sender={self.sender}, subject={self.subject[:30]})>"
 
@@ -82,8 +91,8 @@ class Decision(Base):
     email_id = Column(Integer, ForeignKey('emails.id'), nullable=False, unique=True, index=True)
     
     # Human decision
-    approved = Column(Boolean, nullable=False)  # True = agreed with AI, False = disagreed
-    action_taken = Column(String(20))  # 'deleted', 'kept', 'archived'
+    approved = Column(Boolean, nullable=True)  # True = agreed with AI, False = disagreed, None = not reviewed
+    action_taken = Column(String(20))  # 'deleted', 'kept', 'archived', or AUTO_DELETED
     notes = Column(Text)  # Optional human notes
     
     # Timestamps
@@ -92,6 +101,11 @@ class Decision(Base):
     # Relationships
     email = relationship("Email", back_populates="decision")
     
+    @classmethod
+    def human_reviewed(cls):
+        """Filter clause for decisions a person actually made (excludes auto-deletions)"""
+        return and_(cls.action_taken.isnot(None), cls.action_taken != AUTO_DELETED)
+    
     def __repr__(self):
         return f"<Decision(id={self.id}, approved={self.approved}, action={self.action_taken})>"
 
@@ -149,6 +163,94 @@ class SystemStats(Base):
         return f"<SystemStats(processed={self.total_emails_processed}, accuracy={self.ai_accuracy_rate})>"
 
 
+class CalibrationCurve(Base):
+    """Fitted confidence calibration curve for one model/category (see calibration_fit.py)"""
+    __tablename__ = 'calibration_curves'
+    
+    id = Column(Integer, primary_key=True)
+    model_name = Column(String(100), nullable=True, index=True)  # None = curve over all models
+    category = Column(String(50), nullable=True)  # None = curve over all categories of the model
+    method = Column(String(20), nullable=False)  # 'isotonic' or 'platt'
+    
+    # Lookup table: stated confidences (ascending) and the accuracy observed at each
+    thresholds = Column(Text, nullable=False)  # JSON list of floats
+    values = Column(Text, nullable=False)  # JSON list of floats, non-decreasing
+    sample_count = Column(Integer, default=0)
+    
+    # Timestamps
+    fitted_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<CalibrationCurve(model={self.model_name}, category={self.category}, method={self.method}, n={self.sample_count})>"
+
+
+class LLMCacheEntry(Base):
+    """Cached LLM analysis, keyed by a hash of the prompt inputs (see llm_cache.py)"""
+    __tablename__ = 'llm_cache'
+    
+    id = Column(Integer, primary_key=True)
+    cache_key = Column(String(64), unique=True, nullable=False, index=True)  # SHA-256 of model, prompt version and email prompt
+    model_name = Column(String(100))
+    analysis = Column(Text, nullable=False)  # JSON: recommendation, confidence_score, reasoning, category, priority
+    hits = Column(Integer, default=0)
+    
+    # Timestamps
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)  # TTL is counted from here
+    last_used_at = Column(DateTime, default=datetime.utcnow, index=True)  # Least recently used entries are evicted first
+    
+    def __repr__(self):
+        return f"<LLMCacheEntry(key={self.cache_key[:12]}, model={self.model_name}, hits={self.hits})>"
+
+
+class FolderSyncState(Base):
+    """Per-folder IMAP checkpoint so scans only ask the server for new messages"""
+    __tablename__ = 'folder_sync_state'
+    
+    id = Column(Integer, primary_key=True)
+    folder = Column(String(100), unique=True, nullable=False, index=True)
+    
+    # IMAP state at the last completed scan
+    uidvalidity = Column(BigInteger, nullable=False)  # UIDs are only comparable while this is unchanged
+    last_seen_uid = Column(BigInteger, default=0)  # Every UID up to here has been processed
+    highest_modseq = Column(BigInteger, nullable=True)  # CONDSTORE HIGHESTMODSEQ (None if unsupported)
+    
+    # Timestamps
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    
+    def __repr__(self):
+        return f"<FolderSyncState(folder={self.folder}, uidvalidity={self.uidvalidity}, last_seen_uid={self.last_seen_uid})>"
+
+
+class ScanRun(Base):
+    """A scan's UID work list and progress, so an interrupted scan can be resumed"""
+    __tablename__ = 'scan_runs'
+    
+    id = Column(Integer, primary_key=True)
+    folder = Column(String(100), nullable=False, index=True)
+    status = Column(String(20), nullable=False, default='running', index=True)  # 'running', 'interrupted', 'completed', 'superseded', 'abandoned'
+    rescan = Column(Boolean, default=False)
+    
+    # Work list
+    uidvalidity = Column(BigInteger, nullable=True)  # UIDs below are only valid while this is unchanged
+    uids = Column(Text, nullable=False)  # JSON list of UIDs to process, in order
+    new_uids = Column(Text)  # JSON list of UIDs from the incremental search (for the folder checkpoint)
+    position = Column(Integer, default=0)  # Index into uids of the next UID to process
+    
+    # Counters
+    processed_count = Column(Integer, default=0)
+    failed_count = Column(Integer, default=0)
+    stage_counts = Column(Text)  # JSON: emails fetched and emails decided per tier (rules_engine, pattern_memory, LLM model)
+    last_error = Column(Text)
+    
+    # Timestamps
+    started_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+    
+    def __repr__(self):
+        return f"<ScanRun(id={self.id}, folder={self.folder}, status={self.status}, position={self.position})>"
+
+
 # Database initialization
 def init_db(db_url='sqlite:///data/email_scanner.db'):
     """Initialize database and create all tables"""
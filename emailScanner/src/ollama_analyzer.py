@@ -3,18 +3,200 @@ Ollama integration for analyzing emails and making delete/keep recommendations.
 Uses local LLM models for privacy and cost-effectiveness.
 Includes few-shot learning from past human decisions.
 """
+import copy
+import hashlib
 import json
 import logging
-from typing import Dict, Optional, List
+import math
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional, List, Tuple
 import requests
+from requests.adapters import HTTPAdapter
+
+from ollama_hosts import OllamaHost, OllamaHostPool
 
 logger = logging.getLogger(__name__)
 
+# What the model is asked to return for each email
+TASK_FIELDS = """1. Recommendation: Should this email be "delete", "keep", or "archive"?
+2. Confidence: Your confidence level (0.0 to 1.0)
+3. Reasoning: Brief explanation for your recommendation
+4. Category: Email category (e.g., "newsletter", "personal", "promotional", "notification", "spam", "important", "job_offer", "recruiter")
+5. Priority: Priority level ("low", "medium", "high")"""
+
+# Classification guidelines shared by single and batched prompts
+GUIDELINES = """Guidelines:
+- Recommend "delete" for: 
+  * Spam and unsolicited emails
+  * Old newsletters (more than a week old) - REGARDLESS of source reputation (NASA, news sites, etc.)
+  * Promotional/sale emails from companies (especially if older than 30-60 days)
+  * Job offers and recruiter emails (especially if old or unsolicited)
+  * Automated notifications with no value
+  * Mass marketing emails
+  * Old transactional emails (receipts, confirmations older than 90 days)
+  * Any bulk/broadcast email that is more than 7 days old
+  
+- Consider email age carefully:
+  * Recent emails (< 7 days): Be more conservative, might still be relevant
+  * Medium age (7-30 days): Normal evaluation - newsletters/promotional should be deleted
+  * Old emails (30-60 days): More aggressive deletion for promotional/newsletter content
+  * Very old emails (60+ days): Very aggressive deletion unless personal/important
+  
+- Newsletter indicators (should be deleted if > 7 days old):
+  * Generic "newsletter" format with multiple articles/sections
+  * Mass-sent emails with unsubscribe links
+  * Automated digest emails
+  * Regular updates from organizations (even reputable ones like NASA, news sites)
+  * Any email that feels like a broadcast rather than personal communication
+  
+- Recommend "keep" for: 
+  * Personal correspondence from real people
+  * Important business emails
+  * Emails requiring action or response
+  * Emails from family, friends, or close contacts
+  
+- Recommend "archive" for: 
+  * Receipts and order confirmations
+  * Reference materials that might be needed later
+  * Travel confirmations and bookings
+  * Important records and documentation
+
+Recruiter/Job Email Indicators:
+- Emails from recruiters or staffing agencies (e.g., @vdartinc.com, @teksystems.com, etc.)
+- Subjects containing: "position", "role", "opportunity", "contract", "remote", "developer", "engineer"
+- Language like: "immediate need", "hiring for", "seeking candidates", "job opening"
+- Emails offering job positions or contract roles
+→ These should be marked as "delete" with category "job_offer" or "recruiter"
+
+Be conservative: if unsure, prefer "keep" or "archive" over "delete"
+Higher confidence (>0.8) for clear spam/newsletters/recruiters, lower confidence (<0.6) for ambiguous emails"""
+
+# Static instructions sent as the system message. It is identical for every request,
+# so Ollama can reuse its evaluated prefix and only process the per-email user message.
+SYSTEM_PROMPT = f"""You are an email classification assistant. You analyze emails and recommend whether each one should be deleted, kept or archived.
+
+For each email, provide:
+{TASK_FIELDS}
+
+{GUIDELINES}
+
+For a single email, respond in JSON format:
+{{
+    "recommendation": "delete|keep|archive",
+    "confidence_score": 0.85,
+    "reasoning": "Brief explanation here",
+    "category": "newsletter",
+    "priority": "low"
+}}
+
+When several numbered emails are given, respond with a JSON array containing one such object per email, in the same order, each with the email's number as "index":
+[
+    {{"index": 1, "recommendation": "delete", "confidence_score": 0.85, "reasoning": "Brief explanation here", "category": "newsletter", "priority": "low"}},
+    {{"index": 2, "recommendation": "keep", "confidence_score": 0.7, "reasoning": "Brief explanation here", "category": "personal", "priority": "medium"}}
+]
+
+Respond ONLY with valid JSON, no other text."""
+
+# Changes whenever the instructions change, so cached answers to older prompts are not reused
+PROMPT_VERSION = hashlib.sha256(SYSTEM_PROMPT.encode('utf-8')).hexdigest()[:12]
+
+# JSON schemas passed as Ollama's `format`, so the model can only produce matching output
+ANALYSIS_SCHEMA = {
+    'type': 'object',
+    'properties': {
+        'recommendation': {'type': 'string', 'enum': ['delete', 'keep', 'archive']},
+        'confidence_score': {'type': 'number', 'minimum': 0, 'maximum': 1},
+        'reasoning': {'type': 'string'},
+        'category': {'type': 'string'},
+        'priority': {'type': 'string', 'enum': ['low', 'medium', 'high']}
+    },
+    'required': ['recommendation', 'confidence_score', 'reasoning', 'category', 'priority']
+}
+BATCH_SCHEMA = {
+    'type': 'array',
+    'items': {
+        'type': 'object',
+        'properties': dict(ANALYSIS_SCHEMA['properties'], index={'type': 'integer'}),
+        'required': ['index'] + ANALYSIS_SCHEMA['required']
+    }
+}
+
+# User message of the one retry made when an answer cannot be parsed
+REPAIR_PROMPT = """Your previous answer was not valid JSON in the required format. Rewrite it as one JSON object with the fields "recommendation" ("delete", "keep" or "archive"), "confidence_score" (0.0 to 1.0), "reasoning", "category" and "priority" ("low", "medium" or "high").
+
+Respond ONLY with the JSON object.
+
+Previous answer:
+"""
+
+
+class JsonEndDetector:
+    """
+    Watch streamed text for the end of the first complete JSON object or array
+    
+    Brackets inside strings are ignored. A balanced fragment that does not decode
+    (e.g. "{see below}" in chatter) is skipped and watching continues.
+    """
+    
+    def __init__(self):
+        self.text = ''
+        self._start = None
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+    
+    def feed(self, piece: str) -> bool:
+        """
+        Add streamed text
+        
+        Returns:
+            True once the text contains a complete, decodable JSON value
+        """
+        offset = len(self.text)
+        self.text += piece
+        for position in range(offset, len(self.text)):
+            char = self.text[position]
+            if self._start is None:
+                if char in '{[':
+                    self._start, self._depth = position, 1
+                continue
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == '\\':
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    try:
+                        json.loads(self.text[self._start:position + 1])
+                        return True
+                    except json.JSONDecodeError:
+                        self._start = None
+        return False
+
 
 class OllamaAnalyzer:
     """AI email analyzer using Ollama local models"""
     
-    def __init__(self, base_url: str = 'http://localhost:11434', model: str = 'llama3.2', db_session=None):
+    VALID_RECOMMENDATIONS = ('delete', 'keep', 'archive')
+    VALID_PRIORITIES = ('low', 'medium', 'high')
+    # Text fields replaced with these when missing, empty or not a string
+    FIELD_DEFAULTS = {'reasoning': 'No reasoning provided', 'category': 'unknown', 'priority': 'medium'}
+    
+    def __init__(self, base_url: str = 'http://localhost:11434', model: str = 'llama3.2', db_session=None,
+                 max_concurrency: int = 1, prompt_batch_size: int = 1, keep_alive='30m', warm_up: bool = True,
+                 cache=None, structured_output: bool = True, stream: bool = True, num_predict: int = 256,
+                 hosts: Optional[List] = None, health_check_interval: float = 30):
         """
         Initialize Ollama analyzer
         
@@ -22,38 +204,168 @@ class OllamaAnalyzer:
             base_url: Ollama API base URL
             model: Model name to use (e.g., 'llama3.2', 'mistral', 'llama2')
             db_session: Database session for few-shot learning (optional)
+            max_concurrency: Requests allowed in flight at once per host, across all threads
+                             (match the server's OLLAMA_NUM_PARALLEL)
+            prompt_batch_size: Emails packed into one prompt by batch_analyze
+            keep_alive: How long Ollama keeps the model (and cached prompt prefix) loaded
+                        after a request, e.g. '30m' or -1 for forever
+            warm_up: Send a one-token request in check_connection so the model is loaded
+                     and the system prompt evaluated before the first email
+            cache: LLMResponseCache consulted before calling Ollama (optional)
+            structured_output: Pass JSON schemas as `format` (needs Ollama 0.5 or newer)
+            stream: Read answers as they are generated and stop as soon as the JSON is
+                    complete, instead of waiting for the model to finish
+            num_predict: Most tokens generated per email (0 = no limit)
+            hosts: Ollama servers to spread requests over, as URLs or dicts with 'url'
+                   and optionally 'max_concurrency' (default: base_url alone)
+            health_check_interval: Seconds between background checks that take
+                                   unreachable hosts out of rotation (0 = off)
         """
-        self.base_url = base_url
+        self.pool = OllamaHostPool([
+            OllamaHost(host, max_concurrency) if isinstance(host, str)
+            else OllamaHost(host['url'], host.get('max_concurrency', max_concurrency))
+            for host in (hosts or [base_url])
+        ])
+        self.base_url = self.pool.hosts[0].url
         self.model = model
-        self.api_url = f"{base_url}/api/generate"
         self.db_session = db_session
+        self.max_concurrency = self.pool.max_concurrency
+        self.health_check_interval = health_check_interval
+        self.prompt_batch_size = max(prompt_batch_size, 1)
+        self.keep_alive = keep_alive
+        self.warm_up_enabled = warm_up
+        self.cache = cache
+        self.structured_output = structured_output
+        self.stream = stream
+        self.num_predict = max(num_predict, 0)
         
-    def check_connection(self) -> bool:
-        """Check if Ollama is running and accessible"""
+        # Outcome counts of response parsing, per model (see get_parse_stats)
+        self.parse_stats: Dict[str, Counter] = {}
+        self._stats_lock = threading.Lock()
+        
+        # Keep-alive connections shared by all calls, one per in-flight request to each host
+        # (plus one for the health check)
+        self.http = requests.Session()
+        for host in self.pool.hosts:
+            self.http.mount(host.url, HTTPAdapter(pool_connections=1, pool_maxsize=host.max_concurrency + 1))
+    
+    def with_model(self, model: str, keep_alive=None, warm_up: bool = False) -> 'OllamaAnalyzer':
+        """
+        Get an analyzer for another model that shares this one's hosts, connections,
+        cache and parse counters (requests of both count against the same host limits)
+        
+        Args:
+            model: Model name for the new analyzer
+            keep_alive: Keep-alive for the new model (default: this analyzer's)
+            warm_up: Load the model in check_connection; off by default, so a model
+                     only needed now and then loads on its first request
+        """
+        other = copy.copy(self)
+        other.model = model
+        other.keep_alive = self.keep_alive if keep_alive is None else keep_alive
+        other.warm_up_enabled = warm_up
+        return other
+    
+    def close(self):
+        """Stop the health checks and close the pooled HTTP connections"""
+        self.pool.stop()
+        self.http.close()
+    
+    def check_connection(self, warm_up: bool = True) -> bool:
+        """
+        Check if Ollama is running and accessible
+        
+        Every host is checked; unreachable ones are taken out of rotation until the
+        background health check (started here) finds them working again. Hosts are
+        shared by all models of a cascade, so a host missing this model stays in
+        rotation for the others and only this model's requests avoid it.
+        
+        Args:
+            warm_up: Warm the model up on usable hosts (if enabled for this analyzer);
+                     False for a plain reachability check
+        
+        Returns:
+            True if at least one reachable host has the model
+        """
+        for host in self.pool.hosts:
+            models = self._list_models(host)
+            if models is None:
+                self.pool.mark_down(host, 'connection check failed')
+            else:
+                self.pool.mark_up(host, models)
+        
+        self._resolve_model()
+        usable = [host for host in self.pool.hosts if host.healthy and self.model in host.models]
+        for host in self.pool.hosts:
+            if host.healthy and host not in usable:
+                logger.warning(f"Model '{self.model}' not found on {host.url}. "
+                               f"Available: {sorted(host.models)}")
+        if warm_up and self.warm_up_enabled:
+            for host in usable:
+                self.warm_up(host)
+        
+        self.pool.start_health_checks(self._health_check, self.health_check_interval)
+        return bool(usable)
+    
+    def _resolve_model(self):
+        """Use the ':latest' tag if only that form of the model name is installed"""
+        installed = set().union(*(host.models or () for host in self.pool.hosts))
+        if self.model not in installed and f"{self.model}:latest" in installed:
+            self.model = f"{self.model}:latest"
+            logger.info(f"Using model: {self.model}")
+    
+    def _list_models(self, host: OllamaHost, quiet: bool = False) -> Optional[List[str]]:
+        """
+        Get the names of the models installed on a host
+        
+        Args:
+            host: Host to ask
+            quiet: Log success and connection errors at debug level (health checks)
+        
+        Returns:
+            Model names, or None if the host did not answer properly
+        """
         try:
-            response = requests.get(f"{self.base_url}/api/tags", timeout=5)
+            response = self.http.get(f"{host.url}/api/tags", timeout=5)
             if response.status_code == 200:
-                models = response.json().get('models', [])
-                model_names = [m['name'] for m in models]
-                logger.info(f"Connected to Ollama. Available models: {model_names}")
-                
-                # Check if model exists (exact match or with :latest tag)
-                model_found = False
-                if self.model in model_names:
-                    model_found = True
-                elif f"{self.model}:latest" in model_names:
-                    # Auto-append :latest tag if model exists with that tag
-                    self.model = f"{self.model}:latest"
-                    logger.info(f"Using model: {self.model}")
-                    model_found = True
-                
-                if not model_found:
-                    logger.warning(f"Model '{self.model}' not found. Available: {model_names}")
-                    return False
-                return True
+                model_names = [m['name'] for m in response.json().get('models', [])]
+                (logger.debug if quiet else logger.info)(
+                    f"Connected to Ollama at {host.url}. Available models: {model_names}")
+                return model_names
+            logger.warning(f"Ollama at {host.url} answered with HTTP {response.status_code}")
+            return None
         except Exception as e:
-            logger.error(f"Failed to connect to Ollama: {e}")
+            (logger.debug if quiet else logger.error)(f"Failed to connect to Ollama at {host.url}: {e}")
+            return None
+    
+    def _health_check(self, host: OllamaHost) -> Optional[List[str]]:
+        """Background check of one host for the pool; a host coming back is warmed up first"""
+        models = self._list_models(host, quiet=True)
+        if models is not None and not host.healthy and self.warm_up_enabled and self.model in models:
+            self.warm_up(host)
+        return models
+    
+    def warm_up(self, host: Optional[OllamaHost] = None) -> bool:
+        """
+        Load the model and evaluate the system prompt ahead of the first email
+        
+        Later requests share the system prompt as their prefix, so Ollama only has
+        to process the email itself.
+        
+        Args:
+            host: Host to warm up (default: whichever the pool picks)
+        
+        Returns:
+            True if the model answered
+        """
+        started = time.perf_counter()
+        response = self._call_ollama('Reply with {}', num_predict=1, host=host)
+        if response is None:
+            logger.warning("Ollama warm-up request failed")
             return False
+        where = f" on {host.url}" if host else ''
+        logger.info(f"Model {self.model} warmed up{where} in {time.perf_counter() - started:.1f}s")
+        return True
     
     def analyze_email(self, email_data: Dict) -> Optional[Dict]:
         """
@@ -66,23 +378,54 @@ class OllamaAnalyzer:
             Dictionary with analysis results or None if failed
         """
         try:
-            # Get similar past decisions for few-shot learning
-            examples = self._get_few_shot_examples(email_data)
-            
-            # Build context for the AI (with examples if available)
-            prompt = self._build_analysis_prompt(email_data, examples)
-            
+            prompt = self._prepare_prompt(email_data)
+        except Exception as e:
+            logger.error(f"Failed to analyze email: {e}")
+            return None
+        
+        return self._cached(prompt) or self._analyze_prompt(prompt)
+    
+    def _prepare_prompt(self, email_data: Dict) -> str:
+        """Build the analysis prompt for an email (reads few-shot examples from the database)"""
+        # Build context for the AI (with examples if available)
+        return self._build_analysis_prompt(email_data, self._prepare_examples(email_data))
+    
+    def _prepare_examples(self, email_data: Dict) -> List[Dict]:
+        """Get similar past decisions for few-shot learning"""
+        examples = self._get_few_shot_examples(email_data)
+        
+        logger.info(f"Analyzing email from {email_data.get('sender', 'unknown')}")
+        if examples:
+            logger.info(f"  Using {len(examples)} past decisions as examples")
+        return examples
+    
+    def _analyze_prompt(self, prompt: str) -> Optional[Dict]:
+        """
+        Send a prepared prompt to Ollama and parse the answer
+        
+        Safe to call from several threads; no database access.
+        
+        Returns:
+            Dictionary with analysis results or None if failed
+        """
+        try:
             # Call Ollama API
-            logger.info(f"Analyzing email from {email_data.get('sender', 'unknown')}")
-            if examples:
-                logger.info(f"  Using {len(examples)} past decisions as examples")
-            response = self._call_ollama(prompt)
+            response = self._call_ollama(prompt, schema=ANALYSIS_SCHEMA)
             
             if not response:
                 return None
             
-            # Parse AI response
+            # Parse AI response, asking the model once to fix an unusable answer
             analysis = self._parse_analysis_response(response)
+            if analysis is None:
+                analysis = self._repair_response(response)
+                self._count_parse('repaired' if analysis else 'failed')
+                if analysis is None:
+                    logger.error(f"No usable answer from {self.model} after a repair attempt")
+                    return None
+            else:
+                self._count_parse('parsed')
+            self._remember(prompt, analysis)
             
             # Add model metadata
             analysis['model_name'] = self.model
@@ -90,11 +433,29 @@ class OllamaAnalyzer:
             
             logger.info(f"Analysis complete: {analysis['recommendation']} (confidence: {analysis['confidence_score']:.2f})")
             return analysis
-            
+        
         except Exception as e:
             logger.error(f"Failed to analyze email: {e}")
             return None
     
+    def _cached(self, prompt: str) -> Optional[Dict]:
+        """Cached analysis for a single-email prompt, with model metadata (None on a miss)"""
+        if not self.cache:
+            return None
+        analysis = self.cache.get(self.cache.make_key(self.model, PROMPT_VERSION, prompt))
+        if analysis is None:
+            return None
+        
+        analysis['model_name'] = self.model
+        analysis['model_version'] = 'latest'
+        logger.info(f"Cached analysis: {analysis['recommendation']} (confidence: {analysis['confidence_score']:.2f})")
+        return analysis
+    
+    def _remember(self, prompt: str, analysis: Dict):
+        """Store a parsed analysis under its single-email prompt"""
+        if self.cache:
+            self.cache.put(self.cache.make_key(self.model, PROMPT_VERSION, prompt), self.model, analysis)
+    
     def _get_few_shot_examples(self, email_data: Dict) -> List[Dict]:
         """Get relevant past decisions for few-shot learning"""
         if not self.db_session:
@@ -117,13 +478,51 @@ class OllamaAnalyzer:
             return []
     
     def _build_analysis_prompt(self, email_data: Dict, examples: List[Dict] = None) -> str:
-        """Build the prompt for email analysis with optional few-shot examples"""
+        """Build the user message for email analysis with optional few-shot examples"""
+        return f"""Analyze this email and provide a recommendation.
+
+{self._format_email(email_data, examples)}"""
+    
+    def _build_batch_prompt(self, emails: List[Dict], examples: List[List[Dict]]) -> str:
+        """Build one user message classifying several emails"""
+        email_blocks = "\n\n".join(
+            f"=== Email {index} ===\n{self._format_email(email_data, email_examples)}"
+            for index, (email_data, email_examples) in enumerate(zip(emails, examples), 1)
+        )
+        
+        return f"""Analyze each of the {len(emails)} emails below and respond with a JSON array of {len(emails)} objects.
+
+{email_blocks}"""
+    
+    def _format_email(self, email_data: Dict, examples: List[Dict] = None) -> str:
+        """Email fields (and few-shot examples) as they appear in prompts"""
         sender = email_data.get('sender', 'Unknown')
         subject = email_data.get('subject', 'No subject')
         body_preview = email_data.get('body_preview', '')[:500]
         has_attachments = email_data.get('has_attachments', False)
         received_date = email_data.get('date', 'Unknown')
         
+        text = f"""Email Details:
+- From: {sender}
+- Subject: {subject}
+- Date: {received_date}
+- Age: {self._describe_age(received_date)}
+- Has attachments: {has_attachments}
+- Body preview: {body_preview}"""
+        
+        # Add few-shot examples if available
+        if examples:
+            text += "\n\nPrevious decisions you made for similar emails:\n"
+            for ex in examples:
+                decision = "kept" if ex['human_decision'] == 'keep' else "deleted"
+                subject_preview = ex['subject'][:50] + "..." if len(ex['subject']) > 50 else ex['subject']
+                text += f"- From {ex['sender']}: \"{subject_preview}\" → You {decision} it (Category: {ex['category']})\n"
+        
+        return text.rstrip('\n')
+    
+    @staticmethod
+    def _describe_age(received_date) -> str:
+        """Human-readable email age such as "3 weeks old" """
         # Calculate email age
         from datetime import datetime, UTC
         age_days = None
@@ -152,118 +551,43 @@ class OllamaAnalyzer:
                     age_description = f"{years} year{'s' if years > 1 else ''} old"
             except:
                 pass
-        
-        prompt = f"""You are an email classification assistant. Analyze this email and provide a recommendation.
-
-Email Details:
-- From: {sender}
-- Subject: {subject}
-- Date: {received_date}
-- Age: {age_description}
-- Has attachments: {has_attachments}
-- Body preview: {body_preview}"""
-
-        # Add few-shot examples if available
-        if examples:
-            prompt += "\n\nPrevious decisions you made for similar emails:\n"
-            for ex in examples:
-                decision = "kept" if ex['human_decision'] == 'keep' else "deleted"
-                subject_preview = ex['subject'][:50] + "..." if len(ex['subject']) > 50 else ex['subject']
-                prompt += f"- From {ex['sender']}: \"{subject_preview}\" → You {decision} it (Category: {ex['category']})\n"
-
-        prompt += """
-
-Task: Analyze this email and provide:
-1. Recommendation: Should this email be "delete", "keep", or "archive"?
-2. Confidence: Your confidence level (0.0 to 1.0)
-3. Reasoning: Brief explanation for your recommendation
-4. Category: Email category (e.g., "newsletter", "personal", "promotional", "notification", "spam", "important", "job_offer", "recruiter")
-5. Priority: Priority level ("low", "medium", "high")
-
-Guidelines:
-- Recommend "delete" for: 
-  * Spam and unsolicited emails
-  * Old newsletters (more than a week old) - REGARDLESS of source reputation (NASA, news sites, etc.)
-  * Promotional/sale emails from companies (especially if older than 30-60 days)
-  * Job offers and recruiter emails (especially if old or unsolicited)
-  * Automated notifications with no value
-  * Mass marketing emails
-  * Old transactional emails (receipts, confirmations older than 90 days)
-  * Any bulk/broadcast email that is more than 7 days old
-  
-- Consider email age carefully:
-  * Recent emails (< 7 days): Be more conservative, might still be relevant
-  * Medium age (7-30 days): Normal evaluation - newsletters/promotional should be deleted
-  * Old emails (30-60 days): More aggressive deletion for promotional/newsletter content
-  * Very old emails (60+ days): Very aggressive deletion unless personal/important
-  
-- Newsletter indicators (should be deleted if > 7 days old):
-  * Generic "newsletter" format with multiple articles/sections
-  * Mass-sent emails with unsubscribe links
-  * Automated digest emails
-  * Regular updates from organizations (even reputable ones like NASA, news sites)
-  * Any email that feels like a broadcast rather than personal communication
-  
-- Recommend "keep" for: 
-  * Personal correspondence from real people
-  * Important business emails
-  * Emails requiring action or response
-  * Emails from family, friends, or close contacts
-  
-- Recommend "archive" for: 
-  * Receipts and order confirmations
-  * Reference materials that might be needed later
-  * Travel confirmations and bookings
-  * Important records and documentation
-
-Recruiter/Job Email Indicators:
-- Emails from recruiters or staffing agencies (e.g., @vdartinc.com, @teksystems.com, etc.)
-- Subjects containing: "position", "role", "opportunity", "contract", "remote", "developer", "engineer"
-- Language like: "immediate need", "hiring for", "seeking candidates", "job opening"
-- Emails offering job positions or contract roles
-→ These should be marked as "delete" with category "job_offer" or "recruiter"
-
-Be conservative: if unsure, prefer "keep" or "archive" over "delete"
-Higher confidence (>0.8) for clear spam/newsletters/recruiters, lower confidence (<0.6) for ambiguous emails
-
-Respond in JSON format:
-{{
-    "recommendation": "delete|keep|archive",
-    "confidence_score": 0.85,
-    "reasoning": "Brief explanation here",
-    "category": "newsletter",
-    "priority": "low"
-}}
-
-Respond ONLY with valid JSON, no other text."""
-
-        return prompt
+        return age_description
     
-    def _call_ollama(self, prompt: str, temperature: float = 0.3) -> Optional[str]:
+    def _call_ollama(self, prompt: str, temperature: float = 0.3, num_predict: Optional[int] = None,
+                     schema: Optional[Dict] = None, host: Optional[OllamaHost] = None) -> Optional[str]:
         """
-        Call Ollama API with the prompt
+        Call Ollama's chat API with the system prompt and a user message
         
         Args:
-            prompt: Analysis prompt
+            prompt: User message (the email part of the prompt)
             temperature: Sampling temperature (lower = more deterministic)
+            num_predict: Maximum tokens to generate (None = the per-email limit)
+            schema: JSON schema the answer must follow (ignored without structured_output)
+            host: Send to this host, outside its concurrency limit (default: least loaded host)
         
         Returns:
             AI response text or None if failed
         """
         try:
+            options = {'temperature': temperature}
+            num_predict = self.num_predict if num_predict is None else num_predict
+            if num_predict:
+                options['num_predict'] = num_predict
             payload = {
                 'model': self.model,
-                'prompt': prompt,
-                'temperature': temperature,
-                'stream': False
+                'messages': [
+                    {'role': 'system', 'content': SYSTEM_PROMPT},
+                    {'role': 'user', 'content': prompt}
+                ],
+                'options': options,
+                'keep_alive': self.keep_alive,
+                'stream': self.stream
             }
+            if schema and self.structured_output:
+                payload['format'] = schema
             
-            response = requests.post(self.api_url, json=payload, timeout=120)
-            response.raise_for_status()
-            
-            result = response.json()
-            return result.get('response', '')
-            
+            return self._send(payload, host)
+        
         except requests.exceptions.Timeout:
             logger.error("Ollama request timed out")
         except requests.exceptions.RequestException as e:
@@ -273,7 +597,64 @@ Respond ONLY with valid JSON, no other text."""
         
         return None
     
-    def _parse_analysis_response(self, response: str) -> Dict:
+    def _send(self, payload: Dict, host: Optional[OllamaHost] = None) -> str:
+        """
+        POST a chat request and return the answer text
+        
+        Waits for a free slot on the least loaded healthy host that has the model. A host that cannot be
+        reached is taken out of rotation and the request is retried on another one;
+        the last host in rotation is left for the health check to judge.
+        
+        Raises:
+            requests.exceptions.RequestException: If no host could answer
+        """
+        failed = []
+        while True:
+            target = host or self.pool.acquire(exclude=failed, model=self.model)
+            if target is None:
+                raise requests.exceptions.ConnectionError(f"No Ollama host in rotation has {self.model}")
+            try:
+                response = self.http.post(f"{target.url}/api/chat", json=payload, timeout=120, stream=self.stream)
+                response.raise_for_status()
+                if self.stream:
+                    return self._read_stream(response)
+                return response.json().get('message', {}).get('content', '')
+            except requests.exceptions.ConnectionError as e:
+                if host or not self.pool.healthy_count(exclude=failed + [target], model=self.model):
+                    raise
+                self.pool.mark_down(target, str(e))
+                failed.append(target)
+            finally:
+                if not host:
+                    self.pool.release(target)
+    
+    def _read_stream(self, response) -> str:
+        """
+        Collect a streamed answer, hanging up once it holds a complete JSON value
+        
+        Closing the connection early makes Ollama stop generating, so tokens the
+        model would add after the JSON (explanations, a second object) are never
+        computed. The closed connection is replaced on the next request.
+        """
+        detector = JsonEndDetector()
+        try:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if chunk.get('error'):
+                    raise requests.exceptions.RequestException(chunk['error'])
+                if detector.feed(chunk.get('message', {}).get('content', '')):
+                    if not chunk.get('done'):
+                        logger.debug("JSON complete, stopping generation early")
+                    break
+                if chunk.get('done'):
+                    break
+        finally:
+            response.close()
+        return detector.text
+    
+    def _parse_analysis_response(self, response: str) -> Optional[Dict]:
         """
         Parse AI response and extract structured data
         
@@ -281,88 +662,267 @@ Respond ONLY with valid JSON, no other text."""
             response: Raw AI response text
         
         Returns:
-            Structured analysis dictionary
+            Structured analysis dictionary, or None if the response holds no JSON
+            object with a valid recommendation
         """
-        # Default fallback values
-        default_analysis = {
-            'recommendation': 'keep',
-            'confidence_score': 0.5,
-            'reasoning': 'Unable to parse AI response',
-            'category': 'unknown',
-            'priority': 'medium'
-        }
+        analysis = self._load_json(response, '{')
+        if not isinstance(analysis, dict):
+            logger.warning(f"No JSON object in response from {self.model}")
+            logger.debug(f"Raw response: {response[:200]}")
+            return None
+        
+        if analysis.get('recommendation') not in self.VALID_RECOMMENDATIONS:
+            logger.warning(f"Invalid recommendation: {analysis.get('recommendation')}")
+            return None
         
         try:
-            # Try to find JSON in the response
-            response = response.strip()
-            
-            # Remove markdown code blocks if present
-            if response.startswith('```'):
-                lines = response.split('\n')
-                response = '\n'.join(lines[1:-1])
-            
-            # Parse JSON
-            analysis = json.loads(response)
-            
-            # Validate required fields
-            if 'recommendation' not in analysis:
-                logger.warning("Missing 'recommendation' in AI response")
-                return default_analysis
-            
-            # Ensure recommendation is valid
-            valid_recommendations = ['delete', 'keep', 'archive']
-            if analysis['recommendation'] not in valid_recommendations:
-                logger.warning(f"Invalid recommendation: {analysis['recommendation']}")
-                analysis['recommendation'] = 'keep'
-            
-            # Ensure confidence is in valid range
-            if 'confidence_score' in analysis:
-                confidence = float(analysis['confidence_score'])
-                analysis['confidence_score'] = max(0.0, min(1.0, confidence))
-            else:
-                analysis['confidence_score'] = 0.5
-            
-            # Fill in optional fields with defaults
-            analysis.setdefault('reasoning', 'No reasoning provided')
-            analysis.setdefault('category', 'unknown')
-            analysis.setdefault('priority', 'medium')
-            
-            return analysis
-            
-        except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse JSON response: {e}")
+            return self._normalize_analysis(analysis)
+        except (TypeError, ValueError) as e:
+            logger.warning(f"Invalid field in AI response: {e}")
+            return None
+    
+    def _repair_response(self, response: str) -> Optional[Dict]:
+        """Ask the model once to rewrite an unusable answer as valid JSON"""
+        logger.warning(f"Unusable response from {self.model}, asking for a repair")
+        repaired = self._call_ollama(REPAIR_PROMPT + response.strip()[:1500], temperature=0.0, schema=ANALYSIS_SCHEMA)
+        return self._parse_analysis_response(repaired) if repaired else None
+    
+    def _load_json(self, response: str, openers: str):
+        """
+        Decode the JSON in a response
+        
+        Tries the whole text (without a markdown code fence) first, then the first
+        balanced JSON value starting with one of the opener characters, so chatter
+        before or after the JSON is ignored.
+        
+        Returns:
+            Decoded value, or None if there is none
+        """
+        text = self._strip_code_fence(response)
+        try:
+            return json.loads(text)
+        except json.JSONDecodeError:
+            pass
+        
+        for fragment in self._balanced_fragments(text, openers):
+            try:
+                value = json.loads(fragment)
+            except json.JSONDecodeError:
+                continue
+            self._count_parse('extracted')
+            return value
+        return None
+    
+    @staticmethod
+    def _balanced_fragments(text: str, openers: str):
+        """Yield substrings from an opener to its matching closer, skipping brackets inside strings"""
+        closers = {'{': '}', '[': ']'}
+        start = min((i for i in (text.find(opener) for opener in openers) if i >= 0), default=-1)
+        while start >= 0:
+            stack = []
+            in_string = escaped = False
+            for position in range(start, len(text)):
+                char = text[position]
+                if in_string:
+                    if escaped:
+                        escaped = False
+                    elif char == '\\':
+                        escaped = True
+                    elif char == '"':
+                        in_string = False
+                elif char == '"':
+                    in_string = True
+                elif char in closers:
+                    stack.append(closers[char])
+                elif stack and char == stack[-1]:
+                    stack.pop()
+                    if not stack:
+                        yield text[start:position + 1]
+                        break
+                elif char in '}]':
+                    break  # mismatched closer
+            start = min((i for i in (text.find(opener, start + 1) for opener in openers) if i >= 0), default=-1)
+    
+    def _count_parse(self, outcome: str, count: int = 1):
+        with self._stats_lock:
+            self.parse_stats.setdefault(self.model, Counter())[outcome] += count
+    
+    def get_parse_stats(self) -> Dict[str, Dict[str, int]]:
+        """
+        Get response parsing outcomes per model
+        
+        Returns:
+            Dict of model -> counts of 'parsed' (usable first time), 'extracted' (JSON
+            cut out of surrounding text), 'repaired' (usable after the repair retry),
+            'failed' (no usable answer) and 'batch_missing' (emails left out of or
+            invalid in a batched answer, retried one by one)
+        """
+        with self._stats_lock:
+            return {model: dict(counts) for model, counts in self.parse_stats.items()}
+    
+    def _parse_batch_response(self, response: Optional[str], count: int) -> List[Optional[Dict]]:
+        """
+        Parse the JSON array answer to a batched prompt
+        
+        Args:
+            response: Raw AI response text (None if the call failed)
+            count: Number of emails in the prompt
+        
+        Returns:
+            Analysis per email in prompt order; None for emails whose entry is
+            missing or invalid (those are retried with single-email prompts)
+        """
+        results = [None] * count
+        if not response:
+            return results
+        
+        items = self._load_json(response, '[{')
+        if items is None:
+            logger.warning(f"No JSON in batched response from {self.model}")
             logger.debug(f"Raw response: {response[:200]}")
-        except Exception as e:
-            logger.error(f"Error parsing analysis response: {e}")
+            return results
+        
+        if isinstance(items, dict):
+            # Some models wrap the array in an object
+            items = next((value for value in items.values() if isinstance(value, list)), [items])
+        if not isinstance(items, list):
+            return results
+        
+        for position, item in enumerate(items):
+            if not isinstance(item, dict):
+                continue
+            try:
+                index = int(item.get('index', position + 1)) - 1
+                if not 0 <= index < count or results[index] is not None:
+                    continue
+                if item.get('recommendation') not in self.VALID_RECOMMENDATIONS:
+                    continue
+                item.pop('index', None)
+                results[index] = self._normalize_analysis(item)
+            except (TypeError, ValueError):
+                continue
+        return results
+    
+    def _normalize_analysis(self, analysis: Dict) -> Dict:
+        """
+        Clamp and default the fields of a parsed analysis (with a valid recommendation)
+        
+        Raises:
+            TypeError, ValueError: If confidence_score is present but not a finite number
+        """
+        # Ensure confidence is in valid range
+        if 'confidence_score' in analysis:
+            confidence = float(analysis['confidence_score'])
+            if not math.isfinite(confidence):
+                raise ValueError(f"confidence_score is {confidence}")
+            analysis['confidence_score'] = max(0.0, min(1.0, confidence))
+        else:
+            analysis['confidence_score'] = 0.5
+        
+        # Text fields must be non-empty strings (null or a number would break string handling later)
+        for field, default in self.FIELD_DEFAULTS.items():
+            value = analysis.get(field)
+            analysis[field] = value.strip() if isinstance(value, str) and value.strip() else default
+        analysis['priority'] = analysis['priority'].lower()
+        if analysis['priority'] not in self.VALID_PRIORITIES:
+            analysis['priority'] = self.FIELD_DEFAULTS['priority']
         
-        return default_analysis
+        return analysis
+    
+    @staticmethod
+    def _strip_code_fence(response: str) -> str:
+        """Remove markdown code blocks if present"""
+        response = response.strip()
+        if response.startswith('```'):
+            lines = response.split('\n')
+            response = '\n'.join(lines[1:-1])
+        return response
     
     def batch_analyze(self, emails: list) -> list:
         """
-        Analyze multiple emails in sequence
+        Analyze multiple emails with up to max_concurrency requests in flight
+        
+        With prompt_batch_size > 1, emails are packed that many to a prompt and the
+        model answers with a JSON array; emails missing from (or invalid in) the
+        answer are retried with single-email prompts. Few-shot lookups run on the
+        calling thread, so db_session is never shared between threads; only the
+        HTTP calls run in parallel.
         
         Args:
             emails: List of email data dictionaries
         
         Returns:
-            List of analysis results
+            One {'email_id', 'analysis'} dict per email, in input order; 'analysis'
+            is None where the analysis failed
         """
-        results = []
+        analyses = [None] * len(emails)
+        uncached = []  # (position, email, few-shot examples)
+        for position, email_data in enumerate(emails):
+            examples = self._prepare_examples(email_data)
+            analyses[position] = self._cached(self._build_analysis_prompt(email_data, examples))
+            if analyses[position] is None:
+                uncached.append((position, email_data, examples))
         
-        for i, email_data in enumerate(emails, 1):
-            logger.info(f"Analyzing email {i}/{len(emails)}")
-            analysis = self.analyze_email(email_data)
-            
-            if analysis:
-                results.append({
-                    'email_id': email_data.get('email_id'),
-                    'analysis': analysis
-                })
-            else:
+        groups = [uncached[start:start + self.prompt_batch_size]
+                  for start in range(0, len(uncached), self.prompt_batch_size)]
+        if groups:
+            with ThreadPoolExecutor(max_workers=min(self.max_concurrency, len(groups))) as executor:
+                for group, group_analyses in zip(groups, executor.map(self._analyze_group, groups)):
+                    for (position, _, _), analysis in zip(group, group_analyses):
+                        analyses[position] = analysis
+        
+        results = []
+        for email_data, analysis in zip(emails, analyses):
+            if not analysis:
                 logger.warning(f"Failed to analyze email {email_data.get('email_id')}")
+            results.append({
+                'email_id': email_data.get('email_id'),
+                'analysis': analysis
+            })
         
-        logger.info(f"Batch analysis complete: {len(results)}/{len(emails)} successful")
+        successful = sum(1 for result in results if result['analysis'])
+        logger.info(f"Batch analysis complete: {successful}/{len(emails)} successful")
         return results
+    
+    def _analyze_group(self, group: tuple) -> List[Optional[Dict]]:
+        """
+        Analyze a group of emails with one batched prompt (single prompts for leftovers)
+        
+        Args:
+            group: List of (position in the batch, email, few-shot examples)
+        
+        Returns:
+            Analysis per email, in order (None where it failed)
+        """
+        emails = [email_data for _, email_data, _ in group]
+        examples = [email_examples for _, _, email_examples in group]
+        prompts = [self._build_analysis_prompt(email_data, email_examples)
+                   for email_data, email_examples in zip(emails, examples)]
+        try:
+            if len(emails) == 1:
+                return [self._analyze_prompt(prompts[0])]
+            
+            response = self._call_ollama(self._build_batch_prompt(emails, examples),
+                                         num_predict=self.num_predict * len(emails), schema=BATCH_SCHEMA)
+            analyses = self._parse_batch_response(response, len(emails))
+            
+            missing = [index for index, analysis in enumerate(analyses) if analysis is None]
+            self._count_parse('parsed', len(emails) - len(missing))
+            if missing:
+                self._count_parse('batch_missing', len(missing))
+                logger.info(f"Batched prompt answered {len(emails) - len(missing)}/{len(emails)} emails; "
+                            f"retrying {len(missing)} one by one")
+            for index, analysis in enumerate(analyses):
+                if analysis is None:
+                    analyses[index] = self._analyze_prompt(prompts[index])
+                else:
+                    self._remember(prompts[index], analysis)
+                    analysis['model_name'] = self.model
+                    analysis['model_version'] = 'latest'
+            return analyses
+        except Exception as e:
+            logger.error(f"Failed to analyze email batch: {e}")
+            return [None] * len(emails)
 
 
 # Example usage and testing
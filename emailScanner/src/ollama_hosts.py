@@ -0,0 +1,176 @@
+"""
+Routing of Ollama requests over several servers.
+Each request goes to the healthy host with the fewest requests in flight relative to
+its concurrency limit, among the hosts that have the request's model, and waits when
+every such host is at its limit. A background thread re-checks the hosts periodically,
+taking unreachable ones out of rotation, putting them back once they answer again and
+refreshing the list of models each one has.
+"""
+import logging
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class OllamaHost:
+    """One Ollama server and its request counters"""
+    
+    def __init__(self, url: str, max_concurrency: int = 1):
+        """
+        Initialize host
+        
+        Args:
+            url: Ollama API base URL
+            max_concurrency: Requests this server runs at once (its OLLAMA_NUM_PARALLEL)
+        """
+        self.url = url.rstrip('/')
+        self.max_concurrency = max(max_concurrency, 1)
+        self.healthy = True
+        self.models: Optional[Set[str]] = None  # Models installed on the host (None until checked)
+        self.outstanding = 0  # Requests in flight
+        self.requests = 0
+        self.failures = 0
+    
+    @property
+    def load(self) -> float:
+        """Share of the host's slots in use"""
+        return self.outstanding / self.max_concurrency
+    
+    def serves(self, model: Optional[str]) -> bool:
+        """Whether requests for model may go to this host (any model while unchecked)"""
+        return model is None or self.models is None or model in self.models
+    
+    def __repr__(self):
+        return f"<OllamaHost(url={self.url}, healthy={self.healthy}, outstanding={self.outstanding}/{self.max_concurrency})>"
+
+
+class OllamaHostPool:
+    """Least-outstanding-requests routing over a set of Ollama hosts"""
+    
+    def __init__(self, hosts: List[OllamaHost]):
+        """
+        Initialize pool
+        
+        Args:
+            hosts: Hosts to route over (all start in rotation)
+        """
+        self.hosts = hosts
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._checker: Optional[threading.Thread] = None
+    
+    @property
+    def max_concurrency(self) -> int:
+        """Requests the pool runs at once with every host in rotation"""
+        return sum(host.max_concurrency for host in self.hosts)
+    
+    def acquire(self, exclude: Iterable[OllamaHost] = (), model: Optional[str] = None) -> Optional[OllamaHost]:
+        """
+        Reserve a slot on the least loaded healthy host, waiting while all are busy
+        
+        Args:
+            exclude: Hosts not to use (e.g. ones that just failed this request)
+            model: Only use hosts that have this model
+        
+        Returns:
+            The reserved host (give it back with release), or None if no healthy
+            host with the model is left
+        """
+        with self._condition:
+            while True:
+                candidates = [host for host in self.hosts
+                              if host.healthy and host not in exclude and host.serves(model)]
+                if not candidates:
+                    return None
+                free = [host for host in candidates if host.outstanding < host.max_concurrency]
+                if free:
+                    host = min(free, key=lambda h: (h.load, h.outstanding))
+                    host.outstanding += 1
+                    host.requests += 1
+                    return host
+                self._condition.wait()
+    
+    def release(self, host: OllamaHost):
+        """Free a slot reserved with acquire"""
+        with self._condition:
+            host.outstanding -= 1
+            self._condition.notify()
+    
+    def mark_down(self, host: OllamaHost, reason: str):
+        """Take a host out of rotation"""
+        with self._condition:
+            host.failures += 1
+            if host.healthy:
+                host.healthy = False
+                logger.warning(f"Ollama host {host.url} out of rotation: {reason}")
+            # Waiting callers re-evaluate (and give up if no host is left)
+            self._condition.notify_all()
+    
+    def mark_up(self, host: OllamaHost, models: Optional[Iterable[str]] = None):
+        """Put a host back into rotation, optionally recording the models it has"""
+        with self._condition:
+            if models is not None:
+                host.models = set(models)
+            if not host.healthy:
+                host.healthy = True
+                logger.info(f"Ollama host {host.url} back in rotation")
+            self._condition.notify_all()
+    
+    def healthy_count(self, exclude: Iterable[OllamaHost] = (), model: Optional[str] = None) -> int:
+        """Number of hosts in rotation (that have model, if given)"""
+        with self._condition:
+            return sum(1 for host in self.hosts if host.healthy and host not in exclude and host.serves(model))
+    
+    def start_health_checks(self, check: Callable[[OllamaHost], Optional[Iterable[str]]], interval: float):
+        """
+        Re-check every host in a background thread
+        
+        One check serves every model: it reports what the host has, and each request
+        is routed only to hosts listing its model.
+        
+        Args:
+            check: Returns the names of the host's models, or None if the host is
+                   unusable; hosts failing it are taken out of rotation, hosts passing
+                   it are put back with their model list updated
+            interval: Seconds between rounds (0 disables the checks)
+        """
+        if interval <= 0 or self._checker:
+            return
+        
+        def run():
+            while not self._stop.wait(interval):
+                for host in self.hosts:
+                    try:
+                        models = check(host)
+                    except Exception as e:
+                        logger.debug(f"Health check of {host.url} failed: {e}")
+                        models = None
+                    if models is not None:
+                        self.mark_up(host, models)
+                    else:
+                        self.mark_down(host, 'health check failed')
+        
+        self._checker = threading.Thread(target=run, name='ollama-health', daemon=True)
+        self._checker.start()
+    
+    def stop(self):
+        """Stop the health checks"""
+        self._stop.set()
+        if self._checker:
+            self._checker.join(timeout=5)
+            self._checker = None
+    
+    def stats(self) -> Dict[str, Dict]:
+        """Get per-host counters, keyed by URL"""
+        with self._condition:
+            return {
+                host.url: {
+                    'healthy': host.healthy,
+                    'models': sorted(host.models or ()),
+                    'max_concurrency': host.max_concurrency,
+                    'requests': host.requests,
+                    'failures': host.failures
+                }
+                for host in self.hosts
+            }
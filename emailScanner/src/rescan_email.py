@@ -8,6 +8,7 @@ from models import Email, Analysis, init_db, get_session
 from settings import load_settings
 from rules import EmailRules
 from ollama_analyzer import OllamaAnalyzer
+from llm_cache import LLMResponseCache
 
 def rescan_email(email_identifier: str, config):
     """Re-analyze a specific email with current rules"""
@@ -69,9 +70,21 @@ def rescan_email(email_identifier: str, config):
     else:
         # No rule - analyze with AI
         print("⏳ No rule matched, analyzing with AI...")
+        cache = None
+        if config.llm_cache_enabled:
+            cache = LLMResponseCache(session, config.llm_cache_max_entries, config.llm_cache_ttl_days)
         analyzer = OllamaAnalyzer(
             base_url=config.ollama_base_url,
-            model=config.ollama_model
+            # A single email is worth the strongest model of a cascade
+            model=config.ollama_cascade[-1]['model'] if config.ollama_cascade else config.ollama_model,
+            keep_alive=config.ollama_keep_alive,
+            warm_up=False,  # A single email gains nothing from priming the cache
+            cache=cache,
+            structured_output=config.ollama_structured_output,
+            stream=config.ollama_stream,
+            num_predict=config.ollama_num_predict,
+            hosts=config.ollama_hosts,
+            health_check_interval=0  # One request; no need to watch the hosts
         )
         
         if not analyzer.check_connection():
@@ -80,6 +93,8 @@ def rescan_email(email_identifier: str, config):
             return False
         
         analysis_result = analyzer.analyze_email(email_data)
+        if cache:
+            cache.flush()
         
         if not analysis_result:
             print("❌ AI analysis failed")
@@ -4,6 +4,7 @@ Allows setting up automatic keep/delete decisions based on sender, content, age,
 """
 import logging
 import re
+import threading
 from datetime import datetime, timedelta, UTC
 from typing import Dict, Optional, List
 
@@ -121,6 +122,8 @@ class EmailRules:
             'personal_kept': 0,
             'auto_deleted': 0,
         }
+        # Pipeline tier workers check emails on several threads at once
+        self._stats_lock = threading.Lock()
     
     def check_email(self, email_data: Dict) -> Optional[Dict]:
         """
@@ -129,10 +132,14 @@ class EmailRules:
         Args:
             email_data: Email data dictionary with sender, subject, body, date
         
+        Header-only records (email_data['headers_only']) get a decision only where the
+        body could not change it, so they are classified exactly like the full message.
+        
         Returns:
             Dictionary with 'action' (keep/delete), 'reason', 'confidence' if rule matches,
-            None if no rule matches (should proceed to AI analysis)
+            None if no rule matches (should proceed to AI analysis) or the body is needed
         """
+        headers_only = email_data.get('headers_only', False)
         sender = email_data.get('sender', '').lower()
         subject = email_data.get('subject', '').lower()
         body = email_data.get('body_preview', '').lower()
@@ -140,7 +147,7 @@ class EmailRules:
         
         # Rule 1: Old events - delete even from VIP senders if older than threshold
         if received_date and self._is_old_event(subject, body, received_date):
-            self.stats['old_event_deleted'] += 1
+            self._count('old_event_deleted')
             return {
                 'recommendation': 'delete',
                 'confidence_score': 0.93,
@@ -150,9 +157,13 @@ class EmailRules:
                 'rule_matched': 'old_event'
             }
         
+        if headers_only and received_date and self._age_days(received_date) > self.old_event_days:
+            # Event keywords in the body would still make rule 1 apply
+            return None
+        
         # Rule 2: VIP senders - always keep
         if self._is_vip_sender(sender):
-            self.stats['vip_kept'] += 1
+            self._count('vip_kept')
             return {
                 'recommendation': 'keep',
                 'confidence_score': 0.99,
@@ -164,7 +175,7 @@ class EmailRules:
         
         # Rule 3: Event-related emails - always keep
         if self._is_event(subject, body):
-            self.stats['event_kept'] += 1
+            self._count('event_kept')
             return {
                 'recommendation': 'keep',
                 'confidence_score': 0.95,
@@ -174,9 +185,13 @@ class EmailRules:
                 'rule_matched': 'event'
             }
         
+        if headers_only:
+            # Rules 4-7 read the body, and event keywords in it would keep the email at rule 3
+            return None
+        
         # Rule 4: Personal contacts detection (heuristic)
         if self._looks_like_personal(sender, subject, body):
-            self.stats['personal_kept'] += 1
+            self._count('personal_kept')
             return {
                 'recommendation': 'keep',
                 'confidence_score': 0.90,
@@ -188,7 +203,7 @@ class EmailRules:
         
         # Rule 5: Old job offers (6+ months old) - auto delete
         if received_date and self._is_old_job_offer(subject, body, received_date):
-            self.stats['old_job_deleted'] += 1
+            self._count('old_job_deleted')
             return {
                 'recommendation': 'delete',
                 'confidence_score': 0.92,
@@ -200,7 +215,7 @@ class EmailRules:
         
         # Rule 6: Old newsletters/news (7+ days old by default) - auto delete
         if received_date and self._is_old_newsletter(sender, subject, received_date):
-            self.stats['old_newsletter_deleted'] += 1
+            self._count('old_newsletter_deleted')
             return {
                 'recommendation': 'delete',
                 'confidence_score': 0.93,
@@ -212,7 +227,7 @@ class EmailRules:
         
         # Rule 7: Old promotional/sale emails (90+ days old by default) - auto delete
         if received_date and self._is_old_promotional(subject, body, received_date):
-            self.stats['old_promotional_deleted'] += 1
+            self._count('old_promotional_deleted')
             return {
                 'recommendation': 'delete',
                 'confidence_score': 0.94,
@@ -225,6 +240,13 @@ class EmailRules:
         # No rule matched - proceed to AI analysis
         return None
     
+    @staticmethod
+    def _age_days(received_date: datetime) -> int:
+        """Age of an email in whole days (naive dates are taken as UTC)"""
+        if received_date.tzinfo is None:
+            received_date = received_date.replace(tzinfo=UTC)
+        return (datetime.now(UTC) - received_date).days
+    
     def _is_vip_sender(self, sender: str) -> bool:
         """Check if sender is in VIP list"""
         for vip in self.vip_senders:
@@ -365,7 +387,13 @@ class EmailRules:
     
     def get_stats(self) -> Dict:
         """Get statistics on rule matches"""
-        return self.stats.copy()
+        with self._stats_lock:
+            return self.stats.copy()
+    
+    def _count(self, stat: str):
+        """Increment a rule match counter (thread-safe)"""
+        with self._stats_lock:
+            self.stats[stat] += 1
     
     def add_vip_sender(self, email: str):
         """Add a new VIP sender"""
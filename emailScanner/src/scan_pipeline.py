@@ -0,0 +1,196 @@
+"""
+Staged scan pipeline: pools of worker threads connected by bounded queues.
+Each stage hands its output to the next stage through a queue of limited size, so a
+slow stage (usually the LLM) makes the stages in front of it wait instead of letting
+fetched mail pile up in memory.
+"""
+import logging
+import queue
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# End-of-input marker; each worker of a stage receives one
+_DONE = object()
+
+# How often a waiting worker of a stage with an idle callback wakes up to call it
+IDLE_POLL_SECONDS = 0.5
+
+
+class PipelineStage:
+    """One pipeline stage: a handler run by a pool of worker threads"""
+    
+    def __init__(self, name: str, handler: Callable[[object], Optional[List]], workers: int = 1,
+                 size: Optional[Callable[[object], int]] = None, idle: Optional[Callable[[], None]] = None):
+        """
+        Initialize stage
+        
+        Args:
+            name: Stage name used in logs and the summary
+            handler: Function taking one item and returning the list of items for the
+                     next stage (None or [] drops the item)
+            workers: Number of threads running the handler
+            size: Emails an input item stands for (e.g. len for chunks); default 1
+            idle: Called on the worker thread every IDLE_POLL_SECONDS while its queue is empty
+        """
+        self.name = name
+        self.handler = handler
+        self.workers = max(workers, 1)
+        self.size = size or (lambda item: 1)
+        self.idle = idle
+        self.inbox: Optional[queue.Queue] = None
+        self._lock = threading.Lock()
+        self._running_workers = 0
+        self._started_at = 0.0
+        self.reset_stats()
+    
+    def reset_stats(self):
+        """Clear the counters (they otherwise add up over several runs)"""
+        self.items_in = 0
+        self.items_out = 0
+        self.errors = 0
+        self.busy_seconds = 0.0
+        self.active_seconds = 0.0
+    
+    def stats(self) -> Dict:
+        """
+        Get the stage's counters
+        
+        Returns:
+            Dict with items_in, items_out (both counted with the stages' size
+            functions), errors, busy_seconds (summed over workers),
+            active_seconds (wall time the stage was running) and throughput
+            (items_in per active second)
+        """
+        return {
+            'workers': self.workers,
+            'items_in': self.items_in,
+            'items_out': self.items_out,
+            'errors': self.errors,
+            'busy_seconds': round(self.busy_seconds, 3),
+            'active_seconds': round(self.active_seconds, 3),
+            'throughput': round(self.items_in / self.active_seconds, 2) if self.active_seconds else 0.0
+        }
+
+
+class ScanPipeline:
+    """Linear chain of stages; items flow from the first stage to the last"""
+    
+    def __init__(self, queue_size: int = 8):
+        """
+        Initialize pipeline
+        
+        Args:
+            queue_size: Items each stage's input queue holds before upstream workers block
+        """
+        self.queue_size = max(queue_size, 1)
+        self.stages: List[PipelineStage] = []
+        self.runs = 0
+        self.elapsed_seconds = 0.0
+    
+    def add_stage(self, name: str, handler: Callable[[object], Optional[List]], workers: int = 1,
+                  size: Optional[Callable[[object], int]] = None,
+                  idle: Optional[Callable[[], None]] = None) -> 'ScanPipeline':
+        """Append a stage (see PipelineStage); returns the pipeline for chaining"""
+        self.stages.append(PipelineStage(name, handler, workers, size, idle))
+        return self
+    
+    def run(self, items: Iterable):
+        """
+        Push items through every stage and wait until all of them are done
+        
+        Items are fed to the first stage from the calling thread, which blocks while
+        that stage's queue is full. Exceptions raised by a handler are logged and the
+        item is dropped; the rest of the run carries on.
+        """
+        if not self.stages:
+            return
+        
+        started = time.perf_counter()
+        for stage in self.stages:
+            stage.inbox = queue.Queue(maxsize=self.queue_size)
+            stage._running_workers = stage.workers
+            stage._started_at = started
+        
+        threads = []
+        for index, stage in enumerate(self.stages):
+            for worker in range(stage.workers):
+                thread = threading.Thread(target=self._work, args=(index,), name=f'{stage.name}-{worker}',
+                                          daemon=True)
+                thread.start()
+                threads.append(thread)
+        
+        first = self.stages[0]
+        try:
+            for item in items:
+                first.inbox.put(item)
+        finally:
+            for _ in range(first.workers):
+                first.inbox.put(_DONE)
+            for thread in threads:
+                thread.join()
+        
+        self.runs += 1
+        self.elapsed_seconds += time.perf_counter() - started
+    
+    def summary(self) -> Dict[str, Dict]:
+        """Get per-stage counters (see PipelineStage.stats), keyed by stage name"""
+        return {stage.name: stage.stats() for stage in self.stages}
+    
+    def log_summary(self):
+        """Log per-stage throughput; the stage with the most busy time per worker is the bottleneck"""
+        if not self.runs:
+            return
+        
+        logger.info(f"Pipeline summary ({self.runs} run(s), {self.elapsed_seconds:.1f}s):")
+        for name, stats in self.summary().items():
+            logger.info(f"  {name:<10} {stats['workers']:>2} workers  {stats['items_in']:>6} in → "
+                        f"{stats['items_out']:>6} out  {stats['throughput']:>8.1f}/s  "
+                        f"busy {stats['busy_seconds']:.1f}s  errors {stats['errors']}")
+        bottleneck = max(self.stages, key=lambda stage: stage.busy_seconds / stage.workers)
+        logger.info(f"  Slowest stage: {bottleneck.name}")
+    
+    def _work(self, index: int):
+        """Worker loop: take items from the stage's queue, pass results downstream"""
+        stage = self.stages[index]
+        next_stage = self.stages[index + 1] if index + 1 < len(self.stages) else None
+        try:
+            while True:
+                try:
+                    item = stage.inbox.get(timeout=IDLE_POLL_SECONDS if stage.idle else None)
+                except queue.Empty:
+                    stage.idle()
+                    continue
+                if item is _DONE:
+                    return
+                
+                started = time.perf_counter()
+                try:
+                    outputs = stage.handler(item) or []
+                except Exception as e:
+                    logger.error(f"Pipeline stage '{stage.name}' failed on an item: {e}")
+                    outputs = []
+                    with stage._lock:
+                        stage.errors += 1
+                
+                with stage._lock:
+                    stage.items_in += stage.size(item)
+                    stage.items_out += sum(next_stage.size(output) for output in outputs) if next_stage \
+                        else len(outputs)
+                    stage.busy_seconds += time.perf_counter() - started
+                
+                if next_stage:
+                    for output in outputs:
+                        # Blocks while the next stage is behind (backpressure)
+                        next_stage.inbox.put(output)
+        finally:
+            with stage._lock:
+                stage._running_workers -= 1
+                last_worker = stage._running_workers == 0
+                if last_worker:
+                    stage.active_seconds += time.perf_counter() - stage._started_at
+            if last_worker and next_stage:
+                for _ in range(next_stage.workers):
+                    next_stage.inbox.put(_DONE)
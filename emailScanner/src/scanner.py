@@ -2,19 +2,32 @@
 Email scanner orchestration - coordinates email fetching, analysis, and storage.
 Main entry point for scanning new emails.
 """
+import asyncio
+import json
 import logging
 import argparse
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta, UTC
 from typing import Optional, List
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, scoped_session, sessionmaker
 
-from models import Email, Analysis, SystemStats, init_db, get_session
+from models import Email, Analysis, SystemStats, FolderSyncState, ScanRun, init_db, get_session
 from email_client import EmailClient
+from async_email_client import AsyncEmailClient
+from imap_pool import IMAPConnectionPool
 from ollama_analyzer import OllamaAnalyzer
-from settings import load_settings
+from settings import load_settings, Settings
 from rules import EmailRules
 from sender_memory import SenderMemory
+from gmail_categories import GmailCategoryClassifier
 from confidence_calibration import ConfidenceCalibrator
+from llm_cache import LLMResponseCache
+from scan_pipeline import ScanPipeline
+from batch_writer import BatchWriter
 
 logging.basicConfig(
     level=logging.INFO,
@@ -22,6 +35,9 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# UIDs per IN (...) query when checking which emails are already stored (SQLite allows 999 parameters)
+STORED_UID_CHUNK = 900
+
 
 class EmailScanner:
     """Main scanner class that coordinates the email analysis pipeline"""
@@ -35,8 +51,19 @@ class EmailScanner:
         """
         self.config = config
         self.email_client = None
+        self.fetcher = None  # EmailClient or IMAPConnectionPool used for bulk fetches
+        self._handled_uids = set()  # UIDs stored or already known during the current scan
+        self._stage_counts = Counter()  # Emails decided per tier (Analysis.model_name) during the current run
+        self._pipeline = None  # ScanPipeline of the current run when pipeline mode is on
+        self._pipeline_sessions = None  # Thread-local sessions for pipeline stages that read the database
+        self._pipeline_processed = 0
+        self._imap_lock = threading.Lock()  # pipeline workers share the main connection when there is no pool
         self.analyzer = None
+        self.cascade = []  # (analyzer, min_confidence) per model, cheapest first; starts with self.analyzer
         self.db_session = None
+        self.writer = None  # BatchWriter for emails and analyses, created with the session
+        self.calibrator = None  # ConfidenceCalibrator whose snapshot is reused across the run
+        self.llm_cache = None  # LLMResponseCache shared by all analyzer calls (None if disabled)
         # Initialize rules engine with config
         self.rules = EmailRules(
             vip_senders=config.vip_senders,
@@ -49,6 +76,12 @@ class EmailScanner:
             promotional_keywords=config.promotional_keywords,
             old_promotional_days=config.old_promotional_days
         )
+        # Tier 0: Gmail's own inbox categories (optional, Gmail only)
+        self.gmail_categories = GmailCategoryClassifier(
+            age_days=config.gmail_category_days,
+            confidence=config.gmail_category_confidence
+        ) if config.gmail_category_tier else None
+        self._gmail_category_by_uid = {}  # UID -> Gmail category for the batch being scanned
         
     def initialize(self) -> bool:
         """Initialize all components"""
@@ -57,16 +90,51 @@ class EmailScanner:
             logger.info("Initializing database...")
             engine = init_db(self.config.database_url)
             self.db_session = get_session(engine)
+            self.writer = BatchWriter(
+                self.db_session,
+                max_rows=self.config.write_batch_rows,
+                max_seconds=self.config.write_batch_seconds
+            )
+            self.calibrator = ConfidenceCalibrator(self.db_session)
+            if self.config.llm_cache_enabled:
+                self.llm_cache = LLMResponseCache(
+                    self.db_session,
+                    max_entries=self.config.llm_cache_max_entries,
+                    ttl_days=self.config.llm_cache_ttl_days
+                )
             
             # Initialize Ollama analyzer with database session for few-shot learning
             logger.info("Initializing Ollama analyzer...")
+            stages = self.config.ollama_cascade or [{'model': self.config.ollama_model, 'min_confidence': 0.0}]
             self.analyzer = OllamaAnalyzer(
                 base_url=self.config.ollama_base_url,
-                model=self.config.ollama_model,
-                db_session=self.db_session
+                model=stages[0]['model'],
+                db_session=self.db_session,
+                max_concurrency=self.config.ollama_max_concurrency,
+                prompt_batch_size=self.config.ollama_prompt_batch_size,
+                keep_alive=self.config.ollama_keep_alive,
+                warm_up=self.config.ollama_warm_up,
+                cache=self.llm_cache,
+                structured_output=self.config.ollama_structured_output,
+                stream=self.config.ollama_stream,
+                num_predict=self.config.ollama_num_predict,
+                hosts=self.config.ollama_hosts,
+                health_check_interval=self.config.ollama_health_check_interval
             )
+            # Larger models of the cascade share the first analyzer's hosts, connections and cache.
+            # Only the first model is warmed up; the others load when an email is escalated and
+            # unload soon after, so memory-limited hosts don't hold every model at once.
+            self.cascade = [(self.analyzer, stages[0]['min_confidence'])] + [
+                (self.analyzer.with_model(stage['model'], keep_alive=self.config.ollama_escalation_keep_alive),
+                 stage['min_confidence'])
+                for stage in stages[1:]
+            ]
+            if len(self.cascade) > 1:
+                logger.info("Model cascade: " + " → ".join(
+                    f"{stage['model']} (≥{stage['min_confidence']:.0%})" for stage in stages[:-1]
+                ) + f" → {stages[-1]['model']}")
             
-            if not self.analyzer.check_connection():
+            if not all(analyzer.check_connection() for analyzer, _ in self.cascade):
                 logger.error("Cannot connect to Ollama. Make sure it's running.")
                 return False
             
@@ -76,7 +144,10 @@ class EmailScanner:
                 server=self.config.email_server,
                 email_address=self.config.email_address,
                 password=self.config.email_password,
-                port=self.config.email_port
+                port=self.config.email_port,
+                fetch_chunk_size=self.config.fetch_chunk_size,
+                max_body_bytes=self.config.body_fetch_bytes,
+                max_body_chars=self.config.max_body_chars
             )
             
             if not self.email_client.connect():
@@ -92,7 +163,8 @@ class EmailScanner:
     
     def scan_new_emails(self, folder: str = 'INBOX', limit: Optional[int] = None, 
                         since_date: Optional[datetime] = None, before_date: Optional[datetime] = None,
-                        newest_first: bool = False, rescan: bool = False) -> int:
+                        newest_first: bool = False, rescan: bool = False,
+                        gmail_query: Optional[str] = None) -> int:
         """
         Scan and analyze new emails
         
@@ -103,6 +175,7 @@ class EmailScanner:
             before_date: Only fetch emails before this date
             newest_first: If True, process newest emails first; if False, process oldest first
             rescan: If True, re-analyze emails that have already been processed
+            gmail_query: Gmail search query run on the server (X-GM-RAW), e.g. 'category:promotions'
         
         Returns:
             Number of emails processed
@@ -115,12 +188,36 @@ class EmailScanner:
                 logger.error(f"Failed to select folder: {folder}")
                 return 0
             
+            self._handled_uids = set()
+            self._check_uidvalidity(folder)
+            
+            # Incremental scans only ask for UIDs above the folder's checkpoint
+            sync_state = None
+            if self.config.incremental_scan and not rescan and not since_date and not before_date \
+                    and not gmail_query:
+                sync_state = self._load_sync_state(folder)
+            
             # Search for emails to process
-            search_criteria = self._build_search_criteria(since_date, before_date)
-            email_ids = self.email_client.search_emails(search_criteria, limit=limit, newest_first=newest_first)
+            new_uids = []
+            if sync_state:
+                new_uids = self._search_since_checkpoint(sync_state)
+                email_ids = new_uids
+                if limit and len(new_uids) > limit:
+                    email_ids = new_uids[-limit:] if newest_first else new_uids[:limit]
+            elif gmail_query:
+                date_criteria = self._build_search_criteria(since_date, before_date)
+                email_ids = self.email_client.search_gmail(
+                    gmail_query, extra_criteria=None if date_criteria == 'ALL' else date_criteria,
+                    limit=limit, newest_first=newest_first
+                )
+            else:
+                search_criteria = self._build_search_criteria(since_date, before_date)
+                email_ids = self.email_client.search_emails(search_criteria, limit=limit, newest_first=newest_first,
+                                                            use_uid=True)
             
             if not email_ids:
                 logger.info("No new emails to process")
+                self._save_checkpoint(sync_state, new_uids)
                 return 0
             
             logger.info(f"Found {len(email_ids)} emails to process")
@@ -130,48 +227,24 @@ class EmailScanner:
                 logger.info("Rescan mode: will fetch and re-analyze all emails")
                 email_ids_to_fetch = email_ids
             else:
-                # Check which email IDs are already in database
-                new_email_ids = []
-                skipped_count = 0
-                
-                for email_id in email_ids:
-                    existing = self.db_session.query(Email).filter_by(email_id=email_id).first()
-                    if not existing:
-                        new_email_ids.append(email_id)
-                    else:
-                        skipped_count += 1
+                # Check which email IDs are already in database (set difference, not a query per ID)
+                stored = self._stored_uids(email_ids, folder)
+                self._handled_uids.update(stored)
                 
-                if skipped_count > 0:
-                    logger.info(f"Skipped {skipped_count} already-processed emails")
+                if stored:
+                    logger.info(f"Skipped {len(stored)} already-processed emails")
                 
-                email_ids_to_fetch = new_email_ids
+                email_ids_to_fetch = [email_id for email_id in email_ids if email_id not in stored]
             
             if not email_ids_to_fetch:
                 logger.info("No new emails to fetch and process")
+                self._save_checkpoint(sync_state, new_uids)
                 return 0
             
-            logger.info(f"Fetching {len(email_ids_to_fetch)} emails from IMAP")
+            run = self._start_run(folder, email_ids_to_fetch, new_uids, rescan)
+            processed_count, total_emails = self._execute_run(run)
             
-            # Fetch only new emails
-            emails = self.email_client.fetch_emails_batch(email_ids_to_fetch)
-            
-            total_emails = len(emails)
-            logger.info(f"Processing {total_emails} emails")
-            
-            # Process each email with progress updates
-            processed_count = 0
-            for idx, email_data in enumerate(emails, 1):
-                sender = email_data.get('sender', 'Unknown')
-                subject = email_data.get('subject', 'No Subject')
-                
-                # Show progress
-                logger.info(f"[{idx}/{total_emails}] Processing: {sender[:40]} - {subject[:60]}")
-                
-                if self._process_email(email_data, folder):
-                    processed_count += 1
-                    logger.info(f"  ✓ Success ({processed_count} processed so far)")
-                else:
-                    logger.warning(f"  ✗ Failed to process")
+            self._save_checkpoint(sync_state, new_uids)
             
             # Update system stats
             self._update_stats(processed_count)
@@ -183,6 +256,718 @@ class EmailScanner:
             logger.error(f"Error during email scan: {e}")
             return 0
     
+    def resume_scan(self) -> int:
+        """
+        Continue the most recent unfinished scan run from its checkpoint
+        
+        The run's saved UID list is used as is, so the mailbox is not searched again.
+        
+        Returns:
+            Number of emails processed
+        """
+        try:
+            run = self.db_session.query(ScanRun).filter(
+                ScanRun.status.in_(['running', 'interrupted'])
+            ).order_by(ScanRun.id.desc()).first()
+            if not run:
+                logger.info("No unfinished scan run to resume")
+                return 0
+            
+            uids = json.loads(run.uids)
+            logger.info(f"Resuming scan run {run.id} on '{run.folder}' at {run.position}/{len(uids)}")
+            
+            if not self.email_client.select_folder(run.folder):
+                logger.error(f"Failed to select folder: {run.folder}")
+                return 0
+            
+            uidvalidity = self.email_client.folder_status.get('uidvalidity')
+            if run.uidvalidity is not None and uidvalidity != run.uidvalidity:
+                logger.warning(f"UIDVALIDITY of '{run.folder}' changed since run {run.id}; "
+                               f"its UIDs are stale, run a normal scan instead")
+                self._finish_run(run, 'abandoned')
+                return 0
+            
+            self._handled_uids = set()
+            self._stage_counts = Counter()
+            if not run.rescan:
+                # Emails stored just before the interruption don't need another LLM call
+                self._handled_uids.update(self._stored_uids(uids[run.position:], run.folder))
+            
+            processed_count, total_emails = self._execute_run(run)
+            
+            new_uids = json.loads(run.new_uids or '[]')
+            if new_uids and run.status == 'completed':
+                sync_state = self._load_sync_state(run.folder)
+                self._handled_uids.update(self._stored_uids(new_uids, run.folder))
+                self._save_checkpoint(sync_state, new_uids)
+            
+            self._update_stats(processed_count)
+            logger.info(f"Resumed run finished ({run.status}). Processed {processed_count}/{total_emails} emails")
+            return processed_count
+            
+        except Exception as e:
+            logger.error(f"Error resuming scan: {e}")
+            return 0
+    
+    def _start_run(self, folder: str, uids: List[str], new_uids: List[str], rescan: bool) -> ScanRun:
+        """Record a new scan run, superseding older unfinished runs on the folder"""
+        self.db_session.query(ScanRun).filter(
+            ScanRun.folder == folder,
+            ScanRun.status.in_(['running', 'interrupted'])
+        ).update({'status': 'superseded'}, synchronize_session=False)
+        
+        run = ScanRun(
+            folder=folder,
+            status='running',
+            rescan=rescan,
+            uidvalidity=self.email_client.folder_status.get('uidvalidity'),
+            uids=json.dumps(uids),
+            new_uids=json.dumps(new_uids),
+            position=0,
+            stage_counts='{}'
+        )
+        self.db_session.add(run)
+        self.db_session.commit()
+        self._stage_counts = Counter()
+        return run
+    
+    def _execute_run(self, run: ScanRun) -> tuple:
+        """
+        Process a run's UIDs from its saved position, checkpointing every batch
+        
+        Each batch of checkpoint_interval UIDs is fetched and processed, then the
+        run's position and counters are committed. If UIDs are left unhandled because
+        the IMAP connection dropped, the scanner reconnects with backoff and retries
+        just those UIDs. If it cannot reconnect, or Ollama stops answering, the run is
+        left 'interrupted' for scanner.py --resume.
+        
+        Returns:
+            Tuple of (processed_count, total_emails) for this invocation
+        """
+        uids = json.loads(run.uids)
+        interval = max(self.config.checkpoint_interval, 1)
+        # One full calibration load per run; decisions made meanwhile are added incrementally
+        self.calibrator.refresh(full=True)
+        processed_count = 0
+        total_emails = 0
+        attempts = 0
+        
+        # Async mode streams bodies over its own session, so the pool only helps header-first scans
+        pool = None
+        if self.config.header_first or not self.config.async_fetch or self.config.pipeline_enabled:
+            pool = self._open_pool(run.folder, len(uids) - run.position)
+        self.fetcher = pool or self.email_client
+        if self.config.pipeline_enabled:
+            self._pipeline = self._build_pipeline(run.folder)
+        try:
+            while run.position < len(uids):
+                batch = uids[run.position:run.position + interval]
+                todo = [uid for uid in batch if uid not in self._handled_uids]
+                
+                stage_counts = Counter(json.loads(run.stage_counts or '{}'))
+                before = Counter(self._stage_counts)
+                processed, total = self._scan_batch(todo, run.folder) if todo else (0, 0)
+                self._flush_writes()
+                processed_count += processed
+                total_emails += total
+                stage_counts['fetched'] += total
+                stage_counts.update(self._stage_counts - before)
+                run.processed_count = (run.processed_count or 0) + processed
+                run.stage_counts = json.dumps(stage_counts)
+                
+                unhandled = [uid for uid in batch if uid not in self._handled_uids]
+                if unhandled and not (self.email_client.is_alive() and (pool is None or pool.is_alive())):
+                    attempts += 1
+                    if attempts > self.config.reconnect_attempts or not self._reconnect_with_backoff(run.folder):
+                        self._finish_run(run, 'interrupted', 'IMAP connection lost')
+                        return processed_count, total_emails
+                    if pool:
+                        pool.close()
+                        pool = self._open_pool(run.folder, len(uids) - run.position)
+                        self.fetcher = pool or self.email_client
+                    # Retry only what was not handled before the connection dropped
+                    continue
+                
+                if todo and len(unhandled) == len(todo) and not self.analyzer.check_connection(warm_up=False):
+                    self._finish_run(run, 'interrupted', 'Ollama not reachable')
+                    return processed_count, total_emails
+                
+                attempts = 0
+                run.position += len(batch)
+                run.failed_count = (run.failed_count or 0) + len(unhandled)
+                run.updated_at = datetime.now(UTC)
+                self.db_session.commit()
+                logger.info(f"Scan run {run.id}: checkpoint at {run.position}/{len(uids)}")
+            
+            self._finish_run(run, 'completed')
+        finally:
+            self._flush_writes()
+            if self._pipeline:
+                self._pipeline.log_summary()
+                self._pipeline = self._pipeline_sessions = None
+            if pool:
+                pool.close()
+            self.fetcher = self.email_client
+        
+        return processed_count, total_emails
+    
+    def _flush_writes(self):
+        """Commit buffered emails, then the LLM cache entries (one SQLite writer at a time)"""
+        self.writer.flush()
+        if self.llm_cache:
+            self.llm_cache.flush()
+    
+    def _finish_run(self, run: ScanRun, status: str, error: Optional[str] = None):
+        """Record a run's final (or interrupted) status"""
+        try:
+            run.status = status
+            run.last_error = error
+            run.updated_at = datetime.now(UTC)
+            if status != 'interrupted':
+                run.finished_at = datetime.now(UTC)
+            self.db_session.commit()
+            if error:
+                logger.warning(f"Scan run {run.id} {status}: {error}. Continue it with --resume")
+        except Exception as e:
+            logger.error(f"Failed to save scan run status: {e}")
+            self.db_session.rollback()
+    
+    def _scan_batch(self, uids: List[str], folder: str) -> tuple:
+        """
+        Fetch and process one batch of UIDs with the configured fetch mode
+        
+        Returns:
+            Tuple of (processed_count, total_emails)
+        """
+        if self.gmail_categories and self.email_client.is_gmail:
+            self._gmail_category_by_uid = self.email_client.gmail_categories(
+                uids, GmailCategoryClassifier.CATEGORIES
+            )
+        
+        result = None
+        if self._pipeline:
+            result = self._scan_pipeline(uids)
+        elif self.config.header_first:
+            result = self._scan_header_first(uids, folder)
+        elif self.config.async_fetch:
+            result = self._scan_async(uids, folder)
+        if result:
+            return result
+        
+        logger.info(f"Fetching {len(uids)} emails from IMAP")
+        
+        # Fetch only new emails, many UIDs per FETCH command
+        emails = self.fetcher.fetch_emails_batch(uids, use_uid=True)
+        
+        total_emails = len(emails)
+        logger.info(f"Processing {total_emails} emails")
+        return self._process_emails(emails, folder), total_emails
+    
+    def _stored_uids(self, uids: List[str], folder: str) -> set:
+        """
+        Return the UIDs among uids that already have an Email row for folder
+        
+        Uses one indexed IN (...) query per STORED_UID_CHUNK UIDs instead of a query
+        per UID, so checking a whole mailbox takes a few hundred queries at most.
+        UIDs are only unique within a folder, so rows of other folders never match.
+        """
+        stored = set()
+        for start in range(0, len(uids), STORED_UID_CHUNK):
+            chunk = uids[start:start + STORED_UID_CHUNK]
+            stored.update(email_id for (email_id,) in self.db_session.query(Email.email_id).filter(
+                Email.folder == folder, Email.email_id.in_(chunk)))
+        return stored
+    
+    def _reconnect_with_backoff(self, folder: str) -> bool:
+        """Reconnect to the IMAP server, waiting 2, 4, 8... seconds between attempts"""
+        delay = 2
+        for attempt in range(1, self.config.reconnect_attempts + 1):
+            logger.warning(f"IMAP connection lost; reconnect attempt {attempt}/{self.config.reconnect_attempts} "
+                           f"in {delay}s")
+            time.sleep(delay)
+            if self._reconnect(folder):
+                return True
+            delay = min(delay * 2, 60)
+        logger.error("Could not reconnect to the email server")
+        return False
+    
+    def _check_uidvalidity(self, folder: str):
+        """
+        Retire the folder's stored UIDs if the server's UIDVALIDITY changed since the last scan
+        
+        Old rows are moved to "<folder> (UIDVALIDITY <old>)" so their UIDs no longer count
+        as already processed (and cleanup never acts on them), and the checkpoint restarts.
+        """
+        uidvalidity = self.email_client.folder_status.get('uidvalidity')
+        if uidvalidity is None:
+            return
+        
+        state = self.db_session.query(FolderSyncState).filter_by(folder=folder).first()
+        if not state:
+            self.db_session.add(FolderSyncState(folder=folder, uidvalidity=uidvalidity, last_seen_uid=0))
+        elif state.uidvalidity != uidvalidity:
+            retired = self.db_session.query(Email).filter(Email.folder == folder).update(
+                {Email.folder: f"{folder} (UIDVALIDITY {state.uidvalidity})"}, synchronize_session=False
+            )
+            logger.warning(f"UIDVALIDITY of '{folder}' changed ({state.uidvalidity} → {uidvalidity}); "
+                           f"retired {retired} stored UIDs and scanning the folder from the start")
+            state.uidvalidity = uidvalidity
+            state.last_seen_uid = 0
+            state.highest_modseq = None
+        else:
+            return
+        
+        try:
+            self.db_session.commit()
+        except Exception as e:
+            logger.error(f"Failed to record UIDVALIDITY of '{folder}': {e}")
+            self.db_session.rollback()
+    
+    def _load_sync_state(self, folder: str) -> Optional[FolderSyncState]:
+        """
+        Load (or create) the folder's checkpoint and sync flag changes since the last scan
+        
+        Returns:
+            Sync state, or None if the server gives no UIDVALIDITY (full search needed)
+        """
+        status = self.email_client.folder_status
+        uidvalidity = status.get('uidvalidity')
+        if uidvalidity is None:
+            logger.info("Server did not report UIDVALIDITY; running a full search")
+            return None
+        
+        # Creates the state, or resets it if the folder's UIDs were renumbered
+        self._check_uidvalidity(folder)
+        state = self.db_session.query(FolderSyncState).filter_by(folder=folder).first()
+        if state:
+            self._sync_flag_changes(state)
+        
+        return state
+    
+    def _search_since_checkpoint(self, state: FolderSyncState) -> List[str]:
+        """Return UIDs above the checkpoint, in ascending order"""
+        uidnext = self.email_client.folder_status.get('uidnext')
+        if state.last_seen_uid and uidnext is not None and uidnext <= state.last_seen_uid + 1:
+            logger.info(f"No new messages since UID {state.last_seen_uid} (UIDNEXT {uidnext})")
+            return []
+        
+        uids = self.email_client.search_emails(f'UID {state.last_seen_uid + 1}:*', use_uid=True)
+        # "n:*" always matches the highest UID, even when that is below n
+        return sorted((uid for uid in uids if int(uid) > state.last_seen_uid), key=int)
+    
+    def _sync_flag_changes(self, state: FolderSyncState):
+        """Pull read/unread changes for already-synced messages via CONDSTORE CHANGEDSINCE"""
+        modseq = self.email_client.folder_status.get('highestmodseq')
+        if (not self.email_client.condstore_enabled or modseq is None
+                or state.highest_modseq is None or modseq <= state.highest_modseq):
+            return
+        
+        changes = self.email_client.fetch_flag_changes(state.highest_modseq, state.last_seen_uid)
+        for uid, flags in changes.items():
+            self.db_session.query(Email).filter_by(folder=state.folder, email_id=uid).update(
+                {'is_read': '\\Seen' in flags})
+        logger.info(f"Synced flag changes for {len(changes)} emails (MODSEQ {state.highest_modseq} → {modseq})")
+        state.highest_modseq = modseq
+    
+    def _save_checkpoint(self, state: Optional[FolderSyncState], new_uids: List[str]):
+        """
+        Advance the checkpoint past every new UID that has been handled
+        
+        The checkpoint stops at the first UID that was skipped by the limit or failed,
+        so those are picked up again on the next scan.
+        """
+        if not state:
+            return
+        
+        last_seen = state.last_seen_uid or 0
+        for uid in new_uids:
+            if uid not in self._handled_uids:
+                break
+            last_seen = int(uid)
+        
+        try:
+            state.last_seen_uid = last_seen
+            if state.highest_modseq is None:
+                state.highest_modseq = self.email_client.folder_status.get('highestmodseq')
+            state.updated_at = datetime.now(UTC)
+            self.db_session.commit()
+            logger.info(f"Checkpoint for '{state.folder}': last seen UID {last_seen}")
+        except Exception as e:
+            logger.error(f"Failed to save sync checkpoint: {e}")
+            self.db_session.rollback()
+    
+    def _open_pool(self, folder: str, email_count: int) -> Optional[IMAPConnectionPool]:
+        """
+        Open a pool of IMAP sessions when the batch is big enough to shard
+        
+        Returns:
+            Open pool, or None to fetch over the main connection
+        """
+        if self.config.imap_max_connections <= 1 or email_count <= self.config.fetch_chunk_size:
+            return None
+        
+        pool = IMAPConnectionPool(
+            server=self.config.email_server,
+            email_address=self.config.email_address,
+            password=self.config.email_password,
+            port=self.config.email_port,
+            size=self.config.imap_max_connections,
+            fetch_chunk_size=self.config.fetch_chunk_size,
+            max_body_bytes=self.config.body_fetch_bytes,
+            max_body_chars=self.config.max_body_chars
+        )
+        if pool.open(folder) == 0:
+            logger.warning("Could not open parallel IMAP sessions, fetching over the main connection")
+            return None
+        return pool
+    
+    def _build_pipeline(self, folder: str) -> ScanPipeline:
+        """
+        Build the staged pipeline used for every batch of a run
+        
+        fetch → parse → tier → fetch_body → llm → write. Chunks of UIDs flow through
+        the first stages; after fetch_body each email travels on its own so the LLM
+        workers share the load. Stages that read the database get a session per
+        thread; all writes go through the single writer on the main session.
+        """
+        headers_only = self.config.header_first
+        sessions = self._pipeline_sessions = scoped_session(sessionmaker(bind=self.db_session.get_bind()))
+        
+        def fetch(uids: List[str]) -> List:
+            with self._imap_session() as client:
+                return [client.fetch_raw(uids, headers_only=headers_only)]
+        
+        def parse(messages: List[dict]) -> List:
+            emails = [self.email_client.parse_message(message, headers_only) for message in messages]
+            return [[email_data for email_data in emails if email_data]]
+        
+        def tier(emails: List[dict]) -> List:
+            try:
+                return [[(email_data, self._classify_without_llm(email_data, db_session=sessions))
+                         for email_data in emails]]
+            finally:
+                sessions.remove()
+        
+        def fetch_body(pairs: List[tuple]) -> List:
+            if not headers_only:
+                return pairs
+            
+            undecided = [email_data['email_id'] for email_data, analysis in pairs if analysis is None]
+            bodies = {}
+            if undecided:
+                sizes = {email_data['email_id']: email_data['size_bytes'] or 0 for email_data, _ in pairs}
+                full_uids = [uid for uid in undecided if sizes[uid] <= self.config.full_fetch_max_bytes]
+                partial_uids = [uid for uid in undecided if sizes[uid] > self.config.full_fetch_max_bytes]
+                with self._imap_session() as client:
+                    fetched = client.fetch_emails_batch(full_uids, use_uid=True) if full_uids else []
+                    if partial_uids:
+                        fetched += client.fetch_emails_partial(partial_uids)
+                bodies = {email_data['email_id']: email_data for email_data in fetched}
+            
+            results = []
+            try:
+                for email_data, analysis in pairs:
+                    if analysis is None:
+                        email_data = bodies.get(email_data['email_id'])
+                        if not email_data:
+                            continue
+                        # Body-dependent rules, then sender memory, run now that the body is here
+                        analysis = self._classify_without_llm(email_data, db_session=sessions)
+                    results.append((email_data, analysis))
+            finally:
+                sessions.remove()
+            return results
+        
+        def llm(pair: tuple) -> List:
+            email_data, analysis = pair
+            if analysis is None:
+                try:
+                    analysis = self._analyze_with_llm(email_data)
+                finally:
+                    sessions.remove()
+                if not analysis:
+                    logger.warning(f"Failed to analyze email {email_data['email_id']}")
+                    return []
+            return [(email_data, analysis)]
+        
+        def write(pair: tuple) -> List:
+            email_data, analysis = pair
+            if self._process_email(email_data, folder, analysis_result=analysis):
+                self._pipeline_processed += 1
+            return []
+        
+        return (ScanPipeline(queue_size=self.config.pipeline_queue_size)
+                .add_stage('fetch', fetch, self.config.pipeline_fetch_workers, size=len)
+                .add_stage('parse', parse, self.config.pipeline_parse_workers, size=len)
+                .add_stage('tier', tier, self.config.pipeline_tier_workers, size=len)
+                .add_stage('fetch_body', fetch_body, 1 if self.fetcher is self.email_client
+                           else self.config.pipeline_fetch_workers, size=len)
+                .add_stage('llm', llm, self.config.pipeline_llm_workers)
+                .add_stage('write', write, idle=self.writer.flush_if_due))
+    
+    def _scan_pipeline(self, uids: List[str]) -> tuple:
+        """
+        Run one batch of UIDs through the run's pipeline
+        
+        Returns:
+            Tuple of (processed_count, total_emails)
+        """
+        chunk_size = max(self.config.fetch_chunk_size, 1)
+        parse_stage = self._pipeline.stages[1]
+        parsed_before = parse_stage.items_out
+        self._pipeline_processed = 0
+        
+        # The analyzers' few-shot lookups run on LLM worker threads; give them per-thread sessions
+        analyzer_session = getattr(self.analyzer, 'db_session', None)
+        if analyzer_session is not None:
+            for analyzer, _ in self.cascade:
+                analyzer.db_session = self._pipeline_sessions
+        try:
+            logger.info(f"Scanning {len(uids)} emails through the pipeline")
+            self._pipeline.run(uids[start:start + chunk_size] for start in range(0, len(uids), chunk_size))
+        finally:
+            if analyzer_session is not None:
+                for analyzer, _ in self.cascade:
+                    analyzer.db_session = analyzer_session
+        
+        return self._pipeline_processed, parse_stage.items_out - parsed_before
+    
+    @contextmanager
+    def _imap_session(self):
+        """Borrow an IMAP session for one pipeline worker (a pool session, or the locked main connection)"""
+        if self.fetcher is not self.email_client:
+            with self.fetcher.session() as client:
+                yield client
+        else:
+            with self._imap_lock:
+                yield self.email_client
+    
+    def _scan_header_first(self, uids: List[str], folder: str) -> tuple:
+        """
+        Two-phase scan: classify on headers, then fetch bodies only for LLM-bound mail
+        
+        Phase 1 fetches a small set of headers for every UID and runs the Gmail category
+        tier and the rules the body cannot change on them. Phase 2 downloads full messages
+        for the rest and runs the normal tiers (rules, sender memory, LLM) on those, so
+        every email gets the decision a full scan would give it.
+        
+        Returns:
+            Tuple of (processed_count, total_emails)
+        """
+        logger.info(f"Phase 1: fetching headers for {len(uids)} emails")
+        headers = self.fetcher.fetch_headers_batch(uids)
+        
+        total_emails = len(headers)
+        processed_count = 0
+        needs_body = []
+        
+        sizes = {}
+        
+        for idx, email_data in enumerate(headers, 1):
+            analysis_result = self._classify_without_llm(email_data)
+            if not analysis_result:
+                needs_body.append(email_data['email_id'])
+                sizes[email_data['email_id']] = email_data['size_bytes'] or 0
+                continue
+            
+            logger.info(f"[{idx}/{total_emails}] Decided on headers: "
+                        f"{email_data['sender'][:40]} - {email_data['subject'][:60]}")
+            if self._process_email(email_data, folder, analysis_result=analysis_result):
+                processed_count += 1
+            else:
+                logger.warning(f"  ✗ Failed to process")
+        
+        logger.info(f"Phase 1 decided {processed_count}/{total_emails} emails from headers; "
+                    f"{len(needs_body)} need full bodies")
+        
+        if needs_body:
+            result = None
+            if self.config.async_fetch:
+                result = self._scan_async(needs_body, folder, sizes=sizes)
+            if result:
+                processed_count += result[0]
+            else:
+                emails = self._fetch_bodies(needs_body, sizes)
+                processed_count += self._process_emails(emails, folder)
+        
+        return processed_count, total_emails
+    
+    def _fetch_bodies(self, uids: List[str], sizes: dict) -> List[dict]:
+        """
+        Fetch bodies for LLM-bound emails
+        
+        Messages up to full_fetch_max_bytes are downloaded whole. Anything larger
+        (usually because of attachments) only gets its text part, capped at
+        body_fetch_bytes, so big PDFs and images never cross the wire.
+        """
+        full_uids = [uid for uid in uids if sizes.get(uid, 0) <= self.config.full_fetch_max_bytes]
+        partial_uids = [uid for uid in uids if sizes.get(uid, 0) > self.config.full_fetch_max_bytes]
+        
+        logger.info(f"Phase 2: fetching {len(full_uids)} full emails, {len(partial_uids)} text parts only")
+        fetched = {}
+        if full_uids:
+            for email_data in self.fetcher.fetch_emails_batch(full_uids, use_uid=True):
+                fetched[email_data['email_id']] = email_data
+        if partial_uids:
+            for email_data in self.fetcher.fetch_emails_partial(partial_uids):
+                fetched[email_data['email_id']] = email_data
+        
+        return [fetched[uid] for uid in uids if uid in fetched]
+    
+    def _scan_async(self, uids: List[str], folder: str, check_memory: bool = True,
+                    sizes: Optional[dict] = None) -> Optional[tuple]:
+        """
+        Fetch and analyze at the same time instead of back to back
+        
+        An asyncio IMAP session downloads emails chunk by chunk while a worker thread
+        stores and analyzes the chunks already received, so the next emails arrive
+        while earlier ones are waiting on Ollama. At most async_prefetch_chunks
+        chunks are held in memory waiting for analysis.
+        
+        Args:
+            uids: UIDs to fetch and process
+            folder: Email folder name
+            check_memory: Whether to consult sender memory before the LLM
+            sizes: Message sizes from a header pass; emails above full_fetch_max_bytes
+                   only get their text part, like _fetch_bodies
+        
+        Returns:
+            Tuple of (processed_count, total_emails), or None if the async session
+            could not be opened (caller falls back to a blocking fetch)
+        """
+        return asyncio.run(self._run_async_pipeline(uids, folder, check_memory, sizes or {}))
+    
+    async def _run_async_pipeline(self, uids: List[str], folder: str, check_memory: bool,
+                                  sizes: dict) -> Optional[tuple]:
+        """Producer/consumer loop behind _scan_async"""
+        client = AsyncEmailClient(
+            server=self.config.email_server,
+            email_address=self.config.email_address,
+            password=self.config.email_password,
+            port=self.config.email_port,
+            fetch_chunk_size=self.config.fetch_chunk_size,
+            max_body_bytes=self.config.body_fetch_bytes,
+            max_body_chars=self.config.max_body_chars
+        )
+        if not await client.connect() or not await client.select_folder(folder):
+            await client.disconnect()
+            logger.warning("Could not open async IMAP session, fetching synchronously")
+            return None
+        
+        full_uids = [uid for uid in uids if sizes.get(uid, 0) <= self.config.full_fetch_max_bytes]
+        partial_uids = [uid for uid in uids if sizes.get(uid, 0) > self.config.full_fetch_max_bytes]
+        chunks = asyncio.Queue(maxsize=max(self.config.async_prefetch_chunks, 1))
+        
+        async def produce():
+            try:
+                async for emails in client.iter_fetch_chunks(full_uids):
+                    await chunks.put(emails)
+                if partial_uids:
+                    # Partial fetches use the blocking client; run it off the event loop
+                    await chunks.put(await asyncio.to_thread(self.fetcher.fetch_emails_partial, partial_uids))
+            except Exception as e:
+                logger.error(f"Async fetch stopped early: {e}")
+            finally:
+                await chunks.put(None)
+        
+        logger.info(f"Fetching and analyzing {len(uids)} emails concurrently")
+        producer = asyncio.create_task(produce())
+        loop = asyncio.get_running_loop()
+        processed_count = 0
+        total_emails = 0
+        try:
+            # One worker thread keeps database work serialized on a single session
+            with ThreadPoolExecutor(max_workers=1) as worker:
+                while (emails := await chunks.get()) is not None:
+                    total_emails += len(emails)
+                    processed_count += await loop.run_in_executor(
+                        worker, self._process_emails, emails, folder, check_memory
+                    )
+            await producer
+        finally:
+            producer.cancel()
+            await client.disconnect()
+        
+        return processed_count, total_emails
+    
+    def _process_emails(self, emails: List[dict], folder: str, check_memory: bool = True) -> int:
+        """Process fetched emails one by one with progress updates"""
+        total_emails = len(emails)
+        processed_count = 0
+        
+        # With concurrent or batched Ollama requests, all LLM calls of the batch are sent up front
+        precomputed = None
+        if self.analyzer.max_concurrency > 1 or self.analyzer.prompt_batch_size > 1:
+            precomputed = self._analyze_concurrently(emails, check_memory)
+        
+        for idx, email_data in enumerate(emails, 1):
+            # Emails written before a slow LLM call still get committed on time
+            self.writer.flush_if_due()
+            sender = email_data.get('sender', 'Unknown')
+            subject = email_data.get('subject', 'No Subject')
+            
+            # Show progress
+            logger.info(f"[{idx}/{total_emails}] Processing: {sender[:40]} - {subject[:60]}")
+            
+            analysis_result = precomputed[idx - 1] if precomputed else None
+            if precomputed and analysis_result is None:
+                logger.warning(f"Failed to analyze email {email_data['email_id']}")
+                logger.warning(f"  ✗ Failed to process")
+                continue
+            
+            if self._process_email(email_data, folder, analysis_result=analysis_result, check_memory=check_memory):
+                processed_count += 1
+                logger.info(f"  ✓ Success ({processed_count} processed so far)")
+            else:
+                logger.warning(f"  ✗ Failed to process")
+        return processed_count
+    
+    def watch(self, folder: str = 'INBOX', limit: Optional[int] = None):
+        """
+        Process new mail as it arrives, using IMAP IDLE instead of periodic runs
+        
+        Catches up with a normal scan, then idles on the folder. Each EXISTS
+        notification triggers an incremental scan, so only new UIDs go through the
+        rules/memory/LLM tiers. IDLE is renewed before the server's 29-minute
+        timeout, and a dropped connection is re-established with backoff.
+        
+        Args:
+            folder: Email folder to watch
+            limit: Maximum number of emails to process per wake-up
+        """
+        if not self.email_client.has_capability('IDLE'):
+            logger.error("Email server does not support IMAP IDLE; run scanner.py periodically instead")
+            return
+        
+        idle_timeout = self.config.idle_timeout_minutes * 60
+        retry_delay = 5
+        logger.info(f"Watching '{folder}' for new mail (IDLE renewed every {self.config.idle_timeout_minutes} min)")
+        
+        self.scan_new_emails(folder=folder, limit=limit)
+        while True:
+            try:
+                if self.email_client.connection.state != 'SELECTED':
+                    self.email_client.select_folder(folder)
+                if self.email_client.idle(timeout=idle_timeout):
+                    logger.info("New mail notification received")
+                    self.scan_new_emails(folder=folder, limit=limit)
+                retry_delay = 5
+            except Exception as e:
+                logger.warning(f"IMAP connection lost ({e}); reconnecting in {retry_delay}s")
+                time.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, 300)
+                if self._reconnect(folder):
+                    # Pick up anything that arrived while we were disconnected
+                    self.scan_new_emails(folder=folder, limit=limit)
+    
+    def _reconnect(self, folder: str) -> bool:
+        """Drop the current IMAP connection and open a fresh one on folder"""
+        self.email_client.disconnect()
+        if self.email_client.connect() and self.email_client.select_folder(folder):
+            logger.info("Reconnected to email server")
+            return True
+        return False
+    
     def _build_search_criteria(self, since_date: Optional[datetime] = None, 
                                before_date: Optional[datetime] = None) -> str:
         """Build IMAP search criteria based on date filters"""
@@ -204,147 +989,261 @@ class EmailScanner:
         
         return 'ALL'
     
-    def _filter_new_emails(self, emails: List[dict], rescan: bool = False) -> List[dict]:
+    def _filter_new_emails(self, emails: List[dict], folder: str, rescan: bool = False) -> List[dict]:
         """Filter out emails that have already been processed (unless rescanning)"""
         if rescan:
             logger.info("Rescan mode: will re-analyze all emails")
             return emails
         
-        new_emails = []
-        skipped_count = 0
-        
-        for email_data in emails:
-            email_id = email_data.get('email_id')
-            
-            # Check if email already exists in database
-            existing = self.db_session.query(Email).filter_by(email_id=email_id).first()
-            
-            if not existing:
-                new_emails.append(email_data)
-            else:
-                skipped_count += 1
-                logger.debug(f"Skipping already processed email: {email_id}")
+        stored = self._stored_uids([email_data.get('email_id') for email_data in emails], folder)
+        new_emails = [email_data for email_data in emails if email_data.get('email_id') not in stored]
         
+        skipped_count = len(emails) - len(new_emails)
         if skipped_count > 0:
             logger.info(f"Skipped {skipped_count} already-processed emails")
         
         return new_emails
     
-    def _process_email(self, email_data: dict, folder: str) -> bool:
+    def _classify_without_llm(self, email_data: dict, check_memory: bool = True,
+                              db_session: Optional[Session] = None) -> Optional[dict]:
+        """
+        Run the cheap classification tiers (Gmail category, rules engine, then sender memory)
+        
+        Args:
+            email_data: Email data dictionary
+            check_memory: Whether to consult sender memory
+            db_session: Session for the sender memory lookup (defaults to the scanner's)
+        
+        Returns:
+            Analysis result dict, or None if the email needs LLM analysis
+        """
+        if self.gmail_categories:
+            # TIER 0: Gmail already sorted it into Promotions/Social/Updates/Forums
+            category_result = self.gmail_categories.classify(
+                email_data, self._gmail_category_by_uid.get(email_data['email_id'])
+            )
+            if category_result:
+                logger.info(f"✓ Gmail category {category_result['gmail_category']}: "
+                            f"{category_result['recommendation']}")
+                category_result['model_name'] = 'gmail_category'
+                category_result['model_version'] = '1.0'
+                return category_result
+        
+        # Check rules first before AI analysis
+        rule_result = self.rules.check_email(email_data)
+        
+        if rule_result:
+            # TIER 1: Rule matched - use rule decision instead of AI
+            logger.info(f"✓ Rule matched: {rule_result['rule_matched']} - {rule_result['recommendation']}")
+            analysis_result = rule_result
+            analysis_result['model_name'] = 'rules_engine'
+            analysis_result['model_version'] = '1.0'
+            return analysis_result
+        
+        if not check_memory or email_data.get('headers_only'):
+            # Header-only records may still match a rule once the body is fetched,
+            # and rules take precedence over sender memory
+            return None
+        
+        # TIER 2: Check sender history patterns
+        sender_memory = SenderMemory(db_session or self.db_session)
+        pattern_result = sender_memory.should_skip_llm(email_data['sender'])
+        
+        if pattern_result:
+            # Pattern detected - skip LLM
+            logger.info(f"✓ Pattern detected for {email_data['sender']}: {pattern_result['recommendation']}")
+            analysis_result = pattern_result
+            analysis_result['model_name'] = 'pattern_memory'
+            analysis_result['model_version'] = '1.0'
+            return analysis_result
+        
+        return None
+    
+    def _analyze_concurrently(self, emails: List[dict], check_memory: bool = True) -> List[Optional[dict]]:
+        """
+        Classify a batch of emails, sending the LLM-bound ones to Ollama together (batch_analyze)
+        
+        With a model cascade, the emails a model could not answer confidently are sent
+        together to the next model.
+        
+        Args:
+            emails: Email data dictionaries
+            check_memory: Whether to consult sender memory before the LLM
+        
+        Returns:
+            Analysis result per email, in input order (None where the LLM failed)
+        """
+        results = [self._classify_without_llm(email_data, check_memory=check_memory) for email_data in emails]
+        llm_indexes = [index for index, result in enumerate(results) if result is None]
+        if not llm_indexes:
+            return results
+        
+        pending = llm_indexes
+        best = {}  # Most confident escalated answer per email, in case the larger models fail
+        for stage, (analyzer, _) in enumerate(self.cascade):
+            self.writer.flush_if_due()
+            logger.info(f"→ Analyzing {len(pending)} emails with {analyzer.model}, {analyzer.prompt_batch_size} "
+                        f"per prompt, {analyzer.max_concurrency} requests at a time")
+            batch = analyzer.batch_analyze([emails[index] for index in pending])
+            escalate = []
+            for index, item in zip(pending, batch):
+                analysis = self._calibrate_llm_result(item['analysis']) if item['analysis'] else None
+                if self._should_escalate(analysis, stage):
+                    best[index] = self._more_confident(best.get(index), analysis)
+                    escalate.append(index)
+                else:
+                    results[index] = analysis or best.get(index)
+            if not escalate:
+                break
+            logger.info(f"  {len(escalate)}/{len(pending)} emails escalated to {self.cascade[stage + 1][0].model}")
+            pending = escalate
+        return results
+    
+    def _analyze_with_llm(self, email_data: dict) -> Optional[dict]:
+        """
+        Analyze an email with the LLM and calibrate its confidence
+        
+        With a model cascade, the email goes to the cheapest model first and moves up
+        while the answer is invalid or its calibrated confidence is below the stage's
+        min_confidence. If the last model fails, the most confident earlier answer is kept.
+        
+        Args:
+            email_data: Email data dictionary
+        
+        Returns:
+            Analysis result dict, or None if the LLM gave no usable answer
+        """
+        logger.info(f"→ Analyzing with LLM: {email_data['sender']}")
+        best = None
+        for stage, (analyzer, min_confidence) in enumerate(self.cascade):
+            analysis_result = analyzer.analyze_email(email_data)
+            if analysis_result:
+                analysis_result = self._calibrate_llm_result(analysis_result)
+            if not self._should_escalate(analysis_result, stage):
+                return analysis_result or best
+            best = self._more_confident(best, analysis_result)
+            
+            reason = (f"confidence {analysis_result['confidence_score']:.0%} below {min_confidence:.0%}"
+                      if analysis_result else "no usable answer")
+            logger.info(f"  {analyzer.model}: {reason}, escalating to {self.cascade[stage + 1][0].model}")
+        return best
+    
+    @staticmethod
+    def _more_confident(best: Optional[dict], analysis_result: Optional[dict]) -> Optional[dict]:
+        """The escalated answer to fall back on if the larger models fail: the most confident one"""
+        if not analysis_result or (best and best['confidence_score'] >= analysis_result['confidence_score']):
+            return best
+        return analysis_result
+    
+    def _should_escalate(self, analysis_result: Optional[dict], stage: int) -> bool:
+        """Whether a cascade stage's (calibrated) answer is passed up to the next model"""
+        if stage + 1 >= len(self.cascade):
+            return False
+        return not analysis_result or analysis_result['confidence_score'] < self.cascade[stage][1]
+    
+    def _calibrate_llm_result(self, analysis_result: dict) -> dict:
+        """Replace an LLM result's confidence with the calibrated one when they differ noticeably"""
+        # Apply confidence calibration for LLM results (cached curves and snapshot, shared by the whole run)
+        original_confidence = analysis_result['confidence_score']
+        calibrated_confidence, calibration_reason = self.calibrator.calibrate_confidence(
+            original_confidence,
+            analysis_result.get('category'),
+            analysis_result.get('model_name')
+        )
+        
+        if abs(calibrated_confidence - original_confidence) > 0.05:
+            logger.info(f"  Confidence calibrated: {original_confidence:.1%} → {calibrated_confidence:.1%}")
+            logger.info(f"  Reason: {calibration_reason}")
+            analysis_result['confidence_score'] = calibrated_confidence
+            analysis_result['reasoning'] += f" (Confidence calibrated: {calibration_reason})"
+        return analysis_result
+    
+    def _process_email(self, email_data: dict, folder: str, analysis_result: Optional[dict] = None,
+                       check_memory: bool = True) -> bool:
         """
-        Process a single email: store, analyze, and save results
+        Process a single email: analyze it and queue the results for the batch writer
+        
+        Rows are committed by self.writer in batches; the UID only counts as handled
+        (for checkpoints) once its batch is committed.
         
         Args:
             email_data: Email data dictionary
             folder: Email folder name
+            analysis_result: Precomputed analysis (e.g. from a header-only pass); skips classification
+            check_memory: Whether to consult sender memory before the LLM
         
         Returns:
             True if successful, False otherwise
         """
         try:
-            # Store email in database (or get existing)
-            email_record = self.db_session.query(Email).filter_by(email_id=email_data['email_id']).first()
+            uid = email_data['email_id']
+            # Get existing record (a rescan, or a Gmail message stored from another folder)
+            email_record = self.db_session.query(Email).filter_by(folder=folder, email_id=uid).first()
+            if not email_record and email_data.get('gm_msgid'):
+                email_record = self.db_session.query(Email).filter_by(gm_msgid=email_data['gm_msgid']).first()
             
-            if not email_record:
-                # New email - create record
-                email_record = Email(
-                    email_id=email_data['email_id'],
-                    sender=email_data['sender'],
-                    recipient=email_data['recipient'],
-                    subject=email_data['subject'],
-                    body_preview=email_data['body_preview'],
-                    body_full=email_data['body_full'],
-                    received_date=email_data['date'],
-                    size_bytes=email_data['size_bytes'],
-                    has_attachments=email_data['has_attachments'],
-                    folder=folder,
-                    fetched_at=datetime.now(UTC)
-                )
-                self.db_session.add(email_record)
-                self.db_session.flush()  # Get the ID
-            
-            # Check rules first before AI analysis
-            rule_result = self.rules.check_email(email_data)
-            
-            if rule_result:
-                # TIER 1: Rule matched - use rule decision instead of AI
-                logger.info(f"✓ Rule matched: {rule_result['rule_matched']} - {rule_result['recommendation']}")
-                analysis_result = rule_result
-                analysis_result['model_name'] = 'rules_engine'
-                analysis_result['model_version'] = '1.0'
-            else:
-                # TIER 2: Check sender history patterns
-                sender_memory = SenderMemory(self.db_session)
-                pattern_result = sender_memory.should_skip_llm(email_data['sender'])
+            if analysis_result is None:
+                analysis_result = self._classify_without_llm(email_data, check_memory=check_memory)
+            
+            if analysis_result is None:
+                # TIER 3: No rule or pattern - analyze with LLM
+                analysis_result = self._analyze_with_llm(email_data)
                 
-                if pattern_result:
-                    # Pattern detected - skip LLM
-                    logger.info(f"✓ Pattern detected for {email_data['sender']}: {pattern_result['recommendation']}")
-                    analysis_result = pattern_result
-                    analysis_result['model_name'] = 'pattern_memory'
-                    analysis_result['model_version'] = '1.0'
-                else:
-                    # TIER 3: No rule or pattern - analyze with LLM
-                    logger.info(f"→ Analyzing with LLM: {email_data['sender']}")
-                    analysis_result = self.analyzer.analyze_email(email_data)
-                    
-                    if not analysis_result:
-                        logger.warning(f"Failed to analyze email {email_data['email_id']}")
-                        self.db_session.rollback()
-                        return False
-                    
-                    # Apply confidence calibration for LLM results
-                    calibrator = ConfidenceCalibrator(self.db_session)
-                    original_confidence = analysis_result['confidence_score']
-                    calibrated_confidence, calibration_reason = calibrator.calibrate_confidence(
-                        original_confidence,
-                        analysis_result.get('category')
-                    )
-                    
-                    if abs(calibrated_confidence - original_confidence) > 0.05:
-                        logger.info(f"  Confidence calibrated: {original_confidence:.1%} → {calibrated_confidence:.1%}")
-                        logger.info(f"  Reason: {calibration_reason}")
-                        analysis_result['confidence_score'] = calibrated_confidence
-                        analysis_result['reasoning'] += f" (Confidence calibrated: {calibration_reason})"
-            
-            # Store or update analysis
-            analysis_record = self.db_session.query(Analysis).filter_by(email_id=email_record.id).first()
-            
-            if analysis_record:
-                # Update existing analysis (rescan mode)
-                analysis_record.recommendation = analysis_result['recommendation']
-                analysis_record.confidence_score = analysis_result['confidence_score']
-                analysis_record.reasoning = analysis_result['reasoning']
-                analysis_record.category = analysis_result['category']
-                analysis_record.priority = analysis_result['priority']
-                analysis_record.model_name = analysis_result['model_name']
-                analysis_record.model_version = analysis_result['model_version']
-                analysis_record.status = 'pending_review'
-                analysis_record.analyzed_at = datetime.now(UTC)
-                logger.info("Updated existing analysis")
+                if not analysis_result:
+                    logger.warning(f"Failed to analyze email {uid}")
+                    return False
+            
+            model_name = analysis_result['model_name']
+            
+            def on_commit():
+                self._handled_uids.add(uid)
+                self._stage_counts[model_name] += 1
+            
+            analysis_values = {
+                'recommendation': analysis_result['recommendation'],
+                'confidence_score': analysis_result['confidence_score'],
+                'reasoning': analysis_result['reasoning'],
+                'category': analysis_result['category'],
+                'priority': analysis_result['priority'],
+                'model_name': model_name,
+                'model_version': analysis_result['model_version'],
+                'status': 'pending_review',
+                'analyzed_at': datetime.now(UTC)
+            }
+            
+            if not email_record:
+                # New email - bulk inserted with its analysis when the batch is written
+                self.writer.add_email({
+                    'email_id': uid,
+                    'gm_msgid': email_data.get('gm_msgid'),
+                    'sender': email_data['sender'],
+                    'recipient': email_data['recipient'],
+                    'subject': email_data['subject'],
+                    'body_preview': email_data['body_preview'],
+                    'body_full': email_data['body_full'],
+                    'received_date': email_data['date'],
+                    'size_bytes': email_data['size_bytes'],
+                    'has_attachments': email_data['has_attachments'],
+                    'folder': folder,
+                    'fetched_at': datetime.now(UTC)
+                }, analysis_values, on_commit)
             else:
-                # Create new analysis
-                analysis_record = Analysis(
-                    email_id=email_record.id,
-                    recommendation=analysis_result['recommendation'],
-                    confidence_score=analysis_result['confidence_score'],
-                    reasoning=analysis_result['reasoning'],
-                    category=analysis_result['category'],
-                    priority=analysis_result['priority'],
-                    model_name=analysis_result['model_name'],
-                    model_version=analysis_result['model_version'],
-                    status='pending_review',
-                    analyzed_at=datetime.now(UTC)
-                )
-                self.db_session.add(analysis_record)
-            self.db_session.commit()
+                with self.writer.savepoint(on_commit):
+                    analysis_record = self.db_session.query(Analysis).filter_by(email_id=email_record.id).first()
+                    if analysis_record:
+                        # Update existing analysis (rescan mode)
+                        for column, value in analysis_values.items():
+                            setattr(analysis_record, column, value)
+                        logger.info("Updated existing analysis")
+                    else:
+                        self.db_session.add(Analysis(email_id=email_record.id, **analysis_values))
             
             logger.info(f"Successfully processed email from {email_data['sender']} - {analysis_result['recommendation']}")
             return True
             
         except Exception as e:
+            # The email's savepoint is already rolled back; the rest of the batch is kept
             logger.error(f"Error processing email: {e}")
-            self.db_session.rollback()
             return False
     
     def _update_stats(self, processed_count: int):
@@ -376,6 +1275,9 @@ class EmailScanner:
         if self.email_client:
             self.email_client.disconnect()
         
+        if self.analyzer:
+            self.analyzer.close()
+        
         if self.db_session:
             self.db_session.close()
         
@@ -383,6 +1285,19 @@ class EmailScanner:
         rule_stats = self.rules.get_stats()
         if any(rule_stats.values()):
             logger.info(f"Rules engine stats: {rule_stats}")
+        if self.gmail_categories and any(self.gmail_categories.get_stats().values()):
+            logger.info(f"Gmail category stats: {self.gmail_categories.get_stats()}")
+        if self.analyzer:
+            for model, counts in self.analyzer.get_parse_stats().items():
+                logger.info(f"LLM response parsing ({model}): {counts}")
+            if len(self.analyzer.pool.hosts) > 1:
+                for url, stats in self.analyzer.pool.stats().items():
+                    logger.info(f"Ollama host {url}: {stats['requests']} requests, {stats['failures']} failures"
+                                f"{'' if stats['healthy'] else ' (out of rotation)'}")
+        if self.llm_cache and (self.llm_cache.hits or self.llm_cache.misses):
+            stats = self.llm_cache.get_stats()
+            logger.info(f"LLM cache: {stats['hits']} hits, {stats['misses']} misses "
+                        f"({stats['hit_rate']:.0%} hit rate), {stats['stores']} stored")
         
         logger.info("Scanner cleanup complete")
 
@@ -400,6 +1315,9 @@ def main():
         parser.add_argument('--newest-first', action='store_true', help='Process newest emails first (default: oldest first)')
         parser.add_argument('--oldest-first', action='store_true', help='Process oldest emails first (default behavior)')
         parser.add_argument('--rescan', action='store_true', help='Re-analyze already processed emails with current rules')
+        parser.add_argument('--watch', action='store_true', help='Keep running and process new mail as it arrives (IMAP IDLE)')
+        parser.add_argument('--resume', action='store_true', help='Continue the last interrupted scan without searching the mailbox again')
+        parser.add_argument('--gmail-query', help='Gmail search query evaluated by the server (e.g., "category:promotions older_than:1y")')
         args = parser.parse_args()
         
         # Determine sort order (default is oldest first for archiving old emails)
@@ -440,6 +1358,19 @@ def main():
         # Use command-line limit if provided, otherwise use config
         scan_limit = args.limit if args.limit else config.scan_limit
         
+        if args.watch:
+            try:
+                scanner.watch(folder=args.folder, limit=scan_limit)
+            finally:
+                scanner.cleanup()
+            return 0
+        
+        if args.resume:
+            processed = scanner.resume_scan()
+            logger.info(f"Resume complete: {processed} emails processed")
+            scanner.cleanup()
+            return 0
+        
         # Scan emails
         processed = scanner.scan_new_emails(
             folder=args.folder,
@@ -447,7 +1378,8 @@ def main():
             since_date=since_date,
             before_date=before_date,
             newest_first=newest_first,
-            rescan=args.rescan
+            rescan=args.rescan,
+            gmail_query=args.gmail_query
         )
         
         logger.info(f"Scan complete: {processed} emails processed")
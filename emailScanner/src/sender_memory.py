@@ -31,7 +31,8 @@ class SenderMemory:
         ).join(
             Analysis, Email.id == Analysis.email_id
         ).filter(
-            Email.sender == sender
+            Email.sender == sender,
+            Decision.human_reviewed()
         ).all()
         
         if not decisions:
@@ -95,7 +96,8 @@ class SenderMemory:
         ).join(
             Analysis, Email.id == Analysis.email_id
         ).filter(
-            Email.sender.like(f'%@{domain}%')
+            Email.sender.like(f'%@{domain}%'),
+            Decision.human_reviewed()
         ).all()
         
         if not decisions:
@@ -128,7 +130,8 @@ class SenderMemory:
         ).join(
             Analysis, Email.id == Analysis.email_id
         ).filter(
-            Email.sender == sender
+            Email.sender == sender,
+            Decision.human_reviewed()
         ).order_by(Decision.decided_at.desc()).limit(limit).all()
         
         # If not enough from sender, add same category
@@ -139,7 +142,8 @@ class SenderMemory:
                 Analysis, Email.id == Analysis.email_id
             ).filter(
                 Analysis.category == category,
-                Email.sender != sender  # Different sender
+                Email.sender != sender,  # Different sender
+                Decision.human_reviewed()
             ).order_by(Decision.decided_at.desc()).limit(limit - len(decisions)).all()
             
             decisions.extend(category_decisions)
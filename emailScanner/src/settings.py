@@ -39,6 +39,10 @@ class Settings:
         self.email_port = int(os.getenv('EMAIL_PORT', email_config.get('port', 993)))
         self.email_address = os.getenv('EMAIL_ADDRESS', email_config.get('address', ''))
         self.email_password = os.getenv('EMAIL_PASSWORD', email_config.get('password', ''))
+        self.imap_max_connections = int(os.getenv(
+            'IMAP_MAX_CONNECTIONS',
+            email_config.get('max_connections', 4)
+        ))
         
         # Ollama settings
         ollama_config = config_data.get('ollama', {})
@@ -50,6 +54,67 @@ class Settings:
             'OLLAMA_MODEL',
             ollama_config.get('model', 'llama3.2')
         )
+        self.ollama_max_concurrency = int(os.getenv(
+            'OLLAMA_MAX_CONCURRENCY',
+            ollama_config.get('max_concurrency', 1)
+        ))
+        # Several servers: OLLAMA_HOSTS is a comma-separated URL list; config entries are
+        # URLs or {url, max_concurrency} (default: base_url with max_concurrency)
+        hosts = os.getenv('OLLAMA_HOSTS')
+        hosts = hosts.split(',') if hosts else ollama_config.get('hosts') or [self.ollama_base_url]
+        self.ollama_hosts = [
+            {'url': host.strip(), 'max_concurrency': self.ollama_max_concurrency} if isinstance(host, str)
+            else {'url': host['url'], 'max_concurrency': int(host.get('max_concurrency', self.ollama_max_concurrency))}
+            for host in hosts
+        ]
+        self.ollama_health_check_interval = float(os.getenv(
+            'OLLAMA_HEALTH_CHECK_INTERVAL',
+            ollama_config.get('health_check_interval', 30)
+        ))
+        # Model cascade, cheapest first: OLLAMA_CASCADE is "model=min_confidence,..."; config
+        # entries are model names or {model, min_confidence} (empty = model alone)
+        cascade = os.getenv('OLLAMA_CASCADE')
+        if cascade:
+            cascade = [dict(zip(('model', 'min_confidence'), stage.strip().split('=', 1)))
+                       for stage in cascade.split(',')]
+        self.ollama_cascade = [
+            {'model': stage, 'min_confidence': 0.8} if isinstance(stage, str)
+            else {'model': stage['model'], 'min_confidence': float(stage.get('min_confidence', 0.8))}
+            for stage in (cascade or ollama_config.get('cascade') or [])
+        ]
+        self.ollama_prompt_batch_size = int(os.getenv(
+            'OLLAMA_PROMPT_BATCH_SIZE',
+            ollama_config.get('prompt_batch_size', 1)
+        ))
+        self.ollama_keep_alive = os.getenv(
+            'OLLAMA_KEEP_ALIVE',
+            ollama_config.get('keep_alive', '30m')
+        )
+        if str(self.ollama_keep_alive).lstrip('-').isdigit():
+            self.ollama_keep_alive = int(self.ollama_keep_alive)  # Plain numbers are seconds
+        # Later cascade models are not warmed up and unload soon after their last request
+        self.ollama_escalation_keep_alive = os.getenv(
+            'OLLAMA_ESCALATION_KEEP_ALIVE',
+            ollama_config.get('escalation_keep_alive', '5m')
+        )
+        if str(self.ollama_escalation_keep_alive).lstrip('-').isdigit():
+            self.ollama_escalation_keep_alive = int(self.ollama_escalation_keep_alive)
+        self.ollama_warm_up = os.getenv(
+            'OLLAMA_WARM_UP',
+            str(ollama_config.get('warm_up', True))
+        ).lower() == 'true'
+        self.ollama_structured_output = os.getenv(
+            'OLLAMA_STRUCTURED_OUTPUT',
+            str(ollama_config.get('structured_output', True))
+        ).lower() == 'true'
+        self.ollama_stream = os.getenv(
+            'OLLAMA_STREAM',
+            str(ollama_config.get('stream', True))
+        ).lower() == 'true'
+        self.ollama_num_predict = int(os.getenv(
+            'OLLAMA_NUM_PREDICT',
+            ollama_config.get('num_predict', 256)
+        ))
         
         # Scanner settings
         scanner_config = config_data.get('scanner', {})
@@ -61,6 +126,85 @@ class Settings:
             'SCAN_FOLDER',
             scanner_config.get('folder', 'INBOX')
         )
+        self.fetch_chunk_size = int(os.getenv(
+            'FETCH_CHUNK_SIZE',
+            scanner_config.get('fetch_chunk_size', 200)
+        ))
+        self.idle_timeout_minutes = int(os.getenv(
+            'IDLE_TIMEOUT_MINUTES',
+            scanner_config.get('idle_timeout_minutes', 25)
+        ))
+        self.incremental_scan = os.getenv(
+            'INCREMENTAL_SCAN',
+            str(scanner_config.get('incremental', True))
+        ).lower() == 'true'
+        self.header_first = os.getenv(
+            'HEADER_FIRST_SCAN',
+            str(scanner_config.get('header_first', True))
+        ).lower() == 'true'
+        self.body_fetch_bytes = int(os.getenv(
+            'BODY_FETCH_BYTES',
+            scanner_config.get('body_fetch_bytes', 8192)
+        ))
+        self.full_fetch_max_bytes = int(os.getenv(
+            'FULL_FETCH_MAX_BYTES',
+            scanner_config.get('full_fetch_max_bytes', 262144)
+        ))
+        self.checkpoint_interval = int(os.getenv(
+            'CHECKPOINT_INTERVAL',
+            scanner_config.get('checkpoint_interval', 500)
+        ))
+        self.reconnect_attempts = int(os.getenv(
+            'RECONNECT_ATTEMPTS',
+            scanner_config.get('reconnect_attempts', 5)
+        ))
+        self.max_body_chars = int(os.getenv(
+            'MAX_BODY_CHARS',
+            scanner_config.get('max_body_chars', 50000)
+        ))
+        self.write_batch_rows = int(os.getenv(
+            'WRITE_BATCH_ROWS',
+            scanner_config.get('write_batch_rows', 200)
+        ))
+        self.write_batch_seconds = float(os.getenv(
+            'WRITE_BATCH_SECONDS',
+            scanner_config.get('write_batch_seconds', 2.0)
+        ))
+        self.async_fetch = os.getenv(
+            'ASYNC_FETCH',
+            str(scanner_config.get('async_fetch', False))
+        ).lower() == 'true'
+        self.async_prefetch_chunks = int(os.getenv(
+            'ASYNC_PREFETCH_CHUNKS',
+            scanner_config.get('async_prefetch_chunks', 2)
+        ))
+        
+        # Staged scan pipeline (fetch → parse → tiers → LLM → database writer)
+        pipeline_config = config_data.get('pipeline', {})
+        self.pipeline_enabled = os.getenv(
+            'PIPELINE_ENABLED',
+            str(pipeline_config.get('enabled', False))
+        ).lower() == 'true'
+        self.pipeline_queue_size = int(os.getenv(
+            'PIPELINE_QUEUE_SIZE',
+            pipeline_config.get('queue_size', 8)
+        ))
+        self.pipeline_fetch_workers = int(os.getenv(
+            'PIPELINE_FETCH_WORKERS',
+            pipeline_config.get('fetch_workers', 2)
+        ))
+        self.pipeline_parse_workers = int(os.getenv(
+            'PIPELINE_PARSE_WORKERS',
+            pipeline_config.get('parse_workers', 2)
+        ))
+        self.pipeline_tier_workers = int(os.getenv(
+            'PIPELINE_TIER_WORKERS',
+            pipeline_config.get('tier_workers', 1)
+        ))
+        self.pipeline_llm_workers = int(os.getenv(
+            'PIPELINE_LLM_WORKERS',
+            pipeline_config.get('llm_workers', 2)
+        ))
         
         # Auto-deletion settings
         auto_delete_config = config_data.get('auto_delete', {})
@@ -93,6 +237,36 @@ class Settings:
         self.old_newsletter_days = int(rules_config.get('old_newsletter_days', 7))
         self.promotional_keywords = rules_config.get('promotional_keywords', [])
         self.old_promotional_days = int(rules_config.get('old_promotional_days', 90))
+        
+        # Gmail category tier (decides on Gmail's own Promotions/Social/Updates/Forums tabs)
+        gmail_category_config = config_data.get('gmail_categories', {})
+        self.gmail_category_tier = os.getenv(
+            'GMAIL_CATEGORY_TIER',
+            str(gmail_category_config.get('enabled', False))
+        ).lower() == 'true'
+        self.gmail_category_confidence = float(os.getenv(
+            'GMAIL_CATEGORY_CONFIDENCE',
+            gmail_category_config.get('confidence', 0.9)
+        ))
+        self.gmail_category_days = {
+            category: int(gmail_category_config.get(f'{category}_days', days))
+            for category, days in (('promotions', 30), ('social', 30), ('updates', 90), ('forums', 60))
+        }
+        
+        # LLM response cache (skips Ollama for emails whose prompt was already answered)
+        llm_cache_config = config_data.get('llm_cache', {})
+        self.llm_cache_enabled = os.getenv(
+            'LLM_CACHE_ENABLED',
+            str(llm_cache_config.get('enabled', True))
+        ).lower() == 'true'
+        self.llm_cache_max_entries = int(os.getenv(
+            'LLM_CACHE_MAX_ENTRIES',
+            llm_cache_config.get('max_entries', 50000)
+        ))
+        self.llm_cache_ttl_days = float(os.getenv(
+            'LLM_CACHE_TTL_DAYS',
+            llm_cache_config.get('ttl_days', 30)
+        ))
     
     def validate(self) -> bool:
         """
@@ -61,7 +61,7 @@ def view_email(email_identifier: str):
         print("\n" + "-" * 80)
         print("👤 HUMAN DECISION")
         print("-" * 80)
-        print(f"Approved:      {'Yes' if decision.approved else 'No'}")
+        print(f"Approved:      {'N/A' if decision.approved is None else ('Yes' if decision.approved else 'No')}")
         print(f"Action Taken:  {decision.action_taken or 'N/A'}")
         print(f"Decided At:    {decision.decided_at}")
         if decision.notes:
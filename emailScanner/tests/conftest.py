@@ -0,0 +1,8 @@
+"""
+Shared pytest setup for the email scanner tests.
+The scanner modules import each other as top-level modules, so src/ goes on sys.path.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / 'src'))
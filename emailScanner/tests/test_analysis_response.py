@@ -0,0 +1,51 @@
+"""
+Validation of single-email answers: usable answers are normalized, unusable
+ones return None so the caller asks for a repair.
+"""
+import pytest
+
+from ollama_analyzer import OllamaAnalyzer
+
+
+@pytest.fixture
+def analyzer():
+    analyzer = OllamaAnalyzer(health_check_interval=0)
+    yield analyzer
+    analyzer.close()
+
+
+def test_fields_are_clamped_and_defaulted(analyzer):
+    analysis = analyzer._parse_analysis_response(
+        '{"recommendation": "keep", "confidence_score": "1.4", "reasoning": null, '
+        '"category": 3, "priority": " HIGH "}'
+    )
+    
+    assert analysis == {'recommendation': 'keep', 'confidence_score': 1.0, 'reasoning': 'No reasoning provided',
+                        'category': 'unknown', 'priority': 'high'}
+
+
+def test_unknown_priority_and_missing_confidence(analyzer):
+    analysis = analyzer._parse_analysis_response('{"recommendation": "archive", "priority": "urgent"}')
+    
+    assert (analysis['confidence_score'], analysis['priority']) == (0.5, 'medium')
+
+
+@pytest.mark.parametrize('response', [
+    '{"recommendation": "keep", "confidence_score": null}',
+    '{"recommendation": "keep", "confidence_score": "high"}',
+    '{"recommendation": "keep", "confidence_score": NaN}',
+    '{"recommendation": "remove", "confidence_score": 0.9}',
+    '["keep"]',
+    'I think you should keep this email.'
+])
+def test_unusable_answers_go_to_repair(analyzer, response):
+    assert analyzer._parse_analysis_response(response) is None
+
+
+def test_json_inside_chatter(analyzer):
+    analysis = analyzer._parse_analysis_response(
+        'Analysis {draft}:\n```\n{"recommendation": "delete", "confidence_score": 0.8}\n``` Done.'
+    )
+    
+    assert analysis['recommendation'] == 'delete'
+    assert analyzer.get_parse_stats()[analyzer.model]['extracted'] == 1
@@ -0,0 +1,85 @@
+"""
+Parsing of the JSON array answers to batched (several emails per prompt) requests,
+including the chatter, wrappers and broken entries local models produce.
+"""
+import pytest
+
+from ollama_analyzer import OllamaAnalyzer
+
+
+@pytest.fixture
+def analyzer():
+    analyzer = OllamaAnalyzer(health_check_interval=0)
+    yield analyzer
+    analyzer.close()
+
+
+def answer(index, recommendation='keep', confidence=0.8):
+    return (f'{{"index": {index}, "recommendation": "{recommendation}", "confidence_score": {confidence}, '
+            f'"reasoning": "r{index}", "category": "news", "priority": "low"}}')
+
+
+def test_balanced_fragments_skip_brackets_in_strings():
+    text = 'Here you go: {"reasoning": "uses } and ] and \\" inside"} trailing [1, [2]]'
+    
+    fragments = list(OllamaAnalyzer._balanced_fragments(text, '{['))
+    
+    assert fragments[0] == '{"reasoning": "uses } and ] and \\" inside"}'
+    assert '[1, [2]]' in fragments
+
+
+def test_balanced_fragments_stop_at_mismatched_closer():
+    assert list(OllamaAnalyzer._balanced_fragments('[1, 2} then [3]', '[')) == ['[3]']
+
+
+def test_balanced_fragments_unterminated():
+    # A truncated answer has no complete fragment
+    assert list(OllamaAnalyzer._balanced_fragments('[{"index": 1, "reasoning": "cut', '[{')) == []
+
+
+def test_entries_are_placed_by_index(analyzer):
+    response = f'[{answer(2, "delete")}, {answer(1)}]'
+    
+    results = analyzer._parse_batch_response(response, 2)
+    
+    assert [r['recommendation'] for r in results] == ['keep', 'delete']
+    assert all('index' not in r for r in results)
+
+
+def test_chatter_code_fence_and_wrapper_object(analyzer):
+    fenced = f'```json\n{{"results": [{answer(1)}, {answer(2)}]}}\n```'
+    chatty = f'Sure! Here are the results:\n[{answer(1)}, {answer(2)}]\nLet me know if you need more.'
+    
+    assert all(analyzer._parse_batch_response(fenced, 2))
+    assert all(analyzer._parse_batch_response(chatty, 2))
+
+
+def test_missing_invalid_and_duplicate_entries_are_none(analyzer):
+    response = (f'[{answer(1)}, {answer(1, "delete")}, {answer(2, "maybe")}, '
+                f'{answer(3, confidence="null")}, {answer(9)}, "oops"]')
+    
+    results = analyzer._parse_batch_response(response, 4)
+    
+    # First answer for 1 wins; 2 has an invalid recommendation; 3 a null confidence; 4 is missing
+    assert results[0]['recommendation'] == 'keep'
+    assert results[1:] == [None, None, None]
+
+
+def test_entries_without_index_use_their_position(analyzer):
+    response = '[{"recommendation": "archive"}, {"recommendation": "keep", "confidence_score": 7}]'
+    
+    first, second = analyzer._parse_batch_response(response, 2)
+    
+    assert (first['recommendation'], first['confidence_score'], first['category']) == ('archive', 0.5, 'unknown')
+    assert (second['recommendation'], second['confidence_score']) == ('keep', 1.0)
+
+
+def test_truncated_or_missing_response(analyzer):
+    assert analyzer._parse_batch_response(None, 2) == [None, None]
+    assert analyzer._parse_batch_response('No emails to classify.', 2) == [None, None]
+    
+    # Cut off mid-array: the complete first entry is kept, the second is retried alone
+    first, second = analyzer._parse_batch_response(f'[{answer(1)}, {{"index": 2, "recomm', 2)
+    
+    assert first['reasoning'] == 'r1'
+    assert second is None
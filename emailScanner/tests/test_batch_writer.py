@@ -0,0 +1,104 @@
+"""
+BatchWriter on a real SQLite database: analyses must land on the email they
+were buffered with, bad rows must be dropped alone, and commits must follow
+the row and time limits.
+"""
+from datetime import datetime
+
+import pytest
+
+import batch_writer
+from batch_writer import BatchWriter
+from models import Analysis, Email, get_session, init_db
+
+
+@pytest.fixture
+def session(tmp_path):
+    engine = init_db(f"sqlite:///{tmp_path / 'scanner.db'}")
+    session = get_session(engine)
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def email_row(uid, sender='news@example.com', folder='INBOX'):
+    return {'email_id': str(uid), 'sender': sender, 'subject': f'subject {uid}', 'folder': folder,
+            'received_date': datetime(2024, 6, 1)}
+
+
+def analysis_row(uid):
+    return {'recommendation': 'keep', 'confidence_score': 0.5, 'reasoning': f'about {uid}'}
+
+
+def stored_pairs(session):
+    rows = session.query(Email.subject, Analysis.reasoning).join(Analysis, Analysis.email_id == Email.id)
+    return {subject.split()[-1]: reasoning.split()[-1] for subject, reasoning in rows}
+
+
+def test_analyses_follow_their_emails(session):
+    writer = BatchWriter(session, max_rows=1000)
+    # UIDs out of order so insertion order, UID order and id order all differ
+    uids = [907, 12, 455, 3, 88, 1000, 41, 600, 5, 72] * 30
+    uids = [uid * 1000 + n for n, uid in enumerate(uids)]
+    committed = []
+    for uid in uids:
+        writer.add_email(email_row(uid), analysis_row(uid), on_commit=lambda uid=uid: committed.append(uid))
+    
+    assert writer.flush() == len(uids)
+    
+    assert stored_pairs(session) == {str(uid): str(uid) for uid in uids}
+    assert committed == uids
+
+
+def test_bad_row_is_dropped_alone(session):
+    writer = BatchWriter(session, max_rows=1000)
+    committed = []
+    for uid in range(1, 6):
+        row = email_row(uid, sender=None if uid == 3 else 'news@example.com')
+        writer.add_email(row, analysis_row(uid), on_commit=lambda uid=uid: committed.append(uid))
+    
+    assert writer.flush() == 4
+    
+    assert stored_pairs(session) == {'1': '1', '2': '2', '4': '4', '5': '5'}
+    assert committed == [1, 2, 4, 5]
+
+
+def test_failed_savepoint_keeps_the_rest_of_the_batch(session):
+    writer = BatchWriter(session, max_rows=1000)
+    writer.add_email(email_row(1), analysis_row(1))
+    with pytest.raises(RuntimeError):
+        with writer.savepoint() as db:
+            db.add(Email(**email_row(2)))
+            db.flush()
+            raise RuntimeError('bad message')
+    with writer.savepoint() as db:
+        db.add(Email(**email_row(3)))
+    
+    writer.flush()
+    
+    assert sorted(uid for uid, in session.query(Email.email_id)) == ['1', '3']
+
+
+def test_commits_every_max_rows(session):
+    writer = BatchWriter(session, max_rows=4, max_seconds=3600)
+    for uid in range(10):
+        writer.add_email(email_row(uid), analysis_row(uid))
+    
+    assert (writer.commits, writer.pending) == (2, 2)
+
+
+def test_flush_if_due(session, monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(batch_writer.time, 'monotonic', lambda: now[0])
+    writer = BatchWriter(session, max_rows=1000, max_seconds=2.0)
+    
+    assert writer.flush_if_due() == 0
+    writer.add_email(email_row(1), analysis_row(1))
+    now[0] += 1.5
+    writer.add_email(email_row(2), analysis_row(2))
+    assert writer.flush_if_due() == 0
+    
+    # Due from the first email's arrival, not the last
+    now[0] += 0.5
+    assert writer.flush_if_due() == 2
+    assert (writer.commits, writer.pending) == (1, 0)
@@ -0,0 +1,96 @@
+"""
+BODYSTRUCTURE parsing and the choice of which part to download.
+The structures are real server responses (Gmail and Dovecot).
+"""
+import pytest
+
+from email_client import EmailClient
+
+# multipart/mixed: multipart/alternative (plain + html), then a PDF attachment
+MIXED_WITH_PDF = (
+    'UID 12 BODYSTRUCTURE ((("TEXT" "PLAIN" ("CHARSET" "UTF-8") NIL NIL "QUOTED-PRINTABLE" 1204 31 NIL NIL NIL)'
+    '("TEXT" "HTML" ("CHARSET" "UTF-8") NIL NIL "QUOTED-PRINTABLE" 5811 117 NIL NIL NIL) "ALTERNATIVE" '
+    '("BOUNDARY" "000000000000b1c2") NIL NIL)'
+    '("APPLICATION" "PDF" ("NAME" "invoice 0042.pdf") "<f_lx1>" NIL "BASE64" 184220 NIL '
+    '("ATTACHMENT" ("FILENAME" "invoice 0042.pdf")) NIL) "MIXED" ("BOUNDARY" "000000000000b1c3") NIL NIL)'
+)
+
+# Single-part latin-1 message
+SINGLE_PART = 'BODYSTRUCTURE ("text" "plain" ("charset" "iso-8859-1" "format" "flowed") NIL NIL "8bit" 312 9 NIL NIL NIL NIL)'
+
+# HTML newsletter with inline images: no text/plain and nothing marked as attachment
+HTML_ONLY = (
+    'BODYSTRUCTURE (("text" "html" ("charset" "utf-8") NIL NIL "base64" 20480 263 NIL ("inline" NIL) NIL NIL)'
+    '("image" "png" ("name" "logo.png") "<logo@x>" NIL "base64" 9120 NIL ("inline" ("filename" "logo.png")) NIL NIL) '
+    '"related" ("boundary" "r1" "type" "text/html") NIL NIL)'
+)
+
+# Forwarded message: the rfc822 part has envelope and nested body fields before its disposition
+FORWARD = (
+    'BODYSTRUCTURE (("text" "plain" ("charset" "windows-1252") NIL NIL "quoted-printable" 88 4 NIL NIL NIL NIL)'
+    '("message" "rfc822" NIL NIL NIL "7bit" 1650 ("Mon, 3 Jun 2024 09:12:44 +0200" "Quote \\"Q3\\"" '
+    '(("Celine Martin" NIL "celine" "example.fr")) NIL NIL NIL NIL NIL NIL "<a@b>") '
+    '("text" "plain" ("charset" "iso-8859-15") NIL NIL "base64" 500 7 NIL NIL NIL NIL) 40 NIL '
+    '("attachment" ("filename" "Quote.eml")) NIL NIL) "mixed" ("boundary" "f1") NIL NIL)'
+)
+
+
+def test_parse_imap_list_atoms_strings_and_nil():
+    text = '(NIL "a \\"quoted\\" (word)" ATOM (1 2) "")'
+    
+    parsed, end = EmailClient._parse_imap_list(text, 0)
+    
+    assert parsed == [None, 'a "quoted" (word)', 'ATOM', ['1', '2'], '']
+    assert end == len(text)
+
+
+def test_parse_imap_list_rejects_literals():
+    with pytest.raises(ValueError):
+        EmailClient._parse_imap_list('("a" {3}\r\nabc)', 0)
+
+
+def test_missing_or_broken_bodystructure():
+    assert EmailClient._parse_bodystructure('UID 4 FLAGS ()') is None
+    assert EmailClient._parse_bodystructure('BODYSTRUCTURE ("text" "plain"') is None
+
+
+def test_mixed_with_attachment():
+    structure = EmailClient._parse_bodystructure(MIXED_WITH_PDF)
+    
+    text_part, has_attachments = EmailClient._summarize_bodystructure(structure)
+    
+    assert has_attachments
+    assert text_part == {
+        'type': 'text/plain', 'encoding': 'quoted-printable', 'charset': 'UTF-8',
+        'size': 1204, 'disposition': None, 'spec': '1.1'
+    }
+
+
+def test_single_part_is_part_one():
+    structure = EmailClient._parse_bodystructure(SINGLE_PART)
+    
+    text_part, has_attachments = EmailClient._summarize_bodystructure(structure)
+    
+    assert not has_attachments
+    assert (text_part['spec'], text_part['charset'], text_part['encoding']) == ('1', 'iso-8859-1', '8bit')
+
+
+def test_inline_images_without_text_plain():
+    structure = EmailClient._parse_bodystructure(HTML_ONLY)
+    
+    text_part, has_attachments = EmailClient._summarize_bodystructure(structure)
+    
+    assert text_part is None
+    assert not has_attachments
+
+
+def test_message_rfc822_disposition():
+    structure = EmailClient._parse_bodystructure(FORWARD)
+    
+    parts = [EmailClient._describe_body_part(node) for _, node in EmailClient._iter_body_parts(structure)]
+    text_part, has_attachments = EmailClient._summarize_bodystructure(structure)
+    
+    assert [part['type'] for part in parts] == ['text/plain', 'message/rfc822']
+    assert parts[1]['disposition'] == 'attachment'
+    assert has_attachments
+    assert (text_part['spec'], text_part['charset']) == ('1', 'windows-1252')
@@ -0,0 +1,98 @@
+"""
+Calibration curve fitting: PAV must give a non-decreasing step function with
+the pooled accuracy of each block, and Platt scaling a monotone smooth curve.
+"""
+import warnings
+
+import numpy as np
+import pytest
+
+from calibration_fit import PLATT_GRID, fit_curves, fit_isotonic, fit_platt
+from confidence_calibration import interpolate
+
+
+def test_isotonic_pools_adjacent_violators():
+    # Accuracy per level: 0.6: 1/1, 0.7: 0/2, 0.8: 1/1 -> 0.6 and 0.7 violate and are pooled to 1/3
+    confidence = np.array([0.6, 0.7, 0.7, 0.8])
+    approved = np.array([1.0, 0.0, 0.0, 1.0])
+    
+    thresholds, values = fit_isotonic(confidence, approved)
+    
+    assert thresholds == [0.6, 0.7, 0.8]
+    assert values == [0.3333, 0.3333, 1.0]
+
+
+def test_isotonic_keeps_already_monotone_data():
+    confidence = np.array([0.5, 0.5, 0.9, 0.9])
+    approved = np.array([0.0, 1.0, 1.0, 1.0])
+    
+    assert fit_isotonic(confidence, approved) == ([0.5, 0.9], [0.5, 1.0])
+
+
+def test_isotonic_fully_decreasing_collapses_to_one_block():
+    confidence = np.array([0.2, 0.4, 0.6, 0.8])
+    approved = np.array([1.0, 1.0, 0.0, 0.0])
+    
+    thresholds, values = fit_isotonic(confidence, approved)
+    
+    assert thresholds == [0.2, 0.8]
+    assert values == [0.5, 0.5]
+
+
+def test_isotonic_is_monotone_and_matches_mean_on_noisy_data():
+    rng = np.random.default_rng(7)
+    confidence = np.round(rng.uniform(0.5, 1.0, 2000), 2)
+    approved = (rng.uniform(size=2000) < confidence ** 2).astype(float)
+    
+    thresholds, values = fit_isotonic(confidence, approved)
+    
+    assert thresholds == sorted(thresholds)
+    assert all(a <= b for a, b in zip(values, values[1:]))
+    # PAV preserves the sample-weighted mean of the targets
+    fitted = np.array([interpolate(thresholds, values, x) for x in confidence])
+    assert fitted.mean() == pytest.approx(approved.mean(), abs=1e-3)
+
+
+def test_platt_is_monotone_and_tracks_accuracy():
+    rng = np.random.default_rng(3)
+    confidence = rng.uniform(0.3, 1.0, 500)
+    approved = (rng.uniform(size=500) < confidence).astype(float)
+    
+    thresholds, values = fit_platt(confidence, approved)
+    
+    assert thresholds == [round(float(x), 4) for x in PLATT_GRID]
+    assert all(a <= b for a, b in zip(values, values[1:]))
+    assert interpolate(thresholds, values, 0.9) == pytest.approx(0.9, abs=0.1)
+
+
+def test_platt_decreasing_data_gives_flat_mean_curve():
+    # Separable and decreasing: a full Newton step from the default start diverges
+    confidence = np.array([0.9, 0.9, 0.9, 0.2, 0.2, 0.2])
+    approved = np.array([0.0, 0.0, 0.0, 1.0, 1.0, 1.0])
+    
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', RuntimeWarning)
+        _, values = fit_platt(confidence, approved)
+    
+    assert set(values) == {0.5}
+
+
+def test_fit_curves_groups_and_method_choice():
+    count = 300
+    data = {
+        'confidence': np.linspace(0.5, 1.0, count),
+        'approved': np.tile([1.0, 1.0, 0.0], count // 3),
+        'model_name': np.array(['small'] * 250 + ['large'] * 50, dtype=object),
+        'category': np.array(['spam'] * 200 + ['news'] * 100, dtype=object)
+    }
+    
+    curves = fit_curves(data, min_samples=40, isotonic_samples=200)
+    
+    assert [(c['model_name'], c['category'], c['method'], c['sample_count']) for c in curves] == [
+        (None, None, 'isotonic', 300),
+        ('large', None, 'platt', 50),
+        ('large', 'news', 'platt', 50),
+        ('small', None, 'isotonic', 250),
+        ('small', 'news', 'platt', 50),
+        ('small', 'spam', 'isotonic', 200)
+    ]
@@ -0,0 +1,104 @@
+"""
+FETCH response walking on the shapes imaplib actually returns for
+multi-message UID FETCH commands: (header, literal) tuples, bare closing
+parentheses and attributes that arrive after a literal.
+"""
+from email_client import EmailClient
+
+
+def fetch_messages(msg_data):
+    return list(EmailClient._iter_fetch_response(msg_data))
+
+
+def test_one_literal_per_message():
+    msg_data = [
+        (b'1 (UID 101 RFC822.SIZE 52 BODY[] {11}', b'Subject: a\r\n'),
+        b')',
+        (b'2 (UID 102 RFC822.SIZE 64 BODY[] {11}', b'Subject: b\r\n'),
+        b')'
+    ]
+    
+    messages = fetch_messages(msg_data)
+    
+    assert [(m['seq'], m['uid'], m['size']) for m in messages] == [('1', '101', 52), ('2', '102', 64)]
+    assert messages[0]['literals'] == {'BODY[]': b'Subject: a\r\n'}
+    assert messages[1]['literals'] == {'BODY[]': b'Subject: b\r\n'}
+
+
+def test_attributes_after_the_literal():
+    # Servers may send UID after the body; it arrives as a continuation line
+    msg_data = [
+        (b'7 (RFC822.SIZE 900 BODY[] {5}', b'hello'),
+        b' UID 4410 FLAGS (\\Seen))'
+    ]
+    
+    message, = fetch_messages(msg_data)
+    
+    assert message['uid'] == '4410'
+    assert message['size'] == 900
+    assert '\\Seen' in message['attrs']
+
+
+def test_several_literals_in_one_message():
+    msg_data = [
+        (b'3 (UID 55 BODY[HEADER.FIELDS (FROM SUBJECT)] {18}', b'From: x@example.com'),
+        (b' BODY[1.2]<0> {4}', b'text'),
+        b')'
+    ]
+    
+    message, = fetch_messages(msg_data)
+    
+    assert message['uid'] == '55'
+    assert message['literals'] == {
+        'BODY[HEADER.FIELDS (FROM SUBJECT)]': b'From: x@example.com',
+        'BODY[1.2]<0>': b'text'
+    }
+
+
+def test_peek_is_dropped_from_section_names():
+    msg_data = [(b'1 (UID 9 BODY.PEEK[HEADER] {3}', b'a:b'), b')']
+    
+    message, = fetch_messages(msg_data)
+    
+    assert message['literals'] == {'BODY[HEADER]': b'a:b'}
+
+
+def test_literal_containing_fetch_like_text():
+    # Body bytes are never scanned for the next message's "N (" prefix
+    msg_data = [
+        (b'1 (UID 1 BODY[] {19}', b'2 (UID 999 BODY[] {'),
+        b')',
+        (b'2 (UID 2 BODY[] {2}', b'ok'),
+        b')'
+    ]
+    
+    messages = fetch_messages(msg_data)
+    
+    assert [m['uid'] for m in messages] == ['1', '2']
+    assert messages[0]['literals']['BODY[]'] == b'2 (UID 999 BODY[] {'
+
+
+def test_messages_without_literals_and_untagged_noise():
+    msg_data = [
+        None,
+        b'* OK still here',
+        b'4 (UID 12 FLAGS (\\Flagged) MODSEQ (88))',
+        b'5 (UID 13 FLAGS ())'
+    ]
+    
+    messages = fetch_messages(msg_data)
+    
+    assert [(m['seq'], m['uid'], m['literals']) for m in messages] == [('4', '12', {}), ('5', '13', {})]
+
+
+def test_gmail_attributes():
+    msg_data = [
+        (b'1 (X-GM-MSGID 1278455344230334865 X-GM-LABELS ("\\\\Important" "Work/Q3 plan" Receipts) '
+         b'UID 31 BODY[HEADER] {3}', b'a:b'),
+        b')'
+    ]
+    
+    message, = fetch_messages(msg_data)
+    
+    assert message['gm_msgid'] == '1278455344230334865'
+    assert message['gm_labels'] == ['\\Important', 'Work/Q3 plan', 'Receipts']
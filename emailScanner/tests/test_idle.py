@@ -0,0 +1,106 @@
+"""
+IMAP IDLE over a local socket pair: notifications must be seen whether they
+arrive with the continuation, later, or not at all.
+"""
+import imaplib
+import socket
+import threading
+import time
+
+import pytest
+
+from email_client import EmailClient
+
+
+class FakeServer:
+    """Server side of the socket pair; answers one IDLE command"""
+    
+    def __init__(self, sock, after_continuation=b'', later=b'', delay=0.0):
+        self.sock = sock
+        self.after_continuation = after_continuation
+        self.later = later
+        self.delay = delay
+        self.received = b''
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+    
+    def read_line(self):
+        while b'\r\n' not in self.received:
+            self.received += self.sock.recv(1024)
+        line, self.received = self.received.split(b'\r\n', 1)
+        return line
+    
+    def run(self):
+        tag = self.read_line().split()[0]
+        # Continuation and anything queued behind it go out in one segment
+        self.sock.sendall(b'+ idling\r\n' + self.after_continuation)
+        if self.later:
+            time.sleep(self.delay)
+            self.sock.sendall(self.later)
+        assert self.read_line() == b'DONE'
+        self.sock.sendall(tag + b' OK IDLE terminated\r\n')
+
+
+@pytest.fixture
+def sockets():
+    client_sock, server_sock = socket.socketpair()
+    yield client_sock, server_sock
+    client_sock.close()
+    server_sock.close()
+
+
+def idle_client(sock):
+    connection = imaplib.IMAP4.__new__(imaplib.IMAP4)
+    connection.sock = sock
+    connection.file = sock.makefile('rb')
+    connection.tagpre = b'A'
+    connection.tagnum = 1
+    connection.tagged_commands = {}
+    connection._encoding = 'ascii'
+    client = EmailClient(server='', email_address='', password='')
+    client.connection = connection
+    client.capabilities = {'IDLE'}
+    return client
+
+
+def timed_idle(client, timeout):
+    started = time.monotonic()
+    new_mail = client.idle(timeout=timeout)
+    return new_mail, time.monotonic() - started
+
+
+def test_exists_sent_with_the_continuation(sockets):
+    client_sock, server_sock = sockets
+    server = FakeServer(server_sock, after_continuation=b'* 5 EXISTS\r\n')
+    
+    new_mail, elapsed = timed_idle(idle_client(client_sock), timeout=10)
+    
+    server.thread.join(timeout=2)
+    assert new_mail
+    assert elapsed < 2
+
+
+def test_exists_sent_later(sockets):
+    client_sock, server_sock = sockets
+    server = FakeServer(server_sock, later=b'* 2 EXPUNGE\r\n* 7 EXISTS\r\n', delay=0.1)
+    
+    new_mail, elapsed = timed_idle(idle_client(client_sock), timeout=10)
+    
+    server.thread.join(timeout=2)
+    assert new_mail
+    assert elapsed < 2
+
+
+def test_timeout_without_new_mail(sockets):
+    client_sock, server_sock = sockets
+    server = FakeServer(server_sock, after_continuation=b'* 3 FETCH (FLAGS (\\Seen))\r\n')
+    client = idle_client(client_sock)
+    
+    new_mail, elapsed = timed_idle(client, timeout=0.3)
+    
+    server.thread.join(timeout=2)
+    assert not new_mail
+    assert 0.3 <= elapsed < 2
+    # The connection is left usable: blocking mode restored, nothing left unread
+    assert client_sock.gettimeout() is None
+    assert not client._data_buffered()
@@ -0,0 +1,103 @@
+"""
+Early stop on streamed answers: JsonEndDetector must fire on the piece that
+completes the first JSON value, however the text is split, and never on
+truncated JSON.
+"""
+import json
+
+import pytest
+import requests
+
+from ollama_analyzer import JsonEndDetector, OllamaAnalyzer
+
+ANSWER = ('{"recommendation": "delete", "confidence_score": 0.91, '
+          '"reasoning": "Promo {50% off} with \\"[deal]\\" text", "category": "promo", "priority": "low"}')
+
+
+def feed_all(pieces):
+    """Feed pieces in order; return the index of the piece that completed the JSON"""
+    detector = JsonEndDetector()
+    for index, piece in enumerate(pieces):
+        if detector.feed(piece):
+            return index, detector.text
+    return None, detector.text
+
+
+@pytest.mark.parametrize('size', [1, 2, 3, 7, 64])
+def test_fires_on_the_last_piece_for_any_split(size):
+    text = 'Sure, here it is:\n' + ANSWER
+    pieces = [text[i:i + size] for i in range(0, len(text), size)]
+    
+    index, collected = feed_all(pieces + [' Hope this helps!'])
+    
+    assert index == len(pieces) - 1
+    assert json.loads(collected[collected.index('{'):]) == json.loads(ANSWER)
+
+
+def test_truncated_json_never_fires():
+    for end in range(len(ANSWER)):
+        assert feed_all([ANSWER[:end]])[0] is None
+
+
+def test_balanced_non_json_is_skipped():
+    index, _ = feed_all(['Summary {see below}', ' [not, json] ', '[{"index": 1}]', ' trailing'])
+    
+    assert index == 2
+
+
+def test_escaped_quote_split_across_pieces():
+    index, _ = feed_all(['{"reasoning": "a \\', '"} still string', '"}'])
+    
+    assert index == 2
+
+
+class StreamedResponse:
+    """The parts of requests.Response used by _read_stream"""
+    
+    def __init__(self, chunks):
+        self.lines = [json.dumps(chunk).encode() for chunk in chunks]
+        self.read = 0
+        self.closed = False
+    
+    def iter_lines(self):
+        for line in self.lines:
+            self.read += 1
+            yield line
+    
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def analyzer():
+    analyzer = OllamaAnalyzer(health_check_interval=0)
+    yield analyzer
+    analyzer.close()
+
+
+def test_read_stream_hangs_up_after_the_json(analyzer):
+    chunks = [{'message': {'content': ANSWER[:40]}, 'done': False},
+              {'message': {'content': ANSWER[40:]}, 'done': False},
+              {'message': {'content': ' I classified it as promo because'}, 'done': False},
+              {'message': {'content': '...'}, 'done': True}]
+    response = StreamedResponse(chunks)
+    
+    text = analyzer._read_stream(response)
+    
+    assert text == ANSWER
+    assert response.read == 2
+    assert response.closed
+
+
+def test_read_stream_returns_partial_text_when_done(analyzer):
+    response = StreamedResponse([{'message': {'content': '{"recommendation": "ke'}, 'done': True}])
+    
+    assert analyzer._read_stream(response) == '{"recommendation": "ke'
+
+
+def test_read_stream_raises_server_errors(analyzer):
+    response = StreamedResponse([{'error': 'model requires more system memory'}])
+    
+    with pytest.raises(requests.exceptions.RequestException):
+        analyzer._read_stream(response)
+    assert response.closed
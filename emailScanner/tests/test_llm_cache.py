@@ -0,0 +1,113 @@
+"""
+LLMResponseCache on a real SQLite database: keys, buffered writes, TTL expiry
+and least-recently-used eviction.
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+import llm_cache
+from llm_cache import LLMResponseCache
+from models import LLMCacheEntry, get_session, init_db
+
+ANALYSIS = {'recommendation': 'delete', 'confidence_score': 0.9, 'reasoning': 'promo',
+            'category': 'promotional', 'priority': 'low', 'model_name': 'not cached'}
+
+
+class Clock:
+    """Stands in for llm_cache.datetime so entry times can be controlled"""
+    now = datetime(2024, 6, 1)
+    
+    @classmethod
+    def utcnow(cls):
+        return cls.now
+    
+    @classmethod
+    def advance(cls, **delta):
+        cls.now += timedelta(**delta)
+
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    monkeypatch.setattr(llm_cache, 'datetime', Clock)
+    monkeypatch.setattr(Clock, 'now', datetime(2024, 6, 1))
+    engine = init_db(f"sqlite:///{tmp_path / 'scanner.db'}")
+    session = get_session(engine)
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def stored_keys(session):
+    return {key for key, in session.query(LLMCacheEntry.cache_key)}
+
+
+def test_key_ignores_whitespace_only():
+    key = LLMResponseCache.make_key('llama3.2', 'v3', 'Subject: Sale\n\nAll  items')
+    
+    assert key == LLMResponseCache.make_key('llama3.2', 'v3', '  Subject: Sale All items ')
+    assert key != LLMResponseCache.make_key('llama3.2', 'v4', 'Subject: Sale All items')
+    assert key != LLMResponseCache.make_key('mistral', 'v3', 'Subject: Sale All items')
+    assert key != LLMResponseCache.make_key('llama3.2', 'v3', 'Subject: Sale all items')
+
+
+def test_buffered_until_flush_and_copies_returned(session):
+    cache = LLMResponseCache(session)
+    cache.put('a', 'llama3.2', ANALYSIS)
+    
+    hit = cache.get('a')
+    hit['recommendation'] = 'keep'
+    
+    assert stored_keys(session) == set()
+    assert cache.get('a')['recommendation'] == 'delete'
+    assert 'model_name' not in hit
+    assert cache.flush() == 1
+    assert stored_keys(session) == {'a'}
+    assert LLMResponseCache(session).get('a')['confidence_score'] == 0.9
+
+
+def test_least_recently_used_are_evicted(session):
+    cache = LLMResponseCache(session, max_entries=3)
+    for key in 'abc':
+        cache.put(key, 'llama3.2', ANALYSIS)
+        cache.flush()
+        Clock.advance(minutes=1)
+    
+    # A hit on 'a' makes 'b' the least recently used
+    assert cache.get('a') is not None
+    cache.flush()
+    Clock.advance(minutes=1)
+    cache.put('d', 'llama3.2', ANALYSIS)
+    cache.flush()
+    
+    assert stored_keys(session) == {'a', 'c', 'd'}
+    assert cache.evictions == 1
+    assert session.query(LLMCacheEntry.hits).filter_by(cache_key='a').scalar() == 1
+
+
+def test_expired_entries_miss_and_are_evicted(session):
+    cache = LLMResponseCache(session, ttl_days=30)
+    cache.put('old', 'llama3.2', ANALYSIS)
+    cache.flush()
+    
+    Clock.advance(days=31)
+    
+    assert cache.get('old') is None
+    cache.put('new', 'llama3.2', ANALYSIS)
+    cache.flush()
+    assert stored_keys(session) == {'new'}
+    assert cache.get_stats()['misses'] == 1
+
+
+def test_put_again_refreshes_an_entry(session):
+    cache = LLMResponseCache(session, ttl_days=30)
+    cache.put('a', 'llama3.2', ANALYSIS)
+    cache.flush()
+    
+    Clock.advance(days=20)
+    cache.put('a', 'mistral', dict(ANALYSIS, recommendation='archive'))
+    cache.flush()
+    Clock.advance(days=20)
+    
+    assert cache.get('a')['recommendation'] == 'archive'
+    assert session.query(LLMCacheEntry).count() == 1
@@ -0,0 +1,82 @@
+"""
+MimeParser against the standard library on real-world message layouts.
+Every fixture in benchmarks/fixtures must give the same text, attachment flag and
+decoded headers as email.policy.default, which the streaming parser replaced.
+"""
+import email
+import email.policy
+from pathlib import Path
+
+import pytest
+
+from email_client import EmailClient
+from mime_parser import MimeParser
+
+FIXTURES = sorted((Path(__file__).parent.parent / 'benchmarks' / 'fixtures').glob('*.eml'))
+
+
+def stdlib_email_data(raw_email: bytes) -> dict:
+    """Text/plain body, attachment flag and headers as email.policy.default sees them"""
+    msg = email.message_from_bytes(raw_email, policy=email.policy.default)
+    if not msg.is_multipart():
+        body, has_attachments = msg.get_content(), False
+    else:
+        parts = list(msg.walk())
+        has_attachments = any(part.get_content_disposition() == 'attachment' for part in parts)
+        body = ''.join(part.get_content() for part in parts
+                       if not part.is_multipart() and part.get_content_type() == 'text/plain'
+                       and part.get_content_disposition() != 'attachment')
+    return {
+        'body': body.strip(),
+        'has_attachments': has_attachments,
+        'sender': str(msg.get('From', '')),
+        'subject': str(msg.get('Subject', ''))
+    }
+
+
+@pytest.fixture(scope='module')
+def client():
+    return EmailClient(server='', email_address='', password='')
+
+
+@pytest.mark.parametrize('path', FIXTURES, ids=lambda path: path.name)
+def test_matches_stdlib(path, client):
+    raw_email = path.read_bytes()
+    expected = stdlib_email_data(raw_email)
+    
+    email_data = client._build_email_data('1', raw_email)
+    
+    assert email_data['body_full'] == expected['body']
+    assert email_data['has_attachments'] == expected['has_attachments']
+    assert email_data['sender'] == expected['sender']
+    assert email_data['subject'] == expected['subject']
+
+
+def test_inline_images_are_not_attachments():
+    raw_email = (FIXTURES[0].parent / 'apple_mail_inline_images.eml').read_bytes()
+    
+    parsed = MimeParser().parse(raw_email)
+    
+    assert not parsed['has_attachments']
+    assert 'the café at the trailhead' in parsed['body']
+    assert '<img' not in parsed['body']
+
+
+def test_nested_message_text_is_decoded_with_its_own_charset():
+    raw_email = (FIXTURES[0].parent / 'outlook_forward_rfc822.eml').read_bytes()
+    
+    parsed = MimeParser().parse(raw_email)
+    
+    # Windows-1252 cover note, then the ISO-8859-15 base64 text of the forwarded message
+    assert parsed['body'].startswith('FYI – see Céline’s note below.')
+    assert 'Merci de confirmer € 12' in parsed['body']
+    # The message/rfc822 part itself carries Content-Disposition: attachment
+    assert parsed['has_attachments']
+
+
+def test_body_cap_truncates_text():
+    raw_email = (FIXTURES[0].parent / 'koi8r_base64_alternative.eml').read_bytes()
+    
+    parsed = MimeParser(max_body_chars=12).parse(raw_email)
+    
+    assert parsed['body'] == 'Здравствуйте'
@@ -0,0 +1,120 @@
+"""
+OllamaHostPool routing: least-loaded choice, waiting for free slots, per-model
+hosts and the background health checks.
+"""
+import threading
+import time
+
+import pytest
+
+from ollama_hosts import OllamaHost, OllamaHostPool
+
+
+@pytest.fixture
+def hosts():
+    return [OllamaHost('http://gpu-a:11434/', 2), OllamaHost('http://gpu-b:11434', 1)]
+
+
+@pytest.fixture
+def pool(hosts):
+    pool = OllamaHostPool(hosts)
+    yield pool
+    pool.stop()
+
+
+def test_least_loaded_host_is_chosen(pool, hosts):
+    a, b = hosts
+    
+    picks = [pool.acquire() for _ in range(3)]
+    
+    # a (0/2) ties b (0/1) on load and wins on outstanding; then b (0/1) beats a (1/2)
+    assert picks == [a, b, a]
+    assert pool.max_concurrency == 3
+    assert a.url == 'http://gpu-a:11434'
+
+
+def test_acquire_waits_for_a_release(pool, hosts):
+    for _ in range(3):
+        pool.acquire()
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+    waiter.start()
+    
+    time.sleep(0.05)
+    assert not acquired
+    pool.release(hosts[1])
+    waiter.join(timeout=2)
+    
+    assert acquired == [hosts[1]]
+
+
+def test_waiters_give_up_when_the_last_host_goes_down(pool, hosts):
+    a, b = hosts
+    pool.mark_down(a, 'connection refused')
+    pool.acquire()
+    acquired = []
+    waiter = threading.Thread(target=lambda: acquired.append(pool.acquire()))
+    waiter.start()
+    
+    time.sleep(0.05)
+    pool.mark_down(b, 'timeout')
+    waiter.join(timeout=2)
+    
+    assert acquired == [None]
+    assert (a.failures, b.failures) == (1, 1)
+
+
+def test_exclude_skips_failed_hosts(pool, hosts):
+    a, b = hosts
+    
+    assert pool.acquire(exclude=[a]) is b
+    assert pool.acquire(exclude=[a, b]) is None
+    assert pool.healthy_count(exclude=[a]) == 1
+
+
+def test_requests_only_go_to_hosts_with_the_model(pool, hosts):
+    a, b = hosts
+    pool.mark_up(a, ['llama3.2:latest', 'qwen2.5:14b'])
+    pool.mark_up(b, ['llama3.2:latest'])
+    
+    assert [pool.acquire(model='qwen2.5:14b') for _ in range(2)] == [a, a]
+    assert pool.acquire(model='llama3.2:latest') is b
+    assert pool.acquire(model='mistral:latest') is None
+    assert pool.healthy_count(model='qwen2.5:14b') == 1
+    assert pool.stats()[a.url]['models'] == ['llama3.2:latest', 'qwen2.5:14b']
+
+
+def test_unchecked_hosts_serve_any_model(hosts):
+    a, _ = hosts
+    
+    assert a.serves('anything')
+    a.models = set()
+    assert not a.serves('anything')
+    assert a.serves(None)
+
+
+def test_health_checks_update_rotation_and_models(pool, hosts):
+    a, b = hosts
+    answers = {a.url: None, b.url: ['llama3.2:latest']}
+    checked = threading.Event()
+    
+    def check(host):
+        if host is b:
+            checked.set()
+        if answers[host.url] is None:
+            raise ConnectionError('refused')
+        return answers[host.url]
+    
+    pool.start_health_checks(check, interval=0.01)
+    assert checked.wait(timeout=2)
+    time.sleep(0.05)
+    
+    assert not a.healthy
+    assert b.healthy and b.models == {'llama3.2:latest'}
+    
+    answers[a.url] = ['qwen2.5:14b']
+    deadline = time.monotonic() + 2
+    while not a.healthy and time.monotonic() < deadline:
+        time.sleep(0.01)
+    
+    assert a.healthy and a.models == {'qwen2.5:14b'}
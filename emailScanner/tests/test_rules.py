@@ -0,0 +1,61 @@
+"""
+Rules engine: header-only records must either wait for the body (None) or get
+exactly what the full message gets, and counters must not lose updates across
+tier worker threads.
+"""
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, UTC
+
+from rules import EmailRules
+
+SENDERS = ['cdarling926@gmail.com', 'Jane Smith <jane.smith@example.org>', 'noreply@shop.example.com',
+           'news@daily.example.com', 'careers@recruit.example.com']
+SUBJECTS = ['Lunch?', 'Flash sale: 40% off everything', 'Your weekly digest', 'New job alert for you',
+            'Meeting moved to 3pm']
+BODIES = ['', 'See you at the conference next week.', 'Shop now - limited time. Unsubscribe here.',
+          'We are hiring! Apply now for this job opportunity.', 'Thanks, talk soon']
+AGES = [1, 10, 100, 200]
+BULK_HEADERS = [{}, {'list_unsubscribe': '<mailto:unsub@example.com>'}]
+
+
+def full_and_headers_only():
+    now = datetime.now(UTC)
+    for sender, subject, body, age, bulk in itertools.product(SENDERS, SUBJECTS, BODIES, AGES, BULK_HEADERS):
+        full = dict(bulk, sender=sender, subject=subject, body_preview=body, date=now - timedelta(days=age))
+        yield full, dict(full, body_preview='', headers_only=True)
+
+
+def test_header_only_decisions_match_the_full_message():
+    rules = EmailRules()
+    decided = 0
+    for full, headers_only in full_and_headers_only():
+        early = rules.check_email(headers_only)
+        if early is not None:
+            decided += 1
+            assert early == rules.check_email(full), (full['sender'], full['subject'], full['body_preview'])
+    
+    # VIP senders and event subjects are still decided without the body
+    assert decided > 0
+
+
+def test_list_headers_do_not_change_full_scan_decisions():
+    # Mailing-list and Google Groups posts from real people are still personal contacts
+    rules = EmailRules()
+    post = {'sender': 'Jane Smith <jane.smith@gmail.com>', 'subject': 'Saturday hike',
+            'body_preview': 'Thanks, talk soon', 'date': datetime.now(UTC) - timedelta(days=200)}
+    list_post = dict(post, list_id='<hiking.groups.example.org>',
+                     list_unsubscribe='<mailto:hiking+unsubscribe@groups.example.org>')
+    
+    assert rules.check_email(list_post)['rule_matched'] == 'personal_contact'
+    assert rules.check_email(list_post) == rules.check_email(post)
+
+
+def test_stats_are_exact_across_threads():
+    rules = EmailRules()
+    email_data = {'sender': 'cdarling926@gmail.com', 'subject': 'hi', 'body_preview': ''}
+    
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: rules.check_email(email_data), range(20000)))
+    
+    assert rules.get_stats()['vip_kept'] == 20000